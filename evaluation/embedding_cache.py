@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import hashlib
+import numpy as np
+
+
+def text_hash(text):
+    """Content hash of a description, used as its cache key."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    On-disk store of sentence embeddings keyed by (model name, text hash).
+
+    Each model's embeddings are appended as raw float32 rows to their own file
+    and read back through a memory map; index.json maps every text hash to its
+    row. Re-evaluating a run therefore only embeds texts that were never seen
+    with the same model.
+    """
+
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self.index = {'models': {}}
+        self._maps = {}
+
+        index_file = os.path.join(cache_dir, self.INDEX_FILE)
+        if os.path.exists(index_file):
+            with open(index_file, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+
+    def _data_file(self, model_name):
+        safe_name = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in model_name)
+        return os.path.join(self.cache_dir, f"{safe_name}.f32")
+
+    def _matrix(self, model_name):
+        """Memory map of every stored row for model_name."""
+        entry = self.index['models'][model_name]
+        rows = len(entry['rows'])
+        cached = self._maps.get(model_name)
+        if cached is None or cached.shape[0] != rows:
+            cached = np.memmap(self._data_file(model_name), dtype=np.float32, mode='r', shape=(rows, entry['dim']))
+            self._maps[model_name] = cached
+        return cached
+
+    def get(self, model_name, hashes):
+        """
+        Look up embeddings for text hashes.
+
+        Returns:
+            (dict of hash -> row vector for the hits, list of missing hashes)
+        """
+        entry = self.index['models'].get(model_name)
+        found, missing = {}, []
+        matrix = self._matrix(model_name) if entry and entry['rows'] else None
+
+        for h in hashes:
+            row = entry['rows'].get(h) if entry else None
+            if row is None:
+                missing.append(h)
+            else:
+                found[h] = np.array(matrix[row])
+
+        self.hits += len(found)
+        self.misses += len(missing)
+        if entry:
+            entry['last_used'] = time.time()
+        return found, missing
+
+    def put(self, model_name, hashes, embeddings):
+        """Append embeddings for new text hashes and save the index."""
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        entry = self.index['models'].setdefault(model_name, {'dim': int(embeddings.shape[1]), 'rows': {}})
+        if embeddings.shape[1] != entry['dim']:
+            raise ValueError(f"Embedding size {embeddings.shape[1]} does not match cached size {entry['dim']} for {model_name}")
+
+        new = [(h, vector) for h, vector in zip(hashes, embeddings) if h not in entry['rows']]
+        if not new:
+            return
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        data_file = self._data_file(model_name)
+        # Rows past the indexed count are left over from an interrupted write; drop them first
+        with open(data_file, 'ab') as f:
+            f.truncate(len(entry['rows']) * entry['dim'] * 4)
+            for h, vector in new:
+                f.write(vector.tobytes())
+                entry['rows'][h] = len(entry['rows'])
+            f.flush()
+            os.fsync(f.fileno())
+
+        entry['last_used'] = time.time()
+        self._maps.pop(model_name, None)
+        self.save()
+
+    def save(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        index_file = os.path.join(self.cache_dir, self.INDEX_FILE)
+        with open(index_file + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.index, f)
+        os.replace(index_file + '.tmp', index_file)
+
+    def prune(self, keep_models):
+        """
+        Delete the embeddings of every model not in keep_models.
+
+        Returns:
+            Names of the models removed
+        """
+        removed = [name for name in self.index['models'] if name not in keep_models]
+        for name in removed:
+            del self.index['models'][name]
+            self._maps.pop(name, None)
+            if os.path.exists(self._data_file(name)):
+                os.remove(self._data_file(name))
+        if removed:
+            self.save()
+        return removed
+
+    def report(self):
+        """Print hit statistics for this run and the size of each cached model."""
+        total = self.hits + self.misses
+        hit_rate = self.hits / total if total else 0.0
+        print(f"Embedding cache: {self.hits} hits, {self.misses} misses ({hit_rate:.0%} hit rate)")
+        for name, entry in sorted(self.index['models'].items()):
+            size = len(entry['rows']) * entry['dim'] * 4
+            print(f"  {name}: {len(entry['rows'])} texts, {size / 1024:.0f} KB")
@@ -1,54 +1,214 @@
 import json
 import os
-from sentence_transformers import SentenceTransformer, util
+import glob
+import argparse
+import numpy as np
+from sentence_transformers import SentenceTransformer
 import pandas as pd
 
+from embedding_cache import EmbeddingCache, text_hash
+
 # Paths
 REAL_DESCRIPTIONS_PATH = os.path.join(os.path.dirname(__file__), '../real_descriptions/unpublished.json')
 AI_DESCRIPTIONS_PATH = os.path.join(os.path.dirname(__file__), '../ai_descriptions/unpublished_with_human_examples.json')
 OUTPUT_PATH = os.path.join(os.path.dirname(__file__), '../similarity_results/unpublished_with_human_examples.json')
 
+# Texts encoded per model call; larger batches keep the CPU busy with fewer Python round trips
+BATCH_SIZE = int(os.getenv('EVAL_BATCH_SIZE', '64'))
+
+# The all-MiniLM-L6-v2 model is a sentence transformer model from the Sentence Transformers library. 
+# Based on MiniLM (a distilled version of BERT)
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# Embeddings of previously seen texts, so only new descriptions are encoded
+EMBEDDING_CACHE_DIR = os.getenv(
+    'EVAL_EMBEDDING_CACHE_DIR',
+    os.path.join(os.path.dirname(__file__), '../.cache/embeddings')
+)
+
 # Load real/ideal descriptions
 def load_real_descriptions(path):
     with open(path, 'r', encoding='utf-8') as f:
         return {item['filename']: item['description'] for item in json.load(f)}
 
-# Load AI-generated descriptions
+# Load AI-generated descriptions; raises ValueError for JSON that is not a list of results
 def load_ai_descriptions(path):
     with open(path, 'r', encoding='utf-8') as f:
         data = json.load(f)
-        return {item['filename']: item['description'] for item in data}
+    if not isinstance(data, list) or not all(
+            isinstance(item, dict) and 'filename' in item and 'description' in item for item in data):
+        raise ValueError("not a list of {filename, description} results")
+    return {item['filename']: item['description'] for item in data}
 
-def main():
-    # Load data
-    real_desc = load_real_descriptions(REAL_DESCRIPTIONS_PATH)
-    ai_desc = load_ai_descriptions(AI_DESCRIPTIONS_PATH)
-
-    # Initialize model
-    # The all-MiniLM-L6-v2 model is a sentence transformer model from the Sentence Transformers library. 
-    # Based on MiniLM (a distilled version of BERT)
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-
-    results = []
-    for filename, real_text in real_desc.items():
-        ai_text = ai_desc.get(filename)
-        if not ai_text:
+# Encode texts in batches as L2-normalised rows, so cosine similarity is a dot product
+def encode_texts(model, texts, batch_size=BATCH_SIZE, cache=None, model_name=MODEL_NAME):
+    hashes = [text_hash(text) for text in texts]
+    found, missing = cache.get(model_name, set(hashes)) if cache else ({}, sorted(set(hashes)))
+
+    if missing:
+        text_by_hash = dict(zip(hashes, texts))
+        new_embeddings = model.encode(
+            [text_by_hash[h] for h in missing],
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=len(missing) > batch_size
+        )
+        if cache:
+            cache.put(model_name, missing, new_embeddings)
+        found.update(zip(missing, new_embeddings))
+
+    return np.vstack([found[h] for h in hashes]).astype(np.float32)
+
+# Filenames that have both a real and an AI description, in reference order
+def matched_filenames(real_desc, ai_desc):
+    filenames = []
+    for filename in real_desc:
+        if not ai_desc.get(filename):
             print(f"No AI description found for {filename}")
             continue
-        # Compute embeddings
-        emb_real = model.encode(real_text, convert_to_tensor=True)
-        emb_ai = model.encode(ai_text, convert_to_tensor=True)
-        # Cosine similarity
-        similarity = util.pytorch_cos_sim(emb_real, emb_ai).item()
-        results.append({
-            'filename': filename,
-            'cosine_similarity': similarity
-        })
+        filenames.append(filename)
+    return filenames
+
+# Evaluate several (reference, candidate) runs, embedding each distinct text once across all of them
+def evaluate_runs(model, runs, batch_size=BATCH_SIZE, cache=None):
+    loaded = []
+    texts = {}
+    for name, real_path, ai_path in runs:
+        try:
+            ai_desc = load_ai_descriptions(ai_path)
+        except ValueError as e:
+            # e.g. a metrics or state file caught by --glob
+            print(f"Skipping {os.path.relpath(ai_path)}: {e}")
+            continue
+        print(f"{name}: {os.path.relpath(ai_path)} vs {os.path.relpath(real_path)}")
+        real_desc = load_real_descriptions(real_path)
+        filenames = matched_filenames(real_desc, ai_desc)
+        loaded.append((name, real_desc, ai_desc, filenames))
+        for filename in filenames:
+            texts[text_hash(real_desc[filename])] = real_desc[filename]
+            texts[text_hash(ai_desc[filename])] = ai_desc[filename]
+
+    # One batched encode over the union; reference texts shared by several runs are embedded once
+    hashes = list(texts)
+    rows = {h: row for row, h in enumerate(hashes)}
+    embeddings = encode_texts(model, [texts[h] for h in hashes], batch_size, cache) if hashes else None
+
+    results = {}
+    for name, real_desc, ai_desc, filenames in loaded:
+        if not filenames:
+            results[name] = []
+            continue
+        real_rows = [rows[text_hash(real_desc[filename])] for filename in filenames]
+        ai_rows = [rows[text_hash(ai_desc[filename])] for filename in filenames]
+        similarities = np.einsum('ij,ij->i', embeddings[real_rows], embeddings[ai_rows])
+        results[name] = [
+            {'filename': filename, 'cosine_similarity': float(similarity)}
+            for filename, similarity in zip(filenames, similarities)
+        ]
+    return results
+
+# Mean, median and 10th percentile of a run's similarities
+def summarize(results):
+    scores = np.array([item['cosine_similarity'] for item in results])
+    if not len(scores):
+        return {'count': 0, 'mean': None, 'median': None, 'p10': None}
+    return {
+        'count': int(len(scores)),
+        'mean': float(scores.mean()),
+        'median': float(np.median(scores)),
+        'p10': float(np.percentile(scores, 10))
+    }
+
+# Reference file for a candidate: the longest reference name its file name starts with,
+# e.g. real_descriptions/unpublished.json for ai_descriptions/unpublished_draft2.json
+def find_reference(ai_path, reference_dir):
+    stem = os.path.splitext(os.path.basename(ai_path))[0]
+    best = None
+    for reference in glob.glob(os.path.join(reference_dir, '*.json')):
+        name = os.path.splitext(os.path.basename(reference))[0]
+        if (stem == name or stem.startswith(name + '_')) and (best is None or len(name) > len(best[0])):
+            best = (name, reference)
+    return best[1] if best else None
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Cosine similarity between AI and reference descriptions",
+        epilog="Without --pair or --glob, evaluates the REAL_DESCRIPTIONS_PATH / AI_DESCRIPTIONS_PATH pair."
+    )
+    parser.add_argument('--pair', nargs=2, action='append', metavar=('REFERENCE', 'CANDIDATE'),
+                        help='Reference and AI description files to compare (repeatable)')
+    parser.add_argument('--glob', dest='patterns', action='append', metavar='PATTERN',
+                        help='AI description files to evaluate, each matched to the reference file '
+                             'its name starts with (repeatable), e.g. "../ai_descriptions/*.json"')
+    parser.add_argument('--reference-dir', default=os.path.join(os.path.dirname(__file__), '../real_descriptions'),
+                        help='Where --glob looks for reference files (default: real_descriptions/)')
+    parser.add_argument('--output-dir', default=os.path.join(os.path.dirname(__file__), '../similarity_results'),
+                        help='Where to write the per-run results and summary.json (default: similarity_results/)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                        help=f'Texts encoded per model call (default: {BATCH_SIZE})')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read or write the embedding cache')
+    parser.add_argument('--prune-cache', action='store_true',
+                        help=f'Delete cached embeddings of every model except {MODEL_NAME} and exit')
+    args = parser.parse_args()
+
+    if args.prune_cache:
+        removed = EmbeddingCache(EMBEDDING_CACHE_DIR).prune([MODEL_NAME])
+        print(f"Removed cached embeddings for: {', '.join(removed)}" if removed else "Nothing to prune")
+        return
+
+    # Collect (name, reference, candidate) runs
+    if args.pair or args.patterns:
+        runs = []
+        for real_path, ai_path in args.pair or []:
+            runs.append((os.path.splitext(os.path.basename(ai_path))[0], real_path, ai_path))
+        for pattern in args.patterns or []:
+            for ai_path in sorted(glob.glob(pattern)):
+                real_path = find_reference(ai_path, args.reference_dir)
+                if not real_path:
+                    print(f"No reference descriptions found for {ai_path}")
+                    continue
+                runs.append((os.path.splitext(os.path.basename(ai_path))[0], real_path, ai_path))
+        output_paths = {name: os.path.join(args.output_dir, f"{name}.json") for name, _, _ in runs}
+    else:
+        name = os.path.splitext(os.path.basename(OUTPUT_PATH))[0]
+        runs = [(name, REAL_DESCRIPTIONS_PATH, AI_DESCRIPTIONS_PATH)]
+        output_paths = {name: OUTPUT_PATH}
+
+    if len(set(output_paths)) != len(runs):
+        parser.error("Each candidate file name must be unique; results are saved by candidate name")
+    if not runs:
+        print("Nothing to evaluate")
+        return
+
+    cache = None if args.no_cache else EmbeddingCache(EMBEDDING_CACHE_DIR)
+
+    # Initialize model once for every run
+    model = SentenceTransformer(MODEL_NAME)
+
+    all_results = evaluate_runs(model, runs, args.batch_size, cache)
+    if cache:
+        cache.report()
 
     # Save results as JSON
-    with open(OUTPUT_PATH, 'w', encoding='utf-8') as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
-    print(f"Cosine similarity report saved to {OUTPUT_PATH}")
+    for name, results in all_results.items():
+        os.makedirs(os.path.dirname(output_paths[name]) or '.', exist_ok=True)
+        with open(output_paths[name], 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"Cosine similarity report saved to {output_paths[name]}")
+
+    if not all_results:
+        print("Nothing to evaluate")
+        return
+
+    summary = [dict(run=name, **summarize(results)) for name, results in all_results.items()]
+    os.makedirs(args.output_dir, exist_ok=True)
+    summary_path = os.path.join(args.output_dir, 'summary.json')
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    print()
+    print(pd.DataFrame(summary).set_index('run').round(4).to_string())
+    print(f"\nSummary saved to {summary_path}")
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
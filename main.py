@@ -4,16 +4,27 @@ Art Descriptions AI - Main Script
 Generate accessibility-focused visual descriptions of artwork images using OpenAI API.
 """
 
+from __future__ import annotations
+
 import argparse
+import signal
 import sys
 import os
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 # Add src to path for imports
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-from src.art_descriptor import ArtDescriptor
 from src.config import Config
+from src.image_scanner import scan_images
+from src.sharding import merge_shards, parse_shard
+
+# Loaded only by the commands that describe images or build the example index,
+# so --help and --list-images stay fast enough to call from shell loops
+if TYPE_CHECKING:
+    from src.art_descriptor import ArtDescriptor
+    from src.example_index import ExampleIndex
 
 
 def main():
@@ -29,14 +40,55 @@ Examples:
   # Process a single image
   python main.py --image path/to/artwork.jpg
 
+  # Process a directory tree, skipping drafts
+  python main.py --bulk --input-dir assets --recursive --exclude "draft*"
+
+  # Process with up to 8 requests in flight
+  python main.py --bulk --concurrency 8
+
+  # Describe small catalogue thumbnails 8 to a request
+  python main.py --bulk --input-dir assets/thumbnails --pack 8
+
+  # Try a cheaper model first and escalate descriptions that fail the quality checks
+  python main.py --bulk --cascade
+
   # Process with custom prompt
   python main.py --bulk --prompt "Describe this artwork focusing on its historical significance"
 
+  # Submit an overnight Batch API job, then run the same command later to collect it
+  python main.py --bulk --batch-api
+
+  # Continue an interrupted bulk run
+  python main.py --bulk --resume
+
+  # Regenerate descriptions even if they are in the response cache
+  python main.py --bulk --refresh
+
   # Export results to CSV
   python main.py --bulk --export-csv
 
   # Process with example images and descriptions
   python main.py --bulk --with-examples --example-images assets/example1.jpg,assets/example2.jpg --example-descriptions "Description 1","Description 2"
+
+  # Index the reference descriptions, then use the 3 most similar as examples for each image
+  python main.py --build-example-index
+  python main.py --bulk --with-examples --nearest-examples 3
+
+  # Split a bulk run across three machines, then combine their outputs
+  python main.py --bulk --input-dir assets/human_edited --shard 1/3   # on each machine, with its own i
+  python main.py --merge-shards --input-dir assets/human_edited
+
+  # Queue a directory, then describe it with one worker process per CPU core
+  python main.py --queue fill --input-dir assets/human_edited
+  python main.py --queue work
+  python main.py --queue status
+  python main.py --queue export --input-dir assets/human_edited
+
+  # Keep describing new scans as they are added to a folder
+  python main.py --bulk --input-dir assets/human_edited --watch
+
+  # Run the description service for other applications
+  python main.py --serve --port 8080
         """
     )
     
@@ -59,6 +111,26 @@ Examples:
         help=f'Input directory for bulk processing (default: {Config.ASSETS_DIR})'
     )
     
+    parser.add_argument(
+        '--recursive',
+        action='store_true',
+        help='Also include images in subdirectories of the input directory'
+    )
+    
+    parser.add_argument(
+        '--include',
+        action='append',
+        metavar='PATTERN',
+        help='Only include images whose name or relative path matches this glob pattern (repeatable)'
+    )
+    
+    parser.add_argument(
+        '--exclude',
+        action='append',
+        metavar='PATTERN',
+        help='Skip images and directories whose name or relative path matches this glob pattern (repeatable)'
+    )
+    
     parser.add_argument(
         '--output-file', 
         type=str,
@@ -71,6 +143,85 @@ Examples:
         help='Custom prompt to use instead of the default accessibility prompt'
     )
     
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=Config.CONCURRENCY,
+        help=f'Maximum number of requests in flight during bulk processing (default: {Config.CONCURRENCY})'
+    )
+    
+    parser.add_argument(
+        '--pack',
+        type=int,
+        default=Config.PACK_SIZE,
+        metavar='N',
+        help=f'Describe N images per request in bulk processing, e.g. for small thumbnails (default: {Config.PACK_SIZE})'
+    )
+    
+    parser.add_argument(
+        '--cascade',
+        action=argparse.BooleanOptionalAction,
+        default=Config.CASCADE,
+        help=f'Describe with {Config.CASCADE_FAST_MODEL} first and send descriptions that fail the '
+             f'quality checks to {Config.OPENAI_MODEL}; --no-cascade turns off CASCADE=true '
+             f'(default: {"on" if Config.CASCADE else "off"})'
+    )
+    
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Continue an interrupted bulk run, retrying only failed and missing images'
+    )
+    
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='With --bulk, keep watching the input directory and describe new or changed images as they arrive'
+    )
+    
+    parser.add_argument(
+        '--shard',
+        type=str,
+        metavar='I/N',
+        help='With --bulk, process only shard I of N of the input directory (by a stable hash of each file name), '
+             'writing it to its own output file'
+    )
+    
+    parser.add_argument(
+        '--merge-shards',
+        type=int,
+        nargs='?',
+        const=0,
+        metavar='N',
+        help='Combine the shard outputs of --input-dir into --output-file, reporting duplicates and images '
+             'no shard described (N is only needed if outputs for several shard counts exist; '
+             'without N, or with 0, the shard count is detected)'
+    )
+    
+    parser.add_argument(
+        '--batch-api',
+        action='store_true',
+        help='Submit bulk processing as an OpenAI Batch API job; run again to collect the results'
+    )
+    
+    parser.add_argument(
+        '--wait',
+        action='store_true',
+        help='With --batch-api, wait for the batch job to finish instead of exiting after submitting'
+    )
+    
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Do not read or write the on-disk response cache'
+    )
+    
+    parser.add_argument(
+        '--refresh',
+        action='store_true',
+        help='Ignore cached descriptions and store freshly generated ones'
+    )
+    
     parser.add_argument(
         '--export-csv', 
         action='store_true',
@@ -101,16 +252,111 @@ Examples:
         help='Comma-separated list of example descriptions (must match number of example images)'
     )
     
+    parser.add_argument(
+        '--nearest-examples',
+        type=int,
+        metavar='K',
+        help='With --with-examples, use the K most similar indexed examples for each image instead of a fixed list'
+    )
+    
+    parser.add_argument(
+        '--build-example-index',
+        action='store_true',
+        help='Build or update the example index from real_descriptions/ and the matching images in the assets folder'
+    )
+    
+    parser.add_argument(
+        '--serve',
+        action='store_true',
+        help='Run the description HTTP service with one long-lived client (see README for the endpoints)'
+    )
+    
+    parser.add_argument(
+        '--queue',
+        choices=['fill', 'work', 'status', 'dead', 'retry', 'export'],
+        metavar='COMMAND',
+        help='Durable work queue: fill (queue the images of --input-dir), work (describe them with --workers '
+             'processes), status, dead (list dead-lettered images), retry (requeue them) or export '
+             '(write the results for --input-dir to --output-file)'
+    )
+    
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=Config.QUEUE_WORKERS,
+        help='Worker processes for --queue work, each with --concurrency requests in flight; '
+             '0 starts one per CPU core (default: QUEUE_WORKERS, or 0)'
+    )
+    
+    parser.add_argument(
+        '--host',
+        type=str,
+        default=Config.SERVICE_HOST,
+        help=f'Address for --serve to listen on (default: {Config.SERVICE_HOST})'
+    )
+    
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=Config.SERVICE_PORT,
+        help=f'Port for --serve to listen on (default: {Config.SERVICE_PORT})'
+    )
+    
     args = parser.parse_args()
     
     # Validate arguments
-    if not args.image and not args.bulk and not args.list_images:
-        parser.error("Please specify either --image, --bulk, or --list-images")
+    merge = args.merge_shards is not None
+    if not args.image and not args.bulk and not args.list_images and not args.build_example_index and not args.serve and not merge and not args.queue:
+        parser.error("Please specify either --image, --bulk, --list-images, --build-example-index, --merge-shards, --queue or --serve")
+    
+    if args.serve and (args.image or args.bulk):
+        parser.error("--serve cannot be combined with --image or --bulk")
+    
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    
+    if (args.batch_api or args.wait) and not args.bulk:
+        parser.error("--batch-api and --wait require --bulk")
+    
+    if args.pack < 1:
+        parser.error("--pack must be at least 1")
+    
+    if args.watch and (not args.bulk or args.batch_api or args.resume):
+        parser.error("--watch requires --bulk and cannot be combined with --batch-api or --resume")
+    
+    shard = None
+    if args.shard:
+        if not args.bulk or args.watch:
+            parser.error("--shard requires --bulk and cannot be combined with --watch")
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+    
+    if merge and (args.image or args.bulk or args.serve):
+        parser.error("--merge-shards cannot be combined with --image, --bulk or --serve")
+    if merge and args.merge_shards < 0:
+        parser.error("--merge-shards N must be at least 1, or 0 to detect the shard count")
+    
+    if args.queue and (args.image or args.bulk or args.serve or merge or args.with_examples):
+        parser.error("--queue cannot be combined with --image, --bulk, --serve, --merge-shards or --with-examples")
+    if args.workers < 0:
+        parser.error("--workers must be at least 1, or 0 for one per CPU core")
+    
+    if args.nearest_examples is not None:
+        if not args.with_examples:
+            parser.error("--nearest-examples requires --with-examples")
+        if args.nearest_examples < 1:
+            parser.error("--nearest-examples must be at least 1")
     
     # Validate example arguments
-    if args.with_examples:
+    example_images, example_descriptions, example_index = None, None, None
+    if args.with_examples and args.nearest_examples is not None:
+        if args.example_images or args.example_descriptions:
+            parser.error("--nearest-examples cannot be combined with --example-images or --example-descriptions")
+    elif args.with_examples:
         if not args.example_images or not args.example_descriptions:
-            parser.error("--with-examples requires both --example-images and --example-descriptions")
+            parser.error("--with-examples requires both --example-images and --example-descriptions, or --nearest-examples")
         
         example_images = [img.strip() for img in args.example_images.split(',')]
         example_descriptions = [desc.strip() for desc in args.example_descriptions.split(',')]
@@ -119,22 +365,73 @@ Examples:
             parser.error("Number of example images must match number of example descriptions")
     
     try:
-        # Initialize art descriptor
-        descriptor = ArtDescriptor()
+        # Build the example index if requested
+        if args.build_example_index:
+            build_example_index()
+            if not args.image and not args.bulk and not args.list_images and not args.serve:
+                return
         
-        # List images if requested
+        # List images if requested; this needs neither the API client nor an API key
         if args.list_images:
-            list_supported_images(args.input_dir)
+            list_supported_images(args.input_dir, args.recursive, args.include, args.exclude)
+            return
+        
+        # Merging shard outputs only reads files, so it needs no API key either
+        if merge:
+            if not merge_shard_outputs(args.input_dir, args.output_file, args.merge_shards or None,
+                                       args.recursive, args.include, args.exclude):
+                sys.exit(1)
+            return
+        
+        if args.queue:
+            run_queue_command(args.queue, args.input_dir, args.output_file, args.prompt, args.recursive,
+                              args.include, args.exclude, args.workers, args.concurrency,
+                              use_cache=not args.no_cache, refresh_cache=args.refresh, cascade=args.cascade)
+            return
+        
+        if args.serve:
+            serve_descriptions(args.host, args.port, use_cache=not args.no_cache, refresh_cache=args.refresh,
+                               cascade=args.cascade)
             return
         
+        if args.nearest_examples is not None:
+            from src.example_index import ExampleIndex
+            
+            example_index = ExampleIndex(top_k=args.nearest_examples)
+            if not len(example_index):
+                print("Error: The example index is empty; run with --build-example-index first")
+                sys.exit(1)
+        
+        # Initialize art descriptor
+        from src.art_descriptor import ArtDescriptor
+        
+        descriptor = ArtDescriptor(use_cache=not args.no_cache, refresh_cache=args.refresh, cascade=args.cascade)
+        
         # Process single image
         if args.image:
             if args.with_examples:
-                process_single_image_with_examples(descriptor, args.image, args.prompt, example_images, example_descriptions)
+                process_single_image_with_examples(descriptor, args.image, args.prompt, example_images, example_descriptions, example_index)
             else:
                 process_single_image(descriptor, args.image, args.prompt)
             return
         
+        # Watch the input directory
+        if args.bulk and args.watch:
+            watch_images(
+                descriptor,
+                args.input_dir,
+                args.output_file,
+                args.prompt,
+                args.concurrency,
+                example_images,
+                example_descriptions,
+                example_index,
+                args.recursive,
+                args.include,
+                args.exclude
+            )
+            return
+        
         # Process bulk images
         if args.bulk:
             if args.with_examples:
@@ -144,14 +441,33 @@ Examples:
                     args.output_file, 
                     args.prompt,
                     example_images,
-                    example_descriptions
+                    example_descriptions,
+                    args.concurrency,
+                    args.resume,
+                    args.batch_api,
+                    args.wait,
+                    example_index,
+                    args.recursive,
+                    args.include,
+                    args.exclude,
+                    args.pack,
+                    shard
                 )
             else:
                 results = process_bulk_images(
                     descriptor, 
                     args.input_dir, 
                     args.output_file, 
-                    args.prompt
+                    args.prompt,
+                    args.concurrency,
+                    args.resume,
+                    args.batch_api,
+                    args.wait,
+                    args.recursive,
+                    args.include,
+                    args.exclude,
+                    args.pack,
+                    shard
                 )
             
             # Export to CSV if requested
@@ -165,23 +481,151 @@ Examples:
         sys.exit(1)
 
 
-def list_supported_images(input_dir: str):
+def list_supported_images(input_dir: str, recursive: bool = False, include: list = None, exclude: list = None):
     """List all supported images in the input directory."""
-    from pathlib import Path
+    count = 0
+    for image_file in scan_images(input_dir, recursive, include, exclude):
+        if count == 0:
+            print(f"Supported images in {input_dir}:")
+        print(f"  - {os.path.relpath(image_file, input_dir)}")
+        count += 1
     
-    image_files = []
-    for ext in Config.SUPPORTED_FORMATS:
-        image_files.extend(Path(input_dir).glob(f"*{ext}"))
-        image_files.extend(Path(input_dir).glob(f"*{ext.upper()}"))
-    
-    if not image_files:
+    if not count:
         print(f"No supported image files found in {input_dir}")
         print(f"Supported formats: {', '.join(Config.SUPPORTED_FORMATS)}")
         return
     
-    print(f"Found {len(image_files)} supported images in {input_dir}:")
-    for image_file in sorted(image_files):
-        print(f"  - {image_file.name}")
+    print(f"Found {count} supported images in {input_dir}")
+
+
+def merge_shard_outputs(input_dir: str, output_file: str = None, count: int = None, recursive: bool = False, include: list = None, exclude: list = None) -> bool:
+    """Merge the shard outputs for input_dir; returns False if any image has no result."""
+    if output_file is None:
+        output_file = os.path.join('ai_descriptions', f'{os.path.basename(input_dir)}.json')
+    
+    report = merge_shards(output_file, input_dir, recursive, include, exclude, count)
+    print(f"Merged {report['images']} results from {report['count']} shards into {output_file}")
+    
+    def show(names: list, message: str):
+        if not names:
+            return
+        print(f"{len(names)} {message}:")
+        for name in names[:20]:
+            print(f"  - {name}")
+        if len(names) > 20:
+            print(f"  ... and {len(names) - 20} more")
+    
+    show(report['duplicates'], "images described by more than one shard (kept one result each)")
+    show(report['misplaced'], "images described by a shard they do not hash to (shards run with different file sets?)")
+    show(report['extra'], f"results for images no longer in {input_dir}")
+    show(report['failed'], "images failed; rerun their shard with --resume")
+    show(report['missing'], "images have no result in any shard; rerun their shard with --resume")
+    return not report['missing']
+
+
+def run_queue_command(command: str, input_dir: str, output_file: str = None, custom_prompt: str = None, recursive: bool = False, include: list = None, exclude: list = None, workers: int = 0, concurrency: int = 1, use_cache: bool = True, refresh_cache: bool = False, cascade: bool = False):
+    """Fill, work through, inspect or export the durable work queue."""
+    from src.work_queue import WorkQueue, run_workers
+    
+    queue = WorkQueue()
+    try:
+        if command == 'fill':
+            added, requeued = queue.enqueue(scan_images(input_dir, recursive, include, exclude), custom_prompt)
+            print(f"Queued {added} new images from {input_dir}" + (f", requeued {requeued} changed ones" if requeued else '')
+                  + f" ({queue.path})")
+        
+        elif command == 'work':
+            if queue.idle():
+                print(f"Nothing to do: no images are pending in {queue.path}")
+                return
+            # Checked here rather than in each worker process
+            Config.validate_config()
+            workers = workers or os.cpu_count() or 1
+            print(f"Starting {workers} worker processes with up to {concurrency} requests in flight each")
+            stop_on_sigterm()
+            try:
+                if run_workers(workers, concurrency, use_cache, refresh_cache, cascade):
+                    print("Some workers exited with an error; their images go back to the queue when their leases expire")
+            except KeyboardInterrupt:
+                print("Stopped; images being described were handed back to the queue")
+        
+        elif command == 'dead':
+            dead = queue.dead_letters()
+            if not dead:
+                print("No dead-lettered images")
+            for item in dead:
+                prompt = ' (custom prompt)' if item['prompt'] else ''
+                print(f"  - #{item['id']} {item['path']}{prompt}: {item['attempts']} attempts, {item['error']}")
+            return
+        
+        elif command == 'retry':
+            print(f"Requeued {queue.retry_dead()} dead-lettered images")
+        
+        elif command == 'export':
+            from src.output_writer import compact
+            
+            if output_file is None:
+                output_file = os.path.join('ai_descriptions', f'{os.path.basename(input_dir)}.json')
+            # First image of each name wins, as in a bulk run
+            results = {}
+            for result in queue.results(input_dir):
+                results.setdefault(result['filename'], result)
+            directory = os.path.dirname(output_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            compact(results, list(results), output_file)
+            print(f"Exported {len(results)} results for {input_dir} to {output_file}")
+        
+        status = queue.status()
+        print(f"Queue: {status['pending']} pending ({status['retrying']} waiting to retry), "
+              f"{status['leased']} leased by {status['workers']} workers ({status['expired']} expired), "
+              f"{status['done']} done, {status['dead']} dead")
+    finally:
+        queue.close()
+
+
+def stop_on_sigterm():
+    """Service managers stop long-running processes with SIGTERM; shut down the same way as on Ctrl+C."""
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+    
+    signal.signal(signal.SIGTERM, stop)
+
+
+def serve_descriptions(host: str, port: int, use_cache: bool = True, refresh_cache: bool = False,
+                       cascade: bool = False):
+    """Run the description service until interrupted, finishing queued jobs before exiting."""
+    from src.art_descriptor import ArtDescriptor
+    from src.description_service import DescriptionService, serve
+    
+    stop_on_sigterm()
+    service = DescriptionService(ArtDescriptor(use_cache=use_cache, refresh_cache=refresh_cache, cascade=cascade))
+    server = serve(service, host, port)
+    print(f"Description service listening on http://{host}:{server.server_address[1]} "
+          f"({service.workers} workers, queue of {service.queue.maxsize}, images from {service.image_root})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down, finishing queued jobs...")
+    finally:
+        server.server_close()
+        service.stop()
+
+
+def build_example_index():
+    """Build or update the nearest-neighbour example index from the reference descriptions."""
+    from src.example_index import ExampleIndex
+    
+    examples = ExampleIndex.collect_examples()
+    if not examples:
+        print("No reference descriptions with matching images found in real_descriptions/")
+        return
+    
+    index = ExampleIndex()
+    print(f"Indexing {len(examples)} examples with {index.model_name}...")
+    stats = index.update(examples)
+    print(f"Example index saved to {index.index_dir}: "
+          f"{stats['added']} embedded, {stats['reused']} unchanged, {stats['removed']} removed")
 
 
 def process_single_image(descriptor: ArtDescriptor, image_path: str, custom_prompt: str = None):
@@ -217,22 +661,48 @@ def process_single_image(descriptor: ArtDescriptor, image_path: str, custom_prom
         print(f"Error processing {image_path}: {result.get('error', 'Unknown error')}")
 
 
-def process_bulk_images(descriptor: ArtDescriptor, input_dir: str, output_file: str, custom_prompt: str = None):
+def process_bulk_images(descriptor: ArtDescriptor, input_dir: str, output_file: str, custom_prompt: str = None, concurrency: int = 1, resume: bool = False, batch_api: bool = False, wait: bool = False, recursive: bool = False, include: list = None, exclude: list = None, pack_size: int = 1, shard: tuple = None):
     """Process multiple images in bulk."""
     print(f"Starting bulk processing of images in: {input_dir}")
     if custom_prompt:
         print("Using custom prompt")
+    if batch_api:
+        print("Using the Batch API")
+    elif concurrency > 1:
+        print(f"Running up to {concurrency} requests concurrently")
     
-    results = descriptor.process_bulk_images(input_dir, output_file, custom_prompt)
+    results = descriptor.process_bulk_images(input_dir, output_file, custom_prompt, concurrency, resume, batch_api, wait, recursive, include, exclude, pack_size, shard)
     
     return results
 
 
-def process_single_image_with_examples(descriptor: ArtDescriptor, image_path: str, custom_prompt: str = None, example_images: list = None, example_descriptions: list = None):
+def watch_images(descriptor: ArtDescriptor, input_dir: str, output_file: str, custom_prompt: str = None, concurrency: int = 1, example_images: list = None, example_descriptions: list = None, example_index: ExampleIndex = None, recursive: bool = False, include: list = None, exclude: list = None):
+    """Describe images as they arrive in the input directory, until interrupted."""
+    if custom_prompt:
+        print("Using custom prompt")
+    if example_images:
+        print(f"Using {len(example_images)} example images for guidance")
+    
+    stop_on_sigterm()
+    return descriptor.watch_bulk_images(
+        input_dir,
+        output_file,
+        custom_prompt,
+        concurrency,
+        example_images,
+        example_descriptions,
+        example_index,
+        recursive,
+        include,
+        exclude
+    )
+
+
+def process_single_image_with_examples(descriptor: ArtDescriptor, image_path: str, custom_prompt: str = None, example_images: list = None, example_descriptions: list = None, example_index: ExampleIndex = None):
     """Process a single image with examples and display the result."""
     print(f"Processing image with examples: {image_path}")
     
-    result = descriptor.generate_description_with_examples(image_path, example_images, example_descriptions, custom_prompt)
+    result = descriptor.generate_description_with_examples(image_path, example_images, example_descriptions, custom_prompt, example_index)
     
     if result.get('status') == 'success':
         print("\n" + "="*50)
@@ -262,14 +732,21 @@ def process_single_image_with_examples(descriptor: ArtDescriptor, image_path: st
         print(f"Error processing {image_path}: {result.get('error', 'Unknown error')}")
 
 
-def process_bulk_images_with_examples(descriptor: ArtDescriptor, input_dir: str, output_file: str, custom_prompt: str = None, example_images: list = None, example_descriptions: list = None):
+def process_bulk_images_with_examples(descriptor: ArtDescriptor, input_dir: str, output_file: str, custom_prompt: str = None, example_images: list = None, example_descriptions: list = None, concurrency: int = 1, resume: bool = False, batch_api: bool = False, wait: bool = False, example_index: ExampleIndex = None, recursive: bool = False, include: list = None, exclude: list = None, pack_size: int = 1, shard: tuple = None):
     """Process multiple images in bulk with examples."""
     print(f"Starting bulk processing of images in: {input_dir}")
-    print(f"Using {len(example_images)} example images for guidance")
+    if example_index is not None:
+        print(f"Using the {example_index.top_k} nearest of {len(example_index)} indexed examples for each image")
+    else:
+        print(f"Using {len(example_images)} example images for guidance")
     if custom_prompt:
         print("Using custom prompt")
+    if batch_api:
+        print("Using the Batch API")
+    elif concurrency > 1:
+        print(f"Running up to {concurrency} requests concurrently")
     
-    results = descriptor.process_bulk_images_with_examples(input_dir, output_file, example_images, example_descriptions, custom_prompt)
+    results = descriptor.process_bulk_images_with_examples(input_dir, output_file, example_images, example_descriptions, custom_prompt, concurrency, resume, batch_api, wait, example_index, recursive, include, exclude, pack_size, shard)
     
     return results
 
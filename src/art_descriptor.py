@@ -1,33 +1,125 @@
 import os
 import json
+import time
 import base64
+import asyncio
+import itertools
+import threading
+import multiprocessing
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Optional
-import openai
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Dict, Optional, Tuple
 from PIL import Image
 import io
 from tqdm import tqdm
-import pandas as pd
 
 from .config import Config
+from .request_scheduler import RequestScheduler, estimate_text_tokens, estimate_image_tokens
+from .response_cache import ResponseCache, cache_key, examples_digest, file_digest
+from .near_duplicates import NearDuplicateIndex, context_key, perceptual_hash
+from .image_preprocessing import prepare_upload
+from .prepared_prompt import PreparedPrompt
+from .packed_requests import PACK_INSTRUCTIONS, pack_ids, id_label, parse_packed_response
+from .output_writer import (JsonlWriter, checkpoint_path, load_results, compact, is_error,
+                            load_watch_state, save_watch_state, run_file_path)
+from .batch_api import BatchJob
+from .example_index import ExampleIndex
+from .image_scanner import scan_images
+from .sharding import in_shard, shard_output_path
+from .image_manifest import ImageManifest
+from .usage_stats import UsageStats, model_prices, split_usage, usage_from_response
+from .quality_checks import check_description
+from .telemetry import Metrics
+
+# openai and pandas are imported where they are used, so commands that make no
+# requests (listing images, building the example index) start quickly
+if TYPE_CHECKING:
+    import openai
 
 
 class ArtDescriptor:
     """Main class for generating accessibility-focused descriptions of artwork images."""
     
-    def __init__(self):
-        """Initialize the ArtDescriptor with OpenAI client."""
+    def __init__(self, use_cache: bool = True, refresh_cache: bool = False, cascade: bool = None):
+        """
+        Initialize the ArtDescriptor with OpenAI client.
+        
+        Args:
+            use_cache: Serve repeated requests from the on-disk response cache, and
+                near duplicates of described images from the near-duplicate index
+            refresh_cache: Ignore cached descriptions but store the fresh ones
+            cascade: Describe with Config.CASCADE_FAST_MODEL first and send only the
+                descriptions that fail the quality checks to the main model
+                (defaults to Config.CASCADE)
+        """
         Config.validate_config()
-        self.client = openai.OpenAI(api_key=Config.OPENAI_API_KEY)
+        # Created on first use, see the client property
+        self._client = None
         self.model = Config.OPENAI_MODEL
+        self.cascade = Config.CASCADE if cascade is None else cascade
+        self.fast_model = Config.CASCADE_FAST_MODEL
+        self.max_tokens = 1000
+        self.temperature = 0.7
+        self.scheduler = RequestScheduler()
+        self.cache = ResponseCache() if use_cache else None
+        self.near_duplicates = NearDuplicateIndex() if use_cache and Config.USE_NEAR_DUPLICATES else None
+        self.refresh_cache = refresh_cache
+        self.preprocess_images = Config.PREPROCESS_IMAGES
+        # Per-image upload sizes recorded during a bulk run
+        self.upload_stats = []
+        # Where images described from a temporary copy came from, by the copy's absolute path;
+        # recorded in the near-duplicate index instead of a path that will not exist for long
+        self.image_sources = {}
+        # Encoded example images, so each one is read and encoded once however many prompts use it
+        self._example_images = {}
+        # Digests and metadata of the images in the current bulk run's input directory
+        self.manifest = None
+        # Token usage of the current bulk run, including prompt cache hits, in total and per model
+        self.usage = UsageStats()
+        self.model_usage = {}
+        # Per-stage timings and counters of the current bulk run
+        self.metrics = Metrics()
+        self._retries_at_start = 0
         
+    @property
+    def client(self) -> 'openai.OpenAI':
+        """OpenAI client, created when the first request is made."""
+        if self._client is None:
+            import openai
+            # Retries are handled by the scheduler so they count against the rate budget
+            self._client = openai.OpenAI(api_key=Config.OPENAI_API_KEY, base_url=Config.OPENAI_BASE_URL, max_retries=0)
+        return self._client
+    
     def encode_image(self, image_path: str) -> str:
         """Encode image to base64 string for OpenAI API."""
         with open(image_path, "rb") as image_file:
             return base64.b64encode(image_file.read()).decode('utf-8')
     
+    def prepare_image(self, image_path: str) -> Dict:
+        """
+        Load an image for upload, downsized and re-encoded unless preprocessing is disabled.
+        
+        Returns:
+            Dictionary with the 'data_url' to send, the uploaded 'size' in pixels and
+            the 'original_bytes' / 'bytes' sizes of the file and of the upload
+        """
+        return prepare_upload(image_path, self.preprocess_images)
+    
     def get_image_info(self, image_path: str) -> Dict:
         """Get basic information about an image."""
+        entry = self._manifest_entry(image_path)
+        if entry is not None:
+            if 'error' in entry:
+                return {'filename': os.path.basename(image_path), 'error': entry['error']}
+            return {
+                'filename': os.path.basename(image_path),
+                'format': entry['format'],
+                'size': (entry['width'], entry['height']),
+                'mode': entry['mode']
+            }
+        
         try:
             with Image.open(image_path) as img:
                 return {
@@ -42,6 +134,10 @@ class ArtDescriptor:
                 'error': str(e)
             }
     
+    def _manifest_entry(self, image_path: str) -> Optional[Dict]:
+        """Current manifest entry for image_path, if a bulk run's manifest covers it."""
+        return self.manifest.get(image_path) if self.manifest else None
+    
     def generate_description(self, image_path: str, custom_prompt: Optional[str] = None) -> Dict:
         """
         Generate a visual description for a single artwork image.
@@ -53,58 +149,1056 @@ class ArtDescriptor:
         Returns:
             Dictionary containing the description and metadata
         """
+        return self._describe(image_path, self.prepare_prompt(custom_prompt))
+    
+    def _describe(self, image_path: str, prompt: PreparedPrompt) -> Dict:
+        """Describe one image with the blocking client, through the model cascade when it is on."""
+        if not self.cascade:
+            return self._generate(image_path, prompt)
+        
         try:
-            # Validate image file
-            if not os.path.exists(image_path):
-                raise FileNotFoundError(f"Image file not found: {image_path}")
+            request = self._build_request(image_path, prompt)
+        except Exception as e:
+            request = None
+            result = self._error_result(image_path, e)
+        else:
+            result = self._generate(image_path, prompt, request=request)
+        
+        result = self._tiered(result, 'fast')
+        if self._should_escalate(result):
+            try:
+                request = self._escalation_request(image_path, prompt, request)
+            except Exception as e:
+                result = self._error_result(image_path, e)
+            else:
+                result = self._generate(image_path, prompt, request=request)
+            result = self._tiered(result, 'strong')
+        return result
+    
+    def _generate(self, image_path: str, prompt: PreparedPrompt, model: Optional[str] = None, request: Optional[Dict] = None) -> Dict:
+        """Describe one image with a prepared prompt using the blocking client, or send request if already built."""
+        try:
+            if request is None:
+                request = self._build_request(image_path, prompt, model)
             
-            # Get image info
-            image_info = self.get_image_info(image_path)
+            if 'description' in request:
+                return self._known_result(request)
             
-            # Encode image
-            base64_image = self.encode_image(image_path)
+            # Make API call
+            with self._time_request(request):
+                response = self.scheduler.create(self.client, request)
             
-            # Use custom prompt or default accessibility prompt
-            prompt = custom_prompt if custom_prompt else Config.ACCESSIBILITY_PROMPT
+            with self.metrics.time('parse'):
+                description = response.choices[0].message.content
+                tokens = self._record_usage(request['params']['model'], response.usage)
+            if not description:
+                # Refusals and content-filtered replies come back without content
+                return self._error_result(image_path, ValueError('empty response'))
+            self._store_cached(request, description)
             
-            # Make API call
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
+            return {
+                'filename': request['filename'],
+                'description': description,
+                **tokens
+            }
+            
+        except Exception as e:
+            return self._error_result(image_path, e)
+    
+    async def agenerate_description(self,
+                                    client: 'openai.AsyncOpenAI',
+                                    image_path: str,
+                                    prompt: PreparedPrompt) -> Dict:
+        """
+        Async counterpart of generate_description / generate_description_with_examples.
+        
+        Args:
+            client: Async OpenAI client to send the request with
+            image_path: Path to the image file
+            prompt: Prompt and examples from prepare_prompt, shared across images
+            
+        Returns:
+            Dictionary containing the description and metadata
+        """
+        # File reads and base64 encoding are blocking, keep them off the event loop
+        prepared = asyncio.ensure_future(asyncio.to_thread(self._build_request, image_path, prompt))
+        return await self._adescribe(client, image_path, prompt, prepared)
+    
+    def prepare_prompt(self,
+                       custom_prompt: Optional[str] = None,
+                       example_images: List[str] = None,
+                       example_descriptions: List[str] = None,
+                       example_index: Optional[ExampleIndex] = None) -> PreparedPrompt:
+        """
+        Validate the example set and encode the prompt and example images once.
+        
+        Args:
+            custom_prompt: Optional custom prompt to override the default accessibility prompt
+            example_images: Optional list of paths to example images for reference
+            example_descriptions: Optional list of descriptions matching example_images
+            example_index: Optional index to pick the most similar examples for each image
+                instead of a fixed example set
+            
+        Returns:
+            PreparedPrompt to pass to every request of a run
+        """
+        # Use custom prompt or default accessibility prompt
+        prompt = custom_prompt if custom_prompt else Config.ACCESSIBILITY_PROMPT
+        
+        if example_index is not None and not example_images:
+            # Examples are chosen per image when each request is built
+            return PreparedPrompt(prompt, example_index=example_index)
+        
+        if not (example_images and example_descriptions):
+            return PreparedPrompt(prompt)
+        
+        # Validate example inputs
+        if len(example_images) != len(example_descriptions):
+            raise ValueError("Number of example images must match number of example descriptions")
+        
+        for example_img in example_images:
+            if not os.path.exists(example_img):
+                raise FileNotFoundError(f"Example image not found: {example_img}")
+        
+        example_parts = []
+        image_tokens = 0
+        example_text = "\nHere are some examples of the type of description I want:\n\n"
+        for i, (example_img, example_desc) in enumerate(zip(example_images, example_descriptions)):
+            example_image = self._prepare_example_image(example_img)
+            image_tokens += estimate_image_tokens(*example_image['size'])
+            example_text += f"EXAMPLE {i+1}:\n"
+            example_text += f"Image: {os.path.basename(example_img)}\n"
+            example_text += f"Description: {example_desc}\n\n"
+            example_parts.append({
+                "type": "image_url",
+                "image_url": {
+                    "url": example_image['data_url']
+                }
+            })
+        
+        digest = ''
+        if self.cache:
+            digest = examples_digest(
+                [self._prepare_example_image(example_img)['digest'] for example_img in example_images],
+                example_descriptions
+            )
+        
+        return PreparedPrompt(prompt + example_text, example_parts, image_tokens, digest)
+    
+    def _prepare_example_image(self, image_path: str) -> Dict:
+        """Encode an example image once and reuse it for every prompt that includes it."""
+        if image_path not in self._example_images:
+            example_image = self.prepare_image(image_path)
+            example_image['digest'] = file_digest(image_path)
+            self._example_images[image_path] = example_image
+        return self._example_images[image_path]
+    
+    def _nearest_examples_prompt(self, image_path: str, prompt: PreparedPrompt) -> PreparedPrompt:
+        """Build the prompt for image_path with the most similar examples from the prompt's index."""
+        index = prompt.example_index
+        matches = index.search(image_path, index.top_k, exclude_digest=file_digest(image_path))
+        return self.prepare_prompt(
+            prompt.text,
+            [match['image_path'] for match in matches],
+            [match['description'] for match in matches]
+        )
+    
+    def _build_request(self, image_path: str, prompt: PreparedPrompt, model: Optional[str] = None) -> Dict:
+        """
+        Validate the image, consult the response cache and build the chat completion request for it.
+        
+        Returns:
+            Dictionary with the target 'filename' and either the cached 'description', or the
+            'params' for chat.completions.create, the 'estimated_tokens' the request counts
+            against the rate limit and the 'cache_key' to store the response under
+        """
+        lookup = self._lookup_request(image_path, prompt, model)
+        if 'description' in lookup:
+            return lookup
+        
+        # Downsize and encode target image
+        return self._finish_request(lookup, self.prepare_image(image_path))
+    
+    def _escalation_request(self, image_path: str, prompt: PreparedPrompt, request: Optional[Dict]) -> Dict:
+        """
+        Request for the main model after the cascade's fast tier failed.
+        
+        Reuses the encoded image and prompt of the fast tier's request, changing
+        only the model, so the image is not read and encoded a second time. The
+        main model's own cache entry is still looked up first. Without a sent
+        fast-tier request (it was answered from the cache or failed to build)
+        the request is built from scratch.
+        """
+        if not request or 'params' not in request:
+            return self._build_request(image_path, prompt, self.model)
+        
+        lookup = self._lookup_request(image_path, request['prompt'], self.model, request.get('digest'))
+        if 'description' in lookup:
+            return lookup
+        return dict(
+            request,
+            params=dict(request['params'], model=self.model),
+            cache_key=lookup['cache_key'],
+            index_entry=lookup['index_entry']
+        )
+    
+    def _lookup_request(self, image_path: str, prompt: PreparedPrompt, model: Optional[str] = None, digest: Optional[str] = None) -> Dict:
+        """
+        First half of _build_request: validate the image, pick its prompt and consult the response cache.
+        
+        model defaults to the first model to try: the cascade's fast model when
+        the cascade is on, otherwise self.model. digest is the image's content
+        digest if already known.
+        
+        Returns:
+            Dictionary with the 'filename' and either the cached 'description', or the
+            'image_path', 'prompt', 'model', 'digest' and 'cache_key' to finish the request with
+        """
+        model = model or (self.fast_model if self.cascade else self.model)
+        # Validate image file
+        if not os.path.exists(image_path):
+            raise FileNotFoundError(f"Image file not found: {image_path}")
+        
+        if prompt.example_index is not None:
+            prompt = self._nearest_examples_prompt(image_path, prompt)
+        
+        # Look up the response cache before doing any image work
+        key = None
+        index_entry = None
+        if self.cache:
+            # The manifest supplies the digest without reading the file again
+            with self.metrics.time('image_info'):
+                entry = self._manifest_entry(image_path)
+                if digest is None:
+                    digest = entry['digest'] if entry else file_digest(image_path)
+            key = cache_key(
+                digest,
+                prompt.text,
+                prompt.examples_digest,
+                model,
+                self.max_tokens,
+                self.temperature
+            )
+            with self.metrics.time('cache_lookup'):
+                cached = None if self.refresh_cache else self.cache.get(key)
+            if cached is not None:
+                self.metrics.add('response_cache_hits')
+                return {
+                    'filename': os.path.basename(image_path),
+                    'description': cached
+                }
+            
+            # Then the near-duplicate index, for re-scans and copies that differ in their bytes
+            if self.near_duplicates is not None:
+                with self.metrics.time('duplicate_lookup'):
+                    index_entry, match = self._find_near_duplicate(image_path, entry, digest, prompt, model)
+                if match is not None:
+                    self.metrics.add('near_duplicates')
+                    return {
+                        'filename': os.path.basename(image_path),
+                        'description': match['description'],
+                        'reused_from': {'path': match['path'], 'digest': match['digest'], 'distance': match['distance']}
+                    }
+        
+        return {
+            'filename': os.path.basename(image_path),
+            'image_path': image_path,
+            'prompt': prompt,
+            'model': model,
+            'digest': digest,
+            'cache_key': key,
+            'index_entry': index_entry
+        }
+    
+    def _find_near_duplicate(self, image_path: str, entry: Optional[Dict], digest: str, prompt: PreparedPrompt, model: str) -> tuple:
+        """
+        Look image_path up in the near-duplicate index.
+        
+        Returns:
+            The 'index_entry' to record the image under once it is described (None if it
+            has no usable hash), and the closest near duplicate already described, or None
+        """
+        algorithm = Config.PERCEPTUAL_HASH
+        image_hash = entry[algorithm] if entry and algorithm in entry else perceptual_hash(image_path, algorithm)
+        if image_hash is None:
+            return None, None
+        
+        context = context_key(algorithm, prompt.text, prompt.examples_digest, model, self.max_tokens, self.temperature)
+        path = os.path.abspath(image_path)
+        index_entry = {
+            'image_hash': image_hash,
+            'context': context,
+            'digest': digest,
+            'path': self.image_sources.get(path, path)
+        }
+        match = None if self.refresh_cache else self.near_duplicates.find(image_hash, context)
+        return index_entry, match
+    
+    def _finish_request(self, lookup: Dict, image: Dict, record_upload: bool = True) -> Dict:
+        """
+        Second half of _build_request: add the encoded image from prepare_image to the request.
+        
+        record_upload is False when the image was already recorded for another request.
+        """
+        prompt = lookup['prompt']
+        if record_upload:
+            self._record_upload(lookup, image)
+        
+        # Prompt text and example images are shared by every request of the run and
+        # come first, so requests share a byte-identical prefix for the API's prompt cache
+        user_content = list(prompt.prefix_parts)
+        image_tokens = prompt.image_tokens + estimate_image_tokens(*image['size'])
+        
+        # Add target image, the only per-image content, last
+        user_content.append({
+            "type": "image_url",
+            "image_url": {
+                "url": image['data_url']
+            }
+        })
+        
+        return {
+            'filename': lookup['filename'],
+            'params': {
+                'model': lookup['model'],
+                'messages': [
                     {
                         "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
-                                }
-                            }
-                        ]
+                        "content": user_content
                     }
                 ],
-                max_tokens=1000,
-                temperature=0.7
+                'max_tokens': self.max_tokens,
+                'temperature': self.temperature
+            },
+            # The API counts max_tokens against the token limit up front
+            'estimated_tokens': estimate_text_tokens(user_content[0]["text"]) + image_tokens + self.max_tokens,
+            'prompt': prompt,
+            'digest': lookup.get('digest'),
+            'cache_key': lookup['cache_key'],
+            'index_entry': lookup.get('index_entry')
+        }
+    
+    def _record_upload(self, lookup: Dict, image: Dict):
+        """Record an encoded image's upload size and preparation timings."""
+        self.upload_stats.append({
+            'filename': lookup['filename'],
+            'original_bytes': image['original_bytes'],
+            'uploaded_bytes': image['bytes']
+        })
+        for stage, seconds in image.get('timings', {}).items():
+            self.metrics.observe(stage, seconds)
+        self.metrics.add('bytes_read', image['original_bytes'])
+        self.metrics.add('bytes_uploaded', image['bytes'])
+    
+    def _packed_request(self, lookups: List[Dict], images: List[Dict], ids: List[str], prompt: PreparedPrompt) -> Dict:
+        """Build one request describing several images, each labelled with its ID, answered as a JSON object."""
+        user_content = list(prompt.prefix_parts)
+        image_tokens = prompt.image_tokens
+        for lookup, image, image_id in zip(lookups, images, ids):
+            self._record_upload(lookup, image)
+            image_tokens += estimate_image_tokens(*image['size'])
+            user_content.append(id_label(image_id))
+            user_content.append({
+                "type": "image_url",
+                "image_url": {
+                    "url": image['data_url']
+                }
+            })
+        
+        max_tokens = min(self.max_tokens * len(lookups), Config.PACK_MAX_TOKENS)
+        return {
+            'filename': ', '.join(lookup['filename'] for lookup in lookups),
+            'params': {
+                'model': lookups[0]['model'],
+                'messages': [
+                    {
+                        "role": "user",
+                        "content": user_content
+                    }
+                ],
+                'max_tokens': max_tokens,
+                'temperature': self.temperature,
+                'response_format': {"type": "json_object"}
+            },
+            'estimated_tokens': estimate_text_tokens(prompt.text) + 10 * len(ids) + image_tokens + max_tokens
+        }
+    
+    def _describe_pack(self, image_paths: List[str], packed_prompt: PreparedPrompt, prompt: PreparedPrompt) -> List[Dict]:
+        """
+        Describe a pack of images with a single request where possible.
+        
+        Cached images are answered from the cache and the rest are sent
+        together. Any image whose section of the reply is missing or malformed,
+        or whose pack request fails outright, is retried on its own with the
+        ordinary single-image prompt.
+        
+        Returns:
+            Results in the order of image_paths
+        """
+        results = {}
+        lookups, images = [], []
+        for image_path in image_paths:
+            try:
+                lookup = self._lookup_request(image_path, packed_prompt)
+                if 'description' in lookup:
+                    results[image_path] = self._known_result(lookup)
+                    continue
+                images.append(self.prepare_image(image_path))
+                lookups.append(lookup)
+            except Exception as e:
+                results[image_path] = self._error_result(image_path, e)
+        
+        retry = []
+        if len(lookups) == 1:
+            self._record_upload(lookups[0], images[0])
+            retry = list(zip(lookups, images))
+        elif lookups:
+            ids = pack_ids(len(lookups))
+            try:
+                request = self._packed_request(lookups, images, ids, packed_prompt)
+                with self.metrics.time('request'):
+                    response = self.scheduler.create(self.client, request)
+                with self.metrics.time('parse'):
+                    tokens = self._record_usage(request['params']['model'], response.usage)
+                    descriptions, failed = parse_packed_response(response.choices[0].message.content, ids)
+                self.metrics.add('packed_requests')
+            except Exception as e:
+                print(f"Packed request for {len(lookups)} images failed ({e}), sending them one at a time")
+                descriptions, failed = {}, ids
+            
+            # The images described by the pack share its usage; the ones retried report their own request's
+            shares = iter(split_usage(tokens, len(descriptions))) if descriptions else None
+            for image_id, lookup in zip(ids, lookups):
+                if image_id in descriptions:
+                    results[lookup['image_path']] = {
+                        'filename': lookup['filename'],
+                        'description': descriptions[image_id],
+                        **next(shares)
+                    }
+                    self._store_cached(lookup, descriptions[image_id])
+            retry = [(lookup, image) for image_id, lookup, image in zip(ids, lookups, images) if image_id in failed]
+            self.metrics.add('pack_retries', len(retry))
+        
+        for lookup, image in retry:
+            try:
+                request = self._lookup_request(lookup['image_path'], prompt, digest=lookup['digest'])
+                if 'description' not in request:
+                    # Encoded and recorded for the pack already
+                    request = self._finish_request(request, image, record_upload=False)
+            except Exception as e:
+                result = self._error_result(lookup['image_path'], e)
+            else:
+                result = self._generate(lookup['image_path'], prompt, request=request)
+            results[lookup['image_path']] = result
+            if not is_error(result):
+                # Also under the packed key, so a rerun finds it without sending it again
+                self._store_cached(lookup, result['description'])
+        return [results[image_path] for image_path in image_paths]
+    
+    def _describe_images_packed(self,
+                                image_files: Iterator[Path],
+                                desc: str,
+                                concurrency: int,
+                                prompt: PreparedPrompt,
+                                pack_size: int,
+                                writer: Optional[JsonlWriter] = None) -> List[Dict]:
+        """
+        Describe image_files pack_size images per request, with up to `concurrency` requests in flight.
+        
+        The prompt, and any examples, are sent once per pack instead of once per
+        image, which saves most of the prompt tokens when the images are small.
+        Results are returned in input order.
+        """
+        packed_prompt = PreparedPrompt(
+            prompt.text + PACK_INSTRUCTIONS,
+            prompt.example_parts,
+            prompt.image_tokens,
+            prompt.examples_digest
+        )
+        packs = iter(lambda: [str(image_path) for image_path in itertools.islice(image_files, pack_size)], [])
+        # Created up front so the worker threads do not race to create it
+        self.client
+        
+        def describe(pack: List[str]) -> List[Dict]:
+            pack_results = self._describe_pack(pack, packed_prompt, prompt)
+            for result in pack_results:
+                if writer:
+                    writer.write(result)
+            progress.update(len(pack_results))
+            return pack_results
+        
+        results = []
+        with ThreadPoolExecutor(max_workers=concurrency) as executor, tqdm(desc=desc, unit='image') as progress:
+            # A bounded window of packs rather than executor.map, which would read the
+            # whole scan up front; finished packs are collected in input order
+            in_flight = deque()
+            for pack in packs:
+                in_flight.append(executor.submit(describe, pack))
+                if len(in_flight) >= 2 * concurrency:
+                    results.extend(in_flight.popleft().result())
+            while in_flight:
+                results.extend(in_flight.popleft().result())
+        return results
+    
+    def _store_cached(self, request: Dict, description: str):
+        """
+        Save a successful description in the response cache and the near-duplicate index.
+        
+        The description has already been paid for, so a failed write (e.g. the
+        database is locked by another process) is reported and counted but does
+        not turn the result into an error.
+        """
+        try:
+            if self.cache and request.get('cache_key') and description:
+                self.cache.put(request['cache_key'], description)
+            if self.near_duplicates is not None and request.get('index_entry') and description:
+                self.near_duplicates.add(description=description, **request['index_entry'])
+        except Exception as e:
+            self.metrics.add('cache_write_errors')
+            print(f"Warning: could not cache the description of {request.get('filename')}: {e}")
+    
+    @staticmethod
+    def _error_result(image_path: str, error: Exception) -> Dict:
+        return {
+            'filename': os.path.basename(image_path),
+            'description': f"Error: {str(error)}"
+        }
+    
+    @staticmethod
+    def _known_result(request: Dict) -> Dict:
+        """Result for a request answered without an API call, tagged with its source if it was a near duplicate."""
+        result = {
+            'filename': request['filename'],
+            'description': request['description'],
+            # No tokens were spent on it
+            **usage_from_response(None)
+        }
+        if 'reused_from' in request:
+            result['reused_from'] = request['reused_from']
+        return result
+    
+    def _tiered(self, result: Dict, tier: str) -> Dict:
+        """Tag a cascade result with its tier ('fast' or 'strong') and model, and any quality checks it fails."""
+        tagged = dict(result, tier=tier, model=self.fast_model if tier == 'fast' else self.model)
+        if not is_error(result):
+            issues = check_description(result.get('description'))
+            if issues:
+                tagged['quality_issues'] = issues
+        return tagged
+    
+    def _should_escalate(self, result: Dict) -> bool:
+        """Whether a fast-tier result has to be sent again to the main model."""
+        if is_error(result) or result.get('quality_issues'):
+            self.metrics.add('escalations')
+            return True
+        return False
+    
+    @contextmanager
+    def _time_request(self, request: Dict):
+        """Time an API request, and in cascade mode also as a sample of its tier."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.metrics.observe('request', seconds)
+            if self.cascade:
+                tier = 'fast' if request['params']['model'] == self.fast_model else 'strong'
+                self.metrics.observe(f'request_{tier}', seconds)
+    
+    def _record_usage(self, model: str, usage) -> Dict:
+        """Add a response's token usage to the run totals and to its model's, and return its token counts."""
+        # setdefault, so worker threads recording the same new model share one entry
+        self.model_usage.setdefault(model, UsageStats()).record(usage)
+        return self.usage.record(usage)
+    
+    def _model_costs(self) -> Dict[str, float]:
+        """Estimated cost in USD of the current run per model, for the models with known prices."""
+        costs = {}
+        for model, usage in self.model_usage.items():
+            prices = model_prices(model, Config.MODEL_PRICES)
+            if prices:
+                costs[model] = usage.cost(prices)
+        return costs
+    
+    def _report_upload_savings(self, output_file: str):
+        """Save per-image upload sizes next to the output file and print the total saved."""
+        if not self.upload_stats:
+            return
+        
+        stats = sorted(self.upload_stats, key=lambda s: s['filename'])
+        for entry in stats:
+            entry['bytes_saved'] = entry['original_bytes'] - entry['uploaded_bytes']
+        
+        original = sum(entry['original_bytes'] for entry in stats)
+        uploaded = sum(entry['uploaded_bytes'] for entry in stats)
+        report = {
+            'total_original_bytes': original,
+            'total_uploaded_bytes': uploaded,
+            'total_bytes_saved': original - uploaded,
+            'images': stats
+        }
+        
+        report_file = run_file_path(output_file, 'uploads')
+        os.makedirs(os.path.dirname(report_file), exist_ok=True)
+        with open(report_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        
+        saved_pct = (original - uploaded) / original * 100 if original else 0
+        print(f"Uploads: {uploaded / 1024:.0f} KB sent for {original / 1024:.0f} KB of images "
+              f"({(original - uploaded) / 1024:.0f} KB, {saved_pct:.1f}% saved), details in {report_file}")
+    
+    def _report_manifest(self):
+        """Print how many images the manifest had to inspect during the last bulk run."""
+        if not self.manifest:
+            return
+        print(f"Manifest: {self.manifest.inspected} images inspected, {self.manifest.reused} unchanged "
+              f"({self.manifest.path})")
+    
+    def _report_usage(self):
+        """Print the run's token usage and the share of prompt tokens served from the API's prompt cache."""
+        if not self.usage.requests:
+            return
+        print(f"Tokens: {self.usage.prompt_tokens} prompt ({self.usage.cached_tokens} from the prompt cache, "
+              f"{self.usage.cache_hit_ratio:.1%}), {self.usage.completion_tokens} completion "
+              f"over {self.usage.requests} requests")
+        costs = self._model_costs()
+        if costs:
+            print(f"Estimated cost: ${sum(costs.values()):.4f} "
+                  f"({', '.join(f'{model} ${cost:.4f}' for model, cost in sorted(costs.items()))})")
+    
+    def _report_metrics(self, output_file: str, results: List[Dict]):
+        """Print per-stage latencies and write them to `<output>.run/metrics.json` (and a Prometheus file if configured)."""
+        self.metrics.counters['images'] = len(results)
+        self.metrics.counters['errors'] = sum(1 for result in results if is_error(result))
+        costs = self._model_costs()
+        summary = self.metrics.summary({
+            'retries': self.scheduler.retries - self._retries_at_start,
+            'requests': self.usage.requests,
+            'prompt_tokens': self.usage.prompt_tokens,
+            'cached_tokens': self.usage.cached_tokens,
+            'completion_tokens': self.usage.completion_tokens,
+            'cost_usd': round(sum(costs.values()), 6)
+        })
+        summary['models'] = {
+            model: {**usage.to_dict(), 'cost_usd': round(costs[model], 6) if model in costs else None}
+            for model, usage in self.model_usage.items()
+        }
+        # Batch API runs send everything to the main model and have no tiers
+        tiered = self.cascade and any('tier' in result for result in results)
+        if tiered:
+            summary['tiers'] = self._tier_summary(results, summary)
+        
+        root, _ = os.path.splitext(output_file)
+        metrics_file = run_file_path(output_file, 'metrics')
+        os.makedirs(os.path.dirname(metrics_file), exist_ok=True)
+        self.metrics.write_json(metrics_file, summary)
+        if Config.PROMETHEUS_TEXTFILE:
+            self.metrics.write_prometheus(Config.PROMETHEUS_TEXTFILE, summary, os.path.basename(root))
+        
+        print(f"Throughput: {summary['images_per_second']} images/s over {summary['elapsed_seconds']}s, "
+              f"{summary['counters']['retries']} retries, details in {metrics_file}")
+        for stage, stats in summary['stages'].items():
+            print(f"  {stage:<16} p50 {stats['p50_seconds'] * 1000:8.1f} ms  p95 {stats['p95_seconds'] * 1000:8.1f} ms  "
+                  f"p99 {stats['p99_seconds'] * 1000:8.1f} ms  ({stats['count']} samples)")
+        if tiered:
+            self._report_tiers(summary['tiers'])
+    
+    def _tier_summary(self, results: List[Dict], summary: Dict) -> Dict:
+        """Images produced, requests, request latency and cost of each cascade tier."""
+        tiers = {}
+        for tier, model in (('fast', self.fast_model), ('strong', self.model)):
+            stage = summary['stages'].get(f'request_{tier}', {})
+            model_summary = summary['models'].get(model, {})
+            tiers[tier] = {
+                'model': model,
+                'images': sum(1 for result in results if result.get('tier') == tier and not is_error(result)),
+                'requests': model_summary.get('requests', 0),
+                'p50_seconds': stage.get('p50_seconds', 0.0),
+                'p95_seconds': stage.get('p95_seconds', 0.0),
+                'cost_usd': model_summary.get('cost_usd') if model_summary else 0.0
+            }
+        tiers['strong']['escalations'] = self.metrics.counters.get('escalations', 0)
+        return tiers
+    
+    def _report_tiers(self, tiers: Dict):
+        """Print the cascade tiers of the run."""
+        fast, strong = tiers['fast'], tiers['strong']
+        print(f"Cascade: {fast['images']} images described by {fast['model']}, "
+              f"{strong['escalations']} escalated to {strong['model']}")
+        for tier, stats in tiers.items():
+            cost = f"${stats['cost_usd']:.4f}" if stats['cost_usd'] is not None else 'cost unknown'
+            print(f"  {tier:<6} {stats['model']:<14} {stats['requests']:6} requests  "
+                  f"p50 {stats['p50_seconds'] * 1000:8.1f} ms  p95 {stats['p95_seconds'] * 1000:8.1f} ms  {cost}")
+    
+    def _report_cache(self):
+        """Evict stale cache entries and print hit/miss statistics for the run."""
+        if not self.cache:
+            return
+        
+        self.cache.evict()
+        stats = self.cache.stats()
+        print(f"Cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']} hit rate), "
+              f"{stats['entries']} entries stored")
+        if self.near_duplicates is not None and self.metrics.counters.get('near_duplicates'):
+            print(f"Near duplicates: {self.metrics.counters['near_duplicates']} descriptions reused "
+                  f"from similar images ({len(self.near_duplicates)} images indexed)")
+    
+    def _describe_images(self,
+                         image_files: Iterable[Path],
+                         desc: str,
+                         concurrency: int = 1,
+                         custom_prompt: Optional[str] = None,
+                         example_images: List[str] = None,
+                         example_descriptions: List[str] = None,
+                         writer: Optional[JsonlWriter] = None,
+                         example_index: Optional[ExampleIndex] = None,
+                         pack_size: int = 1) -> List[Dict]:
+        """
+        Describe images, in input order, shared by both bulk methods.
+        
+        With concurrency of 1 images are described one after another with the
+        blocking client. Higher values run the async engine, which keeps at most
+        `concurrency` requests in flight at once. With pack_size above 1, that
+        many images share each request instead. Each result is appended to
+        writer as soon as it completes. image_files may be a lazy iterator, such
+        as a directory scan, which is consumed as images are described.
+        """
+        self.upload_stats = []
+        image_files = iter(image_files)
+        first = next(image_files, None)
+        if first is None:
+            return []
+        image_files = itertools.chain([first], image_files)
+        
+        try:
+            # Examples are read and encoded once for the whole run
+            prompt = self.prepare_prompt(custom_prompt, example_images, example_descriptions, example_index)
+        except Exception as e:
+            results = [
+                {'filename': os.path.basename(image_path), 'description': f"Error: {str(e)}"}
+                for image_path in image_files
+            ]
+            for result in results:
+                if writer:
+                    writer.write(result)
+            return results
+        
+        if prompt.example_count:
+            print(f"Prepared {prompt.example_count} examples once for all images "
+                  f"({prompt.memory_bytes() / 1024:.0f} KB held in memory)")
+        elif prompt.example_index is not None:
+            print(f"Choosing the {prompt.example_index.top_k} most similar of "
+                  f"{len(prompt.example_index)} indexed examples for each image")
+        
+        if pack_size > 1:
+            if self.cascade:
+                print("The model cascade checks every description on its own, so images are sent one per request")
+            elif prompt.example_index is None:
+                print(f"Packing up to {pack_size} images per request")
+                return self._describe_images_packed(image_files, desc, concurrency, prompt, pack_size, writer)
+            else:
+                print("Nearest examples differ for every image, so images are sent one per request")
+        
+        if concurrency <= 1:
+            results = []
+            for image_path in tqdm(image_files, desc=desc, unit='image'):
+                result = self._describe(str(image_path), prompt)
+                if writer:
+                    writer.write(result)
+                results.append(result)
+            return results
+        
+        return asyncio.run(self._describe_images_async(image_files, desc, concurrency, prompt, writer))
+    
+    async def _describe_images_async(self,
+                                     image_files: Iterator[Path],
+                                     desc: str,
+                                     concurrency: int,
+                                     prompt: PreparedPrompt,
+                                     writer: Optional[JsonlWriter] = None) -> List[Dict]:
+        """
+        Describe image_files with a preparation stage feeding a bounded pool of request workers.
+        
+        A producer looks each image up in the response cache and hands the
+        decode, resize and base64 work of misses to a process pool, so it runs
+        in parallel without holding the GIL the event loop needs. image_files
+        is iterated on a thread of its own, since scanning and hashing new
+        images for the manifest would otherwise stall the requests in flight.
+        Requests in
+        preparation are passed to the `concurrency` request workers through a
+        bounded queue, which keeps preparation ahead of the network without
+        holding more than a few payloads in memory. Results are collected in
+        input order.
+        """
+        results = {}
+        queue = asyncio.Queue(maxsize=Config.PREPARE_QUEUE_SIZE or concurrency * 2)
+        executor = None
+        if Config.PREPARE_WORKERS > 1:
+            # Spawned rather than forked, since the event loop is already running threads
+            executor = ProcessPoolExecutor(
+                max_workers=Config.PREPARE_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
             )
+        
+        async def prepare(image_path: str) -> Dict:
+            lookup = await asyncio.to_thread(self._lookup_request, image_path, prompt)
+            if 'description' in lookup:
+                return lookup
+            loop = asyncio.get_running_loop()
+            image = await loop.run_in_executor(executor, prepare_upload, image_path, self.preprocess_images)
+            return self._finish_request(lookup, image)
+        
+        loop = asyncio.get_running_loop()
+        stopping = threading.Event()
+        
+        async def enqueue(index: int, image_path: str):
+            if stopping.is_set():
+                return
+            # Blocks while the queue is full, so preparation stays a bounded distance ahead
+            await queue.put((index, image_path, asyncio.ensure_future(prepare(image_path))))
+        
+        def scan():
+            for index, image_path in enumerate(image_files):
+                if stopping.is_set():
+                    return
+                asyncio.run_coroutine_threadsafe(enqueue(index, str(image_path)), loop).result()
+        
+        async def producer():
+            try:
+                await asyncio.to_thread(scan)
+            finally:
+                for _ in range(concurrency):
+                    await queue.put(None)
+        
+        import openai
+        
+        # The async client is bound to the running event loop, so each bulk run gets its own
+        try:
+            async with openai.AsyncOpenAI(api_key=Config.OPENAI_API_KEY, base_url=Config.OPENAI_BASE_URL, max_retries=0) as client:
+                with tqdm(desc=desc, unit='image') as progress:
+                    async def worker():
+                        while True:
+                            item = await queue.get()
+                            if item is None:
+                                return
+                            index, image_path, prepared = item
+                            results[index] = await self._adescribe(client, image_path, prompt, prepared)
+                            if writer:
+                                writer.write(results[index])
+                            progress.update(1)
+                    
+                    await asyncio.gather(producer(), *(worker() for _ in range(concurrency)))
+        finally:
+            # Lets the scanning thread finish if the run ends early
+            stopping.set()
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+        
+        return [results[index] for index in range(len(results))]
+    
+    async def _adescribe(self, client: 'openai.AsyncOpenAI', image_path: str, prompt: PreparedPrompt, prepared: asyncio.Future) -> Dict:
+        """Async counterpart of _describe, for a request already in preparation."""
+        result = await self._send_prepared(client, image_path, prepared)
+        if not self.cascade:
+            return result
+        
+        result = self._tiered(result, 'fast')
+        if self._should_escalate(result):
+            request = None if prepared.exception() else prepared.result()
+            prepared = asyncio.ensure_future(asyncio.to_thread(self._escalation_request, image_path, prompt, request))
+            result = self._tiered(await self._send_prepared(client, image_path, prepared), 'strong')
+        return result
+    
+    async def _send_prepared(self, client: 'openai.AsyncOpenAI', image_path: str, prepared: asyncio.Future) -> Dict:
+        """Wait for a request from the preparation stage, send it and return the result."""
+        try:
+            request = await prepared
+            
+            if 'description' in request:
+                return self._known_result(request)
             
-            description = response.choices[0].message.content
+            with self._time_request(request):
+                response = await self.scheduler.acreate(client, request)
+            
+            with self.metrics.time('parse'):
+                description = response.choices[0].message.content
+                tokens = self._record_usage(request['params']['model'], response.usage)
+            if not description:
+                # Refusals and content-filtered replies come back without content
+                return self._error_result(image_path, ValueError('empty response'))
+            await asyncio.to_thread(self._store_cached, request, description)
             
             return {
-                'filename': image_info['filename'],
-                'description': description
+                'filename': request['filename'],
+                'description': description,
+                **tokens
             }
             
         except Exception as e:
-            return {
-                'filename': os.path.basename(image_path),
-                'description': f"Error: {str(e)}"
-            }
+            return self._error_result(image_path, e)
+    
+    def _run_bulk(self,
+                  image_files: Iterable[Path],
+                  output_file: str,
+                  desc: str,
+                  concurrency: int,
+                  custom_prompt: Optional[str] = None,
+                  example_images: List[str] = None,
+                  example_descriptions: List[str] = None,
+                  resume: bool = False,
+                  batch_api: bool = False,
+                  wait: bool = False,
+                  example_index: Optional[ExampleIndex] = None,
+                  pack_size: int = 1) -> List[Dict]:
+        """
+        Describe image_files with a crash-safe JSONL checkpoint, then write the JSON array output.
+        
+        Every result is appended to `<output>.jsonl` as it completes. With resume,
+        images that already have a successful result in the existing output or
+        checkpoint are skipped, so only errors and missing files are retried.
+        With batch_api the images are sent through the Batch API instead.
+        
+        Results are keyed by filename, so when a recursive scan finds the same
+        filename in several directories only the first is described.
+        """
+        self.usage = UsageStats()
+        self.model_usage = {}
+        self.metrics = Metrics()
+        self._retries_at_start = self.scheduler.retries
+        previous = load_results(output_file) if resume else {}
+        done = {filename for filename, result in previous.items() if not is_error(result)}
+        
+        filenames = []
+        skipped = []
+        
+        def unique_images():
+            seen = set()
+            for image_path in image_files:
+                if image_path.name in seen:
+                    print(f"Skipping {image_path}: another image named {image_path.name} was already found")
+                    continue
+                seen.add(image_path.name)
+                filenames.append(image_path.name)
+                yield image_path
+        
+        def pending_images():
+            for image_path in unique_images():
+                if image_path.name in done:
+                    skipped.append(image_path.name)
+                else:
+                    yield image_path
+        
+        if batch_api:
+            if pack_size > 1:
+                print("The Batch API already discounts every request, so images are not packed")
+            if self.cascade:
+                print(f"Batch API requests all go to {self.model}; the model cascade is not used")
+            known = {filename: previous[filename] for filename in done}
+            return self._run_batch(
+                list(unique_images()),
+                output_file,
+                custom_prompt,
+                example_images,
+                example_descriptions,
+                known,
+                wait,
+                example_index
+            )
+        
+        if resume:
+            print(f"Resuming: skipping the {len(done)} images already described")
+        
+        with JsonlWriter(checkpoint_path(output_file), append=resume) as writer:
+            new_results = self._describe_images(
+                pending_images(),
+                desc,
+                concurrency,
+                custom_prompt,
+                example_images,
+                example_descriptions,
+                writer,
+                example_index,
+                pack_size
+            )
+        
+        previous.update((result['filename'], result) for result in new_results)
+        if resume:
+            print(f"Resumed: {len(skipped)} images already described, {len(new_results)} processed")
+        
+        # Compact the checkpoint into the JSON array format used by downstream tools
+        return compact(previous, filenames, output_file)
+    
+    def _run_batch(self,
+                   image_files: List[Path],
+                   output_file: str,
+                   custom_prompt: Optional[str] = None,
+                   example_images: List[str] = None,
+                   example_descriptions: List[str] = None,
+                   known_results: Dict[str, Dict] = None,
+                   wait: bool = False,
+                   example_index: Optional[ExampleIndex] = None) -> List[Dict]:
+        """
+        Submit image_files as a Batch API job, or collect the job already submitted for output_file.
+        
+        Returns:
+            List of description results, or an empty list while the job is still running
+        """
+        job = BatchJob(self, output_file)
+        
+        if job.pending:
+            print(f"Found submitted batch job in {job.state_file}")
+        else:
+            prompt = self.prepare_prompt(custom_prompt, example_images, example_descriptions, example_index)
+            job.submit(image_files, prompt, known_results)
+            print(f"Submitted {len(job.state['batches'])} batch(es); job state saved to {job.state_file}")
+        
+        finished = job.wait() if wait else job.poll()
+        if not finished:
+            job.print_status()
+            print("Batch job is still running. Run the same command again later to collect the results.")
+            return []
+        
+        return job.merge()
+    
+    def _find_images(self,
+                     input_dir: str,
+                     recursive: bool = False,
+                     include: List[str] = None,
+                     exclude: List[str] = None,
+                     shard: Optional[Tuple[int, int]] = None) -> Optional[Iterator[Path]]:
+        """
+        Start scanning input_dir for images, or return None if it has none.
+        
+        Images pass through the directory's manifest, so each one is hashed and
+        inspected only when it is new or has changed since the last run. With a
+        shard (i, N), only the images hashing to shard i are kept, before any
+        of them is read.
+        """
+        image_files = scan_images(input_dir, recursive, include, exclude)
+        if shard:
+            image_files = in_shard(image_files, shard)
+        if Config.USE_MANIFEST:
+            self.manifest = ImageManifest(input_dir)
+            image_files = self.manifest.track(image_files)
+        first = next(image_files, None)
+        if first is None:
+            return None
+        return itertools.chain([first], image_files)
     
     def process_bulk_images(self, 
                           input_dir: str = None, 
                           output_file: str = None,
-                          custom_prompt: Optional[str] = None) -> List[Dict]:
+                          custom_prompt: Optional[str] = None,
+                          concurrency: int = None,
+                          resume: bool = False,
+                          batch_api: bool = False,
+                          wait: bool = False,
+                          recursive: bool = False,
+                          include: List[str] = None,
+                          exclude: List[str] = None,
+                          pack_size: int = 1,
+                          shard: Optional[Tuple[int, int]] = None) -> List[Dict]:
         """
         Process multiple images in bulk and generate descriptions.
         
@@ -112,6 +1206,18 @@ class ArtDescriptor:
             input_dir: Directory containing images (defaults to assets directory)
             output_file: Output file path for saving results
             custom_prompt: Optional custom prompt
+            concurrency: Maximum number of requests in flight (defaults to Config.CONCURRENCY)
+            resume: Skip images already described successfully in output_file or its checkpoint
+            batch_api: Submit the images as an OpenAI Batch API job, or collect the job already
+                submitted for output_file
+            wait: With batch_api, poll until the job finishes instead of returning while it runs
+            recursive: Also process images in subdirectories of input_dir
+            include: Only process images whose name or relative path matches one of these glob patterns
+            exclude: Skip images and directories whose name or relative path matches one of these glob patterns
+            pack_size: Describe this many images per request, each answered in its own section
+                of a JSON reply (1 sends one image per request)
+            shard: Process only the images of shard (i, N) of input_dir, writing them to
+                the shard's own output file for merge_shards
             
         Returns:
             List of description results
@@ -122,30 +1228,38 @@ class ArtDescriptor:
         if output_file is None:
             input_dir_name = os.path.basename(input_dir)
             output_file = os.path.join('ai_descriptions', f'{input_dir_name}.json')
+        if shard:
+            output_file = shard_output_path(output_file, shard)
+            print(f"Shard {shard[0]}/{shard[1]}: writing {output_file}")
         
-        # Get all image files
-        image_files = []
-        for ext in Config.SUPPORTED_FORMATS:
-            image_files.extend(Path(input_dir).glob(f"*{ext}"))
-            image_files.extend(Path(input_dir).glob(f"*{ext.upper()}"))
-        
-        if not image_files:
+        # Images are scanned lazily, so processing starts before a large directory is fully listed
+        image_files = self._find_images(input_dir, recursive, include, exclude, shard)
+        if image_files is None:
             print(f"No supported image files found in {input_dir}")
             return []
         
-        print(f"Found {len(image_files)} images to process")
-        
         # Process images with progress bar
-        results = []
-        for image_path in tqdm(image_files, desc="Generating descriptions"):
-            result = self.generate_description(str(image_path), custom_prompt)
-            results.append(result)
+        results = self._run_bulk(
+            image_files,
+            output_file,
+            "Generating descriptions",
+            concurrency or Config.CONCURRENCY,
+            custom_prompt,
+            resume=resume,
+            batch_api=batch_api,
+            wait=wait,
+            pack_size=pack_size
+        )
+        if batch_api and not results:
+            # The batch job is still running, results are collected by a later run
+            return results
         
-        # Save results (already in simplified format)
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
-        
-        print(f"Processing complete! Results saved to {output_file}")
+        print(f"Processing complete! {len(results)} results saved to {output_file}")
+        self._report_upload_savings(output_file)
+        self._report_manifest()
+        self._report_cache()
+        self._report_usage()
+        self._report_metrics(output_file, results)
         return results
     
     def _generate_summary(self, results: List[Dict], output_file: str):
@@ -184,13 +1298,15 @@ class ArtDescriptor:
                 })
         
         if csv_data:
+            import pandas as pd
+            
             df = pd.DataFrame(csv_data)
             df.to_csv(output_file, index=False, encoding='utf-8')
             print(f"CSV export saved to {output_file}")
         else:
             print("No successful results to export to CSV")
     
-    def generate_description_with_examples(self, image_path: str, example_images: List[str] = None, example_descriptions: List[str] = None, custom_prompt: Optional[str] = None) -> Dict:
+    def generate_description_with_examples(self, image_path: str, example_images: List[str] = None, example_descriptions: List[str] = None, custom_prompt: Optional[str] = None, example_index: Optional[ExampleIndex] = None) -> Dict:
         """
         Generate a visual description using example image-description pairs for better guidance.
         
@@ -199,97 +1315,38 @@ class ArtDescriptor:
             example_images: List of paths to example images for reference
             example_descriptions: List of corresponding descriptions for the example images
             custom_prompt: Optional custom prompt to override the default
+            example_index: Optional index to pick the most similar examples from when
+                example_images are not given
             
         Returns:
             Dictionary containing the description and metadata
         """
         try:
-            # Validate image file
-            if not os.path.exists(image_path):
-                raise FileNotFoundError(f"Image file not found: {image_path}")
-            
-            # Validate example inputs
-            if example_images and example_descriptions:
-                if len(example_images) != len(example_descriptions):
-                    raise ValueError("Number of example images must match number of example descriptions")
-                
-                for example_img in example_images:
-                    if not os.path.exists(example_img):
-                        raise FileNotFoundError(f"Example image not found: {example_img}")
-            
-            # Get image info
-            image_info = self.get_image_info(image_path)
-            
-            # Encode target image
-            base64_image = self.encode_image(image_path)
-            
-            # Build messages with examples
-            messages = []
-            
-            # Use custom prompt or default
-            prompt = custom_prompt if custom_prompt else Config.ACCESSIBILITY_PROMPT
-            
-            # Build user message content
-            user_content = [{"type": "text", "text": prompt}]
-            
-            # Add example images with their descriptions if provided
-            if example_images and example_descriptions:
-                example_text = "\nHere are some examples of the type of description I want:\n\n"
-                for i, (example_img, example_desc) in enumerate(zip(example_images, example_descriptions)):
-                    example_base64 = self.encode_image(example_img)
-                    example_text += f"EXAMPLE {i+1}:\n"
-                    example_text += f"Image: {os.path.basename(example_img)}\n"
-                    example_text += f"Description: {example_desc}\n\n"
-                    user_content.append({
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{example_base64}"
-                        }
-                    })
-                
-                # Update the text content to include examples
-                user_content[0]["text"] += example_text
-            
-            # Add target image
-            user_content.append({
-                "type": "image_url",
-                "image_url": {
-                    "url": f"data:image/jpeg;base64,{base64_image}"
-                }
-            })
-            
-            messages.append({
-                "role": "user",
-                "content": user_content
-            })
-            
-            # Make API call
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                max_tokens=1000,
-                temperature=0.7
-            )
-            
-            description = response.choices[0].message.content
-            
-            return {
-                'filename': image_info['filename'],
-                'description': description
-            }
-            
+            prompt = self.prepare_prompt(custom_prompt, example_images, example_descriptions, example_index)
         except Exception as e:
             return {
                 'filename': os.path.basename(image_path),
                 'description': f"Error: {str(e)}"
             }
+        
+        return self._describe(image_path, prompt)
 
     def process_bulk_images_with_examples(self, 
                                         input_dir: str = None, 
                                         output_file: str = None,
                                         example_images: List[str] = None,
                                         example_descriptions: List[str] = None,
-                                        custom_prompt: Optional[str] = None) -> List[Dict]:
+                                        custom_prompt: Optional[str] = None,
+                                        concurrency: int = None,
+                                        resume: bool = False,
+                                        batch_api: bool = False,
+                                        wait: bool = False,
+                                        example_index: Optional[ExampleIndex] = None,
+                                        recursive: bool = False,
+                                        include: List[str] = None,
+                                        exclude: List[str] = None,
+                                        pack_size: int = 1,
+                                        shard: Optional[Tuple[int, int]] = None) -> List[Dict]:
         """
         Process multiple images in bulk using example image-description pairs for guidance.
         
@@ -299,6 +1356,20 @@ class ArtDescriptor:
             example_images: List of paths to example images for reference
             example_descriptions: List of corresponding descriptions for the example images
             custom_prompt: Optional custom prompt
+            concurrency: Maximum number of requests in flight (defaults to Config.CONCURRENCY)
+            resume: Skip images already described successfully in output_file or its checkpoint
+            batch_api: Submit the images as an OpenAI Batch API job, or collect the job already
+                submitted for output_file
+            wait: With batch_api, poll until the job finishes instead of returning while it runs
+            example_index: Optional index to pick the most similar examples for each image from
+                when example_images are not given
+            recursive: Also process images in subdirectories of input_dir
+            include: Only process images whose name or relative path matches one of these glob patterns
+            exclude: Skip images and directories whose name or relative path matches one of these glob patterns
+            pack_size: Describe this many images per request, each answered in its own section
+                of a JSON reply (1 sends one image per request)
+            shard: Process only the images of shard (i, N) of input_dir, writing them to
+                the shard's own output file for merge_shards
             
         Returns:
             List of description results
@@ -309,35 +1380,191 @@ class ArtDescriptor:
         if output_file is None:
             input_dir_name = os.path.basename(input_dir)
             output_file = os.path.join('ai_descriptions', f'{input_dir_name}_with_examples.json')
+        if shard:
+            output_file = shard_output_path(output_file, shard)
+            print(f"Shard {shard[0]}/{shard[1]}: writing {output_file}")
         
-        # Get all image files
-        image_files = []
-        for ext in Config.SUPPORTED_FORMATS:
-            image_files.extend(Path(input_dir).glob(f"*{ext}"))
-            image_files.extend(Path(input_dir).glob(f"*{ext.upper()}"))
-        
-        if not image_files:
+        # Images are scanned lazily, so processing starts before a large directory is fully listed
+        image_files = self._find_images(input_dir, recursive, include, exclude, shard)
+        if image_files is None:
             print(f"No supported image files found in {input_dir}")
             return []
         
-        print(f"Found {len(image_files)} images to process")
         if example_images:
             print(f"Using {len(example_images)} example images for guidance")
+        elif example_index is not None:
+            print(f"Using the nearest examples from an index of {len(example_index)}")
         
         # Process images with progress bar
-        results = []
-        for image_path in tqdm(image_files, desc="Generating descriptions with examples"):
-            result = self.generate_description_with_examples(
-                str(image_path), 
-                example_images, 
-                example_descriptions, 
-                custom_prompt
-            )
-            results.append(result)
+        results = self._run_bulk(
+            image_files,
+            output_file,
+            "Generating descriptions with examples",
+            concurrency or Config.CONCURRENCY,
+            custom_prompt,
+            example_images,
+            example_descriptions,
+            resume,
+            batch_api,
+            wait,
+            example_index,
+            pack_size
+        )
+        if batch_api and not results:
+            # The batch job is still running, results are collected by a later run
+            return results
+        
+        print(f"Processing complete! {len(results)} results saved to {output_file}")
+        self._report_upload_savings(output_file)
+        self._report_manifest()
+        self._report_cache()
+        self._report_usage()
+        self._report_metrics(output_file, results)
+        return results
+    
+    def watch_bulk_images(self,
+                          input_dir: str = None,
+                          output_file: str = None,
+                          custom_prompt: Optional[str] = None,
+                          concurrency: int = None,
+                          example_images: List[str] = None,
+                          example_descriptions: List[str] = None,
+                          example_index: Optional[ExampleIndex] = None,
+                          recursive: bool = False,
+                          include: List[str] = None,
+                          exclude: List[str] = None,
+                          max_batches: int = None) -> Dict:
+        """
+        Describe images as they are added to or changed in input_dir, until interrupted.
+        
+        Images already in the directory are handled first, then the directory is
+        watched (inotify, or polling where that is unavailable) and each batch of
+        files that has finished being written is described and merged into
+        output_file. The content digest of every described image is kept in
+        `<output>.run/watch.json`, so an image is only sent again when its content
+        changes. Images that already have a successful result in output_file
+        when watching starts are taken as described.
+        
+        Args:
+            input_dir: Directory to watch (defaults to assets directory)
+            output_file: Output file to append results to
+            custom_prompt: Optional custom prompt
+            concurrency: Maximum number of requests in flight (defaults to Config.CONCURRENCY)
+            example_images: Optional example images for guidance
+            example_descriptions: Descriptions matching example_images
+            example_index: Optional index to pick the most similar examples for each image from
+            recursive: Also watch subdirectories of input_dir
+            include: Only describe images whose name or relative path matches one of these glob patterns
+            exclude: Skip images and directories whose name or relative path matches one of these glob patterns
+            max_batches: Stop after this many batches of changes (default: run until interrupted)
+            
+        Returns:
+            Counts of images 'described', 'errors' and 'unchanged'
+        """
+        from .folder_watcher import FolderWatcher
+        
+        input_dir = input_dir or Config.ASSETS_DIR
+        if output_file is None:
+            suffix = '_with_examples' if example_images or example_index is not None else ''
+            output_file = os.path.join('ai_descriptions', f'{os.path.basename(input_dir)}{suffix}.json')
+        directory = os.path.dirname(output_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self.usage = UsageStats()
+        self.model_usage = {}
+        self.metrics = Metrics()
+        self._retries_at_start = self.scheduler.retries
+        self.manifest = ImageManifest(input_dir) if Config.USE_MANIFEST else None
+        results = load_results(output_file)
+        described = load_watch_state(output_file)
+        totals = {'described': 0, 'errors': 0, 'unchanged': 0}
+        
+        watcher = FolderWatcher(input_dir, recursive, include, exclude)
+        print(f"Watching {input_dir} for new or changed images ({watcher.mode}), "
+              f"results go to {output_file}; press Ctrl+C to stop")
+        try:
+            for number, batch in enumerate(watcher.changes(), 1):
+                pending = self._watch_delta(input_dir, batch, results, described)
+                totals['unchanged'] += len(batch) - len(pending)
+                if pending:
+                    start = time.perf_counter()
+                    with JsonlWriter(checkpoint_path(output_file)) as writer:
+                        new_results = self._describe_images(
+                            [image_path for image_path, _ in pending],
+                            "Describing new images",
+                            concurrency or Config.CONCURRENCY,
+                            custom_prompt,
+                            example_images,
+                            example_descriptions,
+                            writer,
+                            example_index
+                        )
+                    
+                    errors = 0
+                    for (image_path, digest), result in zip(pending, new_results):
+                        results[result['filename']] = result
+                        if is_error(result):
+                            errors += 1
+                        else:
+                            described[result['filename']] = {'path': self._relative_path(input_dir, image_path), 'digest': digest}
+                    # New images are appended, changed ones keep their place
+                    compact(results, list(results), output_file)
+                    save_watch_state(output_file, described)
+                    if self.manifest:
+                        self.manifest.save()
+                    
+                    totals['described'] += len(new_results)
+                    totals['errors'] += errors
+                    print(f"Described {len(new_results)} new or changed images ({errors} failed) "
+                          f"in {time.perf_counter() - start:.1f}s, {len(results)} results in {output_file}")
+                
+                if max_batches and number >= max_batches:
+                    break
+        except KeyboardInterrupt:
+            print("\nStopped watching")
         
-        # Save results (already in simplified format)
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"Watch summary: {totals['described']} described, {totals['errors']} failed, "
+              f"{totals['unchanged']} unchanged images skipped")
+        self._report_usage()
+        return totals
+    
+    @staticmethod
+    def _relative_path(input_dir: str, image_path: Path) -> str:
+        return Path(os.path.relpath(image_path, input_dir)).as_posix()
+    
+    def _watch_delta(self, input_dir: str, batch: List[Path], results: Dict[str, Dict], described: Dict[str, Dict]) -> List[tuple]:
+        """
+        Pick the images of a watch batch whose content has not been described yet.
         
-        print(f"Processing complete! Results saved to {output_file}")
-        return results 
\ No newline at end of file
+        Returns:
+            (image path, content digest) for each image to describe
+        """
+        if self.manifest:
+            self.manifest.refresh(batch)
+        
+        pending = []
+        for image_path in batch:
+            relative_path = self._relative_path(input_dir, image_path)
+            previous = described.get(image_path.name)
+            if previous and previous['path'] != relative_path and os.path.exists(os.path.join(input_dir, previous['path'])):
+                print(f"Skipping {relative_path}: another image named {image_path.name} is already described")
+                continue
+            
+            entry = self._manifest_entry(str(image_path))
+            try:
+                digest = entry['digest'] if entry else file_digest(str(image_path))
+            except OSError:
+                # Removed again before it could be read
+                continue
+            
+            result = results.get(image_path.name)
+            if result is not None and not is_error(result):
+                if previous is None:
+                    # Described before watch mode tracked digests; assume it is this version
+                    described[image_path.name] = {'path': relative_path, 'digest': digest}
+                    continue
+                if previous['digest'] == digest:
+                    continue
+            pending.append((image_path, digest))
+        return pending
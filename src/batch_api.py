@@ -0,0 +1,267 @@
+import os
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .config import Config
+from .output_writer import compact, run_file_path
+from .prepared_prompt import PreparedPrompt
+
+
+# Completed batches keep these statuses; anything else is still in progress
+FINISHED_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+CHAT_COMPLETIONS_ENDPOINT = '/v1/chat/completions'
+
+
+def state_path(output_file: str) -> str:
+    """Path of the persisted batch job state for an output file."""
+    return run_file_path(output_file, 'batch')
+
+
+class BatchJob:
+    """
+    Bulk description run through the OpenAI Batch API.
+
+    The job builds request JSONL files from a list of images, uploads them and
+    creates batches (split to stay within the per-batch size and request
+    limits), then polls them and merges the outputs into the usual JSON output.
+    Its state is saved next to the output file after every step, so the
+    process can exit after submitting and pick the job up again later.
+    """
+
+    def __init__(self, descriptor, output_file: str):
+        """
+        Args:
+            descriptor: ArtDescriptor whose client, request builder and cache are used
+            output_file: JSON output file the results are merged into
+        """
+        self.descriptor = descriptor
+        self.output_file = output_file
+        self.state_file = state_path(output_file)
+        self.state = self._load_state()
+
+    def _load_state(self) -> Optional[Dict]:
+        if not os.path.exists(self.state_file):
+            return None
+        with open(self.state_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        temp_file = self.state_file + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2, ensure_ascii=False)
+        os.replace(temp_file, self.state_file)
+
+    @property
+    def pending(self) -> bool:
+        """Whether a submitted job has not been merged into the output yet."""
+        return bool(self.state) and not self.state.get('merged')
+
+    def submit(self,
+               image_files: List[Path],
+               prompt: PreparedPrompt,
+               known_results: Dict[str, Dict] = None) -> Dict:
+        """
+        Build the request files for image_files, upload them and create the batches.
+
+        Images with a cached description or an entry in known_results are not
+        sent; their descriptions are kept in the job state and merged with the
+        batch outputs.
+
+        Args:
+            image_files: Images to describe, in output order
+            prompt: Prompt and examples from ArtDescriptor.prepare_prompt
+            known_results: Results to keep from a previous run, keyed by filename
+
+        Returns:
+            The persisted job state
+        """
+        known_results = known_results or {}
+        self.state = {
+            'output_file': self.output_file,
+            'model': self.descriptor.model,
+            'filenames': [image_path.name for image_path in image_files],
+            'results': dict(known_results),
+            'batches': [],
+            'merged': False,
+            'created_at': time.time()
+        }
+
+        to_send = [image_path for image_path in image_files if image_path.name not in known_results]
+        for chunk_file, requests in self._write_request_files(to_send, prompt):
+            with open(chunk_file, 'rb') as f:
+                uploaded = self.descriptor.client.files.create(file=f, purpose='batch')
+            batch = self._post('/batches', {
+                'input_file_id': uploaded.id,
+                'endpoint': CHAT_COMPLETIONS_ENDPOINT,
+                'completion_window': '24h'
+            })
+            self.state['batches'].append({
+                'id': batch['id'],
+                'input_file_id': uploaded.id,
+                'status': batch.get('status', 'validating'),
+                'output_file_id': None,
+                'error_file_id': None,
+                'requests': requests
+            })
+            self._save_state()
+            os.remove(chunk_file)
+
+        self._save_state()
+        return self.state
+
+    def _write_request_files(self, image_files: List[Path], prompt: PreparedPrompt):
+        """
+        Write the batch request JSONL, starting a new file whenever a batch limit would be exceeded.
+
+        Yields:
+            (path, {custom_id: {'filename', 'cache_key', 'index_entry'}}) for each request file
+        """
+        root, _ = os.path.splitext(self.output_file)
+        chunk, requests, size, f = 0, {}, 0, None
+
+        for image_path in image_files:
+            try:
+                # Always the main model: the cascade's escalations would need a second batch
+                request = self.descriptor._build_request(str(image_path), prompt, self.descriptor.model)
+            except Exception as e:
+                self.state['results'][image_path.name] = {
+                    'filename': image_path.name,
+                    'description': f"Error: {str(e)}"
+                }
+                continue
+
+            if 'description' in request:
+                self.state['results'][request['filename']] = self.descriptor._known_result(request)
+                continue
+
+            line = json.dumps({
+                'custom_id': request['filename'],
+                'method': 'POST',
+                'url': CHAT_COMPLETIONS_ENDPOINT,
+                'body': request['params']
+            }, ensure_ascii=False) + '\n'
+            line_size = len(line.encode('utf-8'))
+
+            if f and (size + line_size > Config.BATCH_MAX_BYTES or len(requests) >= Config.BATCH_MAX_REQUESTS):
+                f.close()
+                yield f.name, requests
+                chunk, requests, size, f = chunk + 1, {}, 0, None
+
+            if f is None:
+                f = open(f"{root}.batch-input-{chunk}.jsonl", 'w', encoding='utf-8')
+
+            f.write(line)
+            size += line_size
+            requests[request['filename']] = {
+                'filename': request['filename'],
+                'cache_key': request.get('cache_key'),
+                'index_entry': request.get('index_entry')
+            }
+
+        if f:
+            f.close()
+            yield f.name, requests
+
+    def poll(self) -> bool:
+        """
+        Refresh the status of every batch in the job.
+
+        Returns:
+            True once all batches have finished
+        """
+        for batch in self.state['batches']:
+            if batch['status'] in FINISHED_STATUSES:
+                continue
+            info = self._get(f"/batches/{batch['id']}").json()
+            batch['status'] = info.get('status', batch['status'])
+            batch['output_file_id'] = info.get('output_file_id')
+            batch['error_file_id'] = info.get('error_file_id')
+            batch['request_counts'] = info.get('request_counts')
+
+        self._save_state()
+        return all(batch['status'] in FINISHED_STATUSES for batch in self.state['batches'])
+
+    def wait(self, interval: float = None) -> bool:
+        """Poll until every batch has finished."""
+        interval = interval or Config.BATCH_POLL_INTERVAL
+        while not self.poll():
+            self.print_status()
+            time.sleep(interval)
+        return True
+
+    def print_status(self):
+        """Print the status and request counts of each batch."""
+        for batch in self.state['batches']:
+            counts = batch.get('request_counts') or {}
+            progress = f" ({counts.get('completed', 0)}/{counts.get('total', len(batch['requests']))} requests)" if counts else ""
+            print(f"Batch {batch['id']}: {batch['status']}{progress}")
+
+    def merge(self) -> List[Dict]:
+        """
+        Download the outputs of finished batches and write them to the output file by filename.
+
+        Requests without an output (failed or expired batches) are recorded as errors.
+
+        Returns:
+            List of description results in input order
+        """
+        results = dict(self.state['results'])
+
+        for batch in self.state['batches']:
+            for file_id in (batch.get('output_file_id'), batch.get('error_file_id')):
+                if not file_id:
+                    continue
+                content = self._get(f"/files/{file_id}/content").text
+                for line in content.splitlines():
+                    if line.strip():
+                        self._merge_line(json.loads(line), batch, results)
+
+            for request in batch['requests'].values():
+                if request['filename'] not in results:
+                    results[request['filename']] = {
+                        'filename': request['filename'],
+                        'description': f"Error: No batch output (batch {batch['status']})"
+                    }
+
+        ordered = compact(results, self.state['filenames'], self.output_file)
+        self.state['merged'] = True
+        self._save_state()
+        return ordered
+
+    def _merge_line(self, line: Dict, batch: Dict, results: Dict):
+        request = batch['requests'].get(line.get('custom_id'))
+        if request is None:
+            return
+
+        response = line.get('response') or {}
+        body = response.get('body') or {}
+        if response.get('status_code') == 200 and body.get('choices'):
+            description = body['choices'][0]['message'].get('content')
+            tokens = self.descriptor._record_usage(body.get('model') or self.descriptor.model, body.get('usage'))
+            if description:
+                self.descriptor._store_cached(request, description)
+            else:
+                # Refusals and content-filtered replies come back without content
+                description, tokens = "Error: empty response", {}
+        else:
+            error = line.get('error') or body.get('error') or {}
+            description = f"Error: {error.get('message', 'Batch request failed')}"
+            tokens = {}
+
+        results[request['filename']] = {
+            'filename': request['filename'],
+            'description': description,
+            **tokens
+        }
+
+    def _post(self, path: str, body: Dict) -> Dict:
+        import httpx
+        return self.descriptor.client.post(path, body=body, cast_to=httpx.Response).json()
+
+    def _get(self, path: str):
+        import httpx
+        return self.descriptor.client.get(path, cast_to=httpx.Response)
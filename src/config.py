@@ -1,4 +1,5 @@
 import os
+import json
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -10,6 +11,82 @@ class Config:
     # OpenAI Configuration
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4o')
+    # Optional OpenAI-compatible endpoint, e.g. a local stand-in server (defaults to the OpenAI API)
+    OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL') or None
+    
+    # Model cascade: images go to the cheaper CASCADE_FAST_MODEL first and only descriptions that
+    # fail the local quality checks are sent again to OPENAI_MODEL
+    CASCADE = os.getenv('CASCADE', 'false').lower() in ('1', 'true', 'yes')
+    CASCADE_FAST_MODEL = os.getenv('CASCADE_FAST_MODEL', 'gpt-4o-mini')
+    # Quality checks: word range a description must fall in (from ACCESSIBILITY_PROMPT)
+    QUALITY_MIN_WORDS = int(os.getenv('QUALITY_MIN_WORDS', '100'))
+    QUALITY_MAX_WORDS = int(os.getenv('QUALITY_MAX_WORDS', '300'))
+    # USD per million input, cached input and output tokens, for cost estimates; MODEL_PRICES
+    # adds or overrides models as JSON, e.g. {"gpt-4.1": [2.0, 0.5, 8.0]}
+    MODEL_PRICES = {
+        'gpt-4o': [2.50, 1.25, 10.00],
+        'gpt-4o-mini': [0.15, 0.075, 0.60],
+        **json.loads(os.getenv('MODEL_PRICES') or '{}')
+    }
+    
+    # Bulk processing: maximum number of API requests in flight at once
+    CONCURRENCY = int(os.getenv('CONCURRENCY', '1'))
+    
+    # Rate limits used until the API reports the account's real limits in its response headers
+    RATE_LIMIT_RPM = int(os.getenv('RATE_LIMIT_RPM', '500'))
+    RATE_LIMIT_TPM = int(os.getenv('RATE_LIMIT_TPM', '30000'))
+    # Retries for rate-limited, timed-out or failed (5xx) requests
+    MAX_RETRIES = int(os.getenv('MAX_RETRIES', '6'))
+    
+    # Batch API: per-batch limits (the API allows 200 MB and 50,000 requests) and poll interval
+    BATCH_MAX_BYTES = int(os.getenv('BATCH_MAX_BYTES', str(190 * 1024 * 1024)))
+    BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', '50000'))
+    BATCH_POLL_INTERVAL = float(os.getenv('BATCH_POLL_INTERVAL', '60'))
+    
+    # Nearest-neighbour example retrieval: index location, local image embedding model and examples per request
+    EXAMPLE_INDEX_DIR = os.getenv('EXAMPLE_INDEX_DIR', os.path.join('.cache', 'example_index'))
+    EXAMPLE_EMBEDDING_MODEL = os.getenv('EXAMPLE_EMBEDDING_MODEL', 'clip-ViT-B-32')
+    EXAMPLE_EMBEDDING_BATCH_SIZE = int(os.getenv('EXAMPLE_EMBEDDING_BATCH_SIZE', '16'))
+    EXAMPLE_TOP_K = int(os.getenv('EXAMPLE_TOP_K', '3'))
+    
+    # Image preparation stage of concurrent runs: worker processes (1 uses a thread) and
+    # prepared requests queued ahead of the request workers (0 means twice the concurrency)
+    PREPARE_WORKERS = int(os.getenv('PREPARE_WORKERS', str(os.cpu_count() or 1)))
+    PREPARE_QUEUE_SIZE = int(os.getenv('PREPARE_QUEUE_SIZE', '0'))
+    
+    # Optional Prometheus text-format file (e.g. in the node exporter textfile directory) updated after each bulk run
+    PROMETHEUS_TEXTFILE = os.getenv('PROMETHEUS_TEXTFILE') or None
+    
+    # Image manifest: per-directory digests and metadata, recomputed only for new or changed files
+    USE_MANIFEST = os.getenv('USE_MANIFEST', 'true').lower() in ('1', 'true', 'yes')
+    MANIFEST_DIR = os.getenv('MANIFEST_DIR', os.path.join('.cache', 'manifests'))
+    MANIFEST_WORKERS = int(os.getenv('MANIFEST_WORKERS', str(os.cpu_count() or 1)))
+    
+    # Request packing: images per chat request in bulk runs (1 disables packing) and the cap
+    # on max_tokens for a packed reply, which is 1000 per image otherwise
+    PACK_SIZE = int(os.getenv('PACK_SIZE', '1'))
+    PACK_MAX_TOKENS = int(os.getenv('PACK_MAX_TOKENS', '16000'))
+    
+    # Watch mode: seconds a new file must stay unchanged before it is described, seconds between
+    # directory scans when polling, and whether to use inotify where available
+    WATCH_DEBOUNCE = float(os.getenv('WATCH_DEBOUNCE', '2'))
+    WATCH_POLL_INTERVAL = float(os.getenv('WATCH_POLL_INTERVAL', '2'))
+    WATCH_USE_INOTIFY = os.getenv('WATCH_USE_INOTIFY', 'true').lower() in ('1', 'true', 'yes')
+    
+    # Response cache: descriptions keyed on image bytes, prompt, examples, model and sampling params
+    CACHE_PATH = os.getenv('CACHE_PATH', os.path.join('.cache', 'responses.sqlite3'))
+    CACHE_MAX_MB = int(os.getenv('CACHE_MAX_MB', '256'))
+    CACHE_MAX_AGE_DAYS = float(os.getenv('CACHE_MAX_AGE_DAYS', '90'))
+    # Seconds to wait for another process's write to the cache or near-duplicate index, e.g. queue workers
+    CACHE_TIMEOUT = float(os.getenv('CACHE_TIMEOUT', '30'))
+    
+    # Near-duplicate reuse: images within NEAR_DUPLICATE_DISTANCE bits (of 64) of an already described
+    # image's perceptual hash ('phash' or 'dhash') reuse its description instead of a new request.
+    # Off by default: reused descriptions are copied into the output without an API call
+    USE_NEAR_DUPLICATES = os.getenv('USE_NEAR_DUPLICATES', 'false').lower() in ('1', 'true', 'yes')
+    PERCEPTUAL_HASH = os.getenv('PERCEPTUAL_HASH', 'phash')
+    NEAR_DUPLICATE_DISTANCE = int(os.getenv('NEAR_DUPLICATE_DISTANCE', '6'))
+    NEAR_DUPLICATE_PATH = os.getenv('NEAR_DUPLICATE_PATH', os.path.join('.cache', 'near_duplicates.sqlite3'))
     
     # Output Configuration
     OUTPUT_FORMAT = os.getenv('OUTPUT_FORMAT', 'json')
@@ -19,6 +96,34 @@ class Config:
     ASSETS_DIR = 'assets'
     DESCRIPTIONS_DIR = 'descriptions'
     
+    # Description service (main.py --serve): listen address, requests in flight, jobs queued
+    # before new ones get a 429, directory images may be submitted from by path, and how long
+    # uploads may be, synchronous requests wait and finished results are kept
+    SERVICE_HOST = os.getenv('SERVICE_HOST', '127.0.0.1')
+    SERVICE_PORT = int(os.getenv('SERVICE_PORT', '8080'))
+    SERVICE_WORKERS = int(os.getenv('SERVICE_WORKERS', '4'))
+    SERVICE_QUEUE_SIZE = int(os.getenv('SERVICE_QUEUE_SIZE', '32'))
+    SERVICE_IMAGE_ROOT = os.getenv('SERVICE_IMAGE_ROOT', ASSETS_DIR)
+    SERVICE_UPLOAD_DIR = os.getenv('SERVICE_UPLOAD_DIR', os.path.join('.cache', 'uploads'))
+    SERVICE_MAX_UPLOAD_MB = float(os.getenv('SERVICE_MAX_UPLOAD_MB', '20'))
+    SERVICE_WAIT_TIMEOUT = float(os.getenv('SERVICE_WAIT_TIMEOUT', '300'))
+    SERVICE_JOB_TTL = float(os.getenv('SERVICE_JOB_TTL', '3600'))
+    SERVICE_ACCESS_LOG = os.getenv('SERVICE_ACCESS_LOG', 'false').lower() in ('1', 'true', 'yes')
+    
+    # Work queue (main.py --queue): SQLite file shared by the worker processes, worker processes
+    # started by "--queue work" (0 means one per CPU core), seconds a leased image stays reserved
+    # for its worker unless renewed, and attempts before an image is moved to the dead letters
+    QUEUE_PATH = os.getenv('QUEUE_PATH', os.path.join('.cache', 'work_queue.sqlite3'))
+    QUEUE_WORKERS = int(os.getenv('QUEUE_WORKERS', '0'))
+    QUEUE_LEASE_SECONDS = float(os.getenv('QUEUE_LEASE_SECONDS', '120'))
+    QUEUE_MAX_ATTEMPTS = int(os.getenv('QUEUE_MAX_ATTEMPTS', '3'))
+    
+    # Image preprocessing before upload: EXIF orientation, longest-edge cap and re-encoding
+    PREPROCESS_IMAGES = os.getenv('PREPROCESS_IMAGES', 'true').lower() in ('1', 'true', 'yes')
+    IMAGE_MAX_EDGE = int(os.getenv('IMAGE_MAX_EDGE', '2048'))
+    IMAGE_FORMAT = os.getenv('IMAGE_FORMAT', 'JPEG')
+    IMAGE_QUALITY = int(os.getenv('IMAGE_QUALITY', '85'))
+    
     # Supported image formats
     SUPPORTED_FORMATS = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp']
     
@@ -128,6 +233,8 @@ class Config:
         """Validate that required configuration is present."""
         if not cls.OPENAI_API_KEY:
             raise ValueError("OPENAI_API_KEY is required. Please set it in your .env file.")
+        if cls.PERCEPTUAL_HASH not in ('phash', 'dhash'):
+            raise ValueError(f"PERCEPTUAL_HASH must be 'phash' or 'dhash', not {cls.PERCEPTUAL_HASH!r}.")
         
         # Create output directory if it doesn't exist
         os.makedirs(cls.DESCRIPTIONS_DIR, exist_ok=True)
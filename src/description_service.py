@@ -0,0 +1,423 @@
+import os
+import json
+import math
+import time
+import uuid
+import queue
+import shutil
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Optional
+from urllib.parse import urlparse, parse_qs
+
+from .config import Config
+from .art_descriptor import ArtDescriptor
+from .image_scanner import is_supported
+from .output_writer import is_error
+from .telemetry import Metrics
+
+
+class ServiceError(Exception):
+    """A request the service rejects, with the HTTP status to answer it with."""
+
+    def __init__(self, status: int, message: str, headers: Dict = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class Job:
+    """One image waiting for, or done with, its description."""
+
+    def __init__(self, image_path: str, prompt: Optional[str] = None, upload_dir: Optional[str] = None):
+        """
+        Args:
+            image_path: Image to describe
+            prompt: Custom prompt, or None for the default accessibility prompt
+            upload_dir: Directory holding an uploaded image, removed when the job finishes
+        """
+        self.id = uuid.uuid4().hex
+        self.image_path = image_path
+        self.prompt = prompt
+        self.upload_dir = upload_dir
+        self.status = 'queued'
+        self.result = None
+        self.created = time.time()
+        self.finished = None
+        self.done = threading.Event()
+
+    def to_dict(self) -> Dict:
+        job = {
+            'job_id': self.id,
+            'status': self.status,
+            'filename': os.path.basename(self.image_path),
+            'created_at': self.created,
+            'url': f'/v1/jobs/{self.id}'
+        }
+        if self.result is not None:
+            job['result'] = self.result
+            job['finished_at'] = self.finished
+        return job
+
+
+class DescriptionService:
+    """
+    Long-lived description service around a single ArtDescriptor.
+
+    The descriptor, its API client (with its open connections), response cache
+    and default prompt are created once and shared by every request. Jobs go
+    on a bounded queue served by a fixed set of worker threads; when the queue
+    is full new jobs are refused, so callers back off instead of piling up
+    work. Finished jobs are kept for Config.SERVICE_JOB_TTL seconds so their
+    results can be fetched by job ID.
+    """
+
+    # Stage samples kept for the latency percentiles reported on /metrics
+    METRICS_WINDOW = 10000
+
+    def __init__(self,
+                 descriptor: ArtDescriptor = None,
+                 workers: int = None,
+                 queue_size: int = None,
+                 image_root: str = None,
+                 upload_dir: str = None,
+                 job_ttl: float = None):
+        """
+        Args:
+            descriptor: Descriptor to use (defaults to a new one with the response cache enabled)
+            workers: Requests in flight at once (defaults to Config.SERVICE_WORKERS)
+            queue_size: Jobs waiting beyond those in flight before new ones are refused
+                (defaults to Config.SERVICE_QUEUE_SIZE)
+            image_root: Directory that images submitted by path must be inside
+                (defaults to Config.SERVICE_IMAGE_ROOT)
+            upload_dir: Where uploaded images are kept while their job runs
+                (defaults to Config.SERVICE_UPLOAD_DIR)
+            job_ttl: Seconds a finished job's result stays available (defaults to Config.SERVICE_JOB_TTL)
+        """
+        self.descriptor = descriptor or ArtDescriptor()
+        self.workers = workers or Config.SERVICE_WORKERS
+        self.queue = queue.Queue(maxsize=queue_size or Config.SERVICE_QUEUE_SIZE)
+        self.image_root = os.path.realpath(image_root or Config.SERVICE_IMAGE_ROOT)
+        self.upload_dir = upload_dir or Config.SERVICE_UPLOAD_DIR
+        self.job_ttl = Config.SERVICE_JOB_TTL if job_ttl is None else job_ttl
+        self.jobs = {}
+        self.in_flight = 0
+        self.started = time.time()
+        self._threads = []
+        self._lock = threading.Lock()
+
+        # A bulk run resets these; the service runs indefinitely, so bound what it keeps
+        self.descriptor.metrics = Metrics(max_samples=self.METRICS_WINDOW)
+        self.descriptor.upload_stats = []
+        self._default_prompt = self.descriptor.prepare_prompt()
+
+    def start(self):
+        """Create the API client and start the worker threads."""
+        # Built now rather than by the first request, so it is not raced for by the workers
+        self.descriptor.client
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'describe-{number}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = None):
+        """Let the workers finish the queued jobs, then stop them."""
+        for _ in self._threads:
+            self.queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _work(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            with self._lock:
+                self.in_flight += 1
+            job.status = 'running'
+            if job.upload_dir:
+                # The upload is deleted after the job, so the near-duplicate index records its name
+                self.descriptor.image_sources[os.path.abspath(job.image_path)] = \
+                    f'upload:{os.path.basename(job.image_path)}'
+            try:
+                if job.prompt:
+                    prompt = self.descriptor.prepare_prompt(job.prompt)
+                else:
+                    prompt = self._default_prompt
+                # Through the model cascade when the descriptor has it on
+                job.result = self.descriptor._describe(job.image_path, prompt)
+            except Exception as e:
+                job.result = {'filename': os.path.basename(job.image_path), 'description': f"Error: {str(e)}"}
+            finally:
+                if job.upload_dir:
+                    self.descriptor.image_sources.pop(os.path.abspath(job.image_path), None)
+                    shutil.rmtree(job.upload_dir, ignore_errors=True)
+                # Uploaded images are gone once described; only bulk runs report upload sizes
+                self.descriptor.upload_stats.clear()
+
+            metrics = self.descriptor.metrics
+            metrics.add('images')
+            if is_error(job.result):
+                metrics.add('errors')
+            job.status = 'failed' if is_error(job.result) else 'done'
+            job.finished = time.time()
+            with self._lock:
+                self.in_flight -= 1
+            job.done.set()
+
+    def resolve_path(self, image_path: str) -> str:
+        """Check that an image submitted by path is a supported file inside the image root."""
+        if not isinstance(image_path, str) or '\0' in image_path:
+            raise ServiceError(400, 'The image "path" must be a string')
+        path = os.path.realpath(os.path.join(self.image_root, image_path))
+        if os.path.commonpath([path, self.image_root]) != self.image_root:
+            raise ServiceError(403, f"{image_path} is outside the service's image directory")
+        if not os.path.isfile(path):
+            raise ServiceError(404, f"{image_path} not found")
+        if not is_supported(path):
+            raise ServiceError(415, f"Unsupported image format: {os.path.splitext(path)[1]}")
+        return path
+
+    def save_upload(self, filename: str, content: bytes) -> tuple:
+        """Store an uploaded image in a directory of its own; returns the directory and image path."""
+        filename = os.path.basename(filename or '')
+        if not filename or not is_supported(filename):
+            raise ServiceError(415, f"Unsupported or missing image file name: {filename!r}")
+        if not content:
+            raise ServiceError(400, 'Empty upload')
+
+        upload_dir = os.path.join(self.upload_dir, uuid.uuid4().hex)
+        os.makedirs(upload_dir)
+        image_path = os.path.join(upload_dir, filename)
+        try:
+            with open(image_path, 'wb') as f:
+                f.write(content)
+        except OSError:
+            shutil.rmtree(upload_dir, ignore_errors=True)
+            raise
+        return upload_dir, image_path
+
+    def submit(self, image_path: str, prompt: Optional[str] = None, upload_dir: Optional[str] = None) -> Job:
+        """
+        Queue an image for description.
+
+        Raises:
+            ServiceError: 429 with a Retry-After estimate when the queue is full
+        """
+        self._expire_jobs()
+        job = Job(image_path, prompt, upload_dir)
+        try:
+            self.queue.put_nowait(job)
+        except queue.Full:
+            if upload_dir:
+                shutil.rmtree(upload_dir, ignore_errors=True)
+            self.descriptor.metrics.add('rejected')
+            raise ServiceError(429, 'Too many queued requests, retry later',
+                               {'Retry-After': str(self.retry_after())})
+
+        with self._lock:
+            self.jobs[job.id] = job
+        self.descriptor.metrics.add('accepted')
+        return job
+
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up, from the mean request latency."""
+        count, total = self.descriptor.metrics.totals.get('request', (0, 0.0))
+        mean = total / count if count else 1.0
+        return max(1, math.ceil(mean * self.queue.qsize() / self.workers))
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def _expire_jobs(self):
+        """Forget finished jobs older than the retention period."""
+        cutoff = time.time() - self.job_ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self.jobs.items() if job.finished and job.finished < cutoff]
+            for job_id in expired:
+                del self.jobs[job_id]
+
+    def health(self) -> Dict:
+        alive = sum(1 for thread in self._threads if thread.is_alive())
+        return {
+            'status': 'ok' if alive == self.workers else 'degraded',
+            'workers': self.workers,
+            'workers_alive': alive,
+            'in_flight': self.in_flight,
+            'queued': self.queue.qsize(),
+            'queue_size': self.queue.maxsize,
+            'jobs': len(self.jobs),
+            'model': self.descriptor.model,
+            'uptime_seconds': round(time.time() - self.started, 3)
+        }
+
+    def metrics_text(self) -> str:
+        """Stage latencies, counters, token usage and queue state in the Prometheus text format."""
+        descriptor = self.descriptor
+        summary = descriptor.metrics.summary({
+            'retries': descriptor.scheduler.retries,
+            'requests': descriptor.usage.requests,
+            'prompt_tokens': descriptor.usage.prompt_tokens,
+            'cached_tokens': descriptor.usage.cached_tokens,
+            'completion_tokens': descriptor.usage.completion_tokens
+        })
+        lines = [
+            '# TYPE art_descriptions_queue_depth gauge',
+            f'art_descriptions_queue_depth{{run="service"}} {self.queue.qsize()}',
+            '# TYPE art_descriptions_queue_capacity gauge',
+            f'art_descriptions_queue_capacity{{run="service"}} {self.queue.maxsize}',
+            '# TYPE art_descriptions_in_flight gauge',
+            f'art_descriptions_in_flight{{run="service"}} {self.in_flight}'
+        ]
+        return descriptor.metrics.prometheus_text(summary, 'service') + '\n'.join(lines) + '\n'
+
+
+def _flag(value, default: bool) -> bool:
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+def make_handler(service: DescriptionService):
+    """Build a request handler class bound to service."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            if Config.SERVICE_ACCESS_LOG:
+                super().log_message(format, *args)
+
+        def _send(self, status: int, data: bytes, content_type: str, headers: Dict = None):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_json(self, payload, status: int = 200, headers: Dict = None):
+            self._send(status, json.dumps(payload, ensure_ascii=False).encode('utf-8'), 'application/json', headers)
+
+        def _read_body(self) -> bytes:
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+            except ValueError:
+                length = -1
+            if length < 0:
+                self.close_connection = True
+                raise ServiceError(400, 'Invalid Content-Length')
+            if length > Config.SERVICE_MAX_UPLOAD_MB * 1024 * 1024:
+                raise ServiceError(413, f"Request body over {Config.SERVICE_MAX_UPLOAD_MB} MB")
+            return self.rfile.read(length)
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == '/healthz':
+                health = service.health()
+                self._send_json(health, 200 if health['status'] == 'ok' else 503)
+            elif path == '/metrics':
+                self._send(200, service.metrics_text().encode('utf-8'), 'text/plain; version=0.0.4')
+            elif path.startswith('/v1/jobs/'):
+                job = service.get(path[len('/v1/jobs/'):])
+                if job is None:
+                    self._send_json({'error': 'Unknown or expired job'}, 404)
+                else:
+                    self._send_json(job.to_dict())
+            else:
+                self._send_json({'error': 'Not found'}, 404)
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path != '/v1/descriptions':
+                self._send_json({'error': 'Not found'}, 404)
+                return
+            try:
+                job, wait = self._submit(url)
+            except ServiceError as e:
+                self.close_connection = self.close_connection or e.status == 413
+                self._send_json({'error': str(e)}, e.status, e.headers)
+                return
+            except Exception as e:
+                # Still answer the client rather than dropping the connection
+                print(f"Error handling POST {url.path}: {e!r}")
+                self.close_connection = True
+                self._send_json({'error': 'Internal server error'}, 500)
+                return
+
+            if wait and job.done.wait(Config.SERVICE_WAIT_TIMEOUT):
+                self._send_json(job.to_dict())
+            else:
+                self._send_json(job.to_dict(), 202, {'Location': job.to_dict()['url']})
+
+        def _submit(self, url):
+            """Queue the image in the request body; returns the job and whether to wait for it."""
+            query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            content_type = self.headers.get('Content-Type', '').split(';')[0].strip().lower()
+            body = self._read_body()
+
+            if content_type == 'application/json':
+                try:
+                    fields = json.loads(body or b'{}')
+                except ValueError:
+                    raise ServiceError(400, 'Invalid JSON body')
+                if not isinstance(fields, dict) or not fields.get('path'):
+                    raise ServiceError(400, 'JSON body needs a "path" to an image')
+                fields = {**query, **fields}
+                if not isinstance(fields.get('prompt') or '', str):
+                    raise ServiceError(400, 'The "prompt" must be a string')
+                image_path, upload_dir = service.resolve_path(fields['path']), None
+            elif content_type == 'multipart/form-data':
+                header = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode('utf-8')
+                message = BytesParser(policy=HTTP).parsebytes(header + body)
+                fields, upload = dict(query), None
+                for part in message.iter_parts():
+                    name = part.get_param('name', header='content-disposition')
+                    if name == 'image':
+                        upload = (part.get_filename(), part.get_payload(decode=True))
+                    elif name:
+                        try:
+                            fields[name] = part.get_payload(decode=True).decode('utf-8')
+                        except UnicodeDecodeError:
+                            raise ServiceError(400, f'Form field "{name}" is not UTF-8 text')
+                if upload is None:
+                    raise ServiceError(400, 'Multipart body needs an "image" file field')
+                upload_dir, image_path = service.save_upload(*upload)
+            elif content_type.startswith('image/'):
+                fields = query
+                upload_dir, image_path = service.save_upload(query.get('filename'), body)
+            else:
+                raise ServiceError(415, 'Send JSON with a path, a multipart "image" upload or a raw image body')
+
+            job = service.submit(image_path, fields.get('prompt') or None, upload_dir)
+            return job, _flag(fields.get('wait'), True)
+
+    return Handler
+
+
+def serve(service: DescriptionService, host: str = None, port: int = None) -> ThreadingHTTPServer:
+    """
+    Start service's workers and create its HTTP server; call serve_forever() on the result to run it.
+
+    Endpoints:
+        POST /v1/descriptions  Describe an image: JSON {"path": ...}, a multipart "image"
+                               upload or a raw image/* body with ?filename=. Optional
+                               "prompt", and "wait" (default true) to answer with the
+                               result instead of 202 and a job ID
+        GET  /v1/jobs/<id>     Job status and result
+        GET  /healthz          Worker and queue state
+        GET  /metrics          Prometheus metrics
+    """
+    host = host or Config.SERVICE_HOST
+    port = Config.SERVICE_PORT if port is None else port
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    service.start()
+    return server
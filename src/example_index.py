@@ -0,0 +1,210 @@
+import os
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from PIL import Image, ImageOps
+
+from .config import Config
+from .response_cache import file_digest
+
+
+class ExampleIndex:
+    """
+    Nearest-neighbour index over the curated example descriptions.
+
+    Every example image is embedded once with a local CLIP model and stored as
+    a normalised float32 matrix (embeddings.npy, memory-mapped on load) next to
+    index.json, which holds the image path, description and content digest of
+    each row. Updating the index only embeds examples that are new or whose
+    image bytes changed.
+
+    Requires the optional sentence-transformers package.
+    """
+
+    EMBEDDINGS_FILE = 'embeddings.npy'
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, index_dir: str = None, model_name: str = None, top_k: int = None):
+        """
+        Args:
+            index_dir: Directory holding the index (defaults to Config.EXAMPLE_INDEX_DIR)
+            model_name: sentence-transformers image model (defaults to Config.EXAMPLE_EMBEDDING_MODEL)
+            top_k: Number of examples to include in each request (defaults to Config.EXAMPLE_TOP_K)
+        """
+        self.index_dir = index_dir or Config.EXAMPLE_INDEX_DIR
+        self.model_name = model_name or Config.EXAMPLE_EMBEDDING_MODEL
+        self.top_k = top_k or Config.EXAMPLE_TOP_K
+        self.entries = []
+        self._embeddings = None
+        self._model = None
+        # Bulk workers search from several threads; the model is shared
+        self._lock = threading.Lock()
+
+        index_file = os.path.join(self.index_dir, self.INDEX_FILE)
+        if os.path.exists(index_file):
+            with open(index_file, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('model') == self.model_name:
+                self.entries = index['entries']
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def collect_examples(descriptions_dir: str = 'real_descriptions', assets_dir: str = None) -> List[Dict]:
+        """
+        Pair every reference description with its image.
+
+        Each `<descriptions_dir>/<name>.json` is matched with the images in
+        `<assets_dir>/<name>/`; descriptions whose image is missing are skipped.
+
+        Returns:
+            List of {'image_path', 'description'} dictionaries
+        """
+        assets_dir = assets_dir or Config.ASSETS_DIR
+        examples = []
+        for descriptions_file in sorted(Path(descriptions_dir).glob('*.json')):
+            with open(descriptions_file, 'r', encoding='utf-8') as f:
+                items = json.load(f)
+            for item in items:
+                image_path = os.path.join(assets_dir, descriptions_file.stem, item['filename'])
+                if os.path.exists(image_path):
+                    examples.append({'image_path': image_path, 'description': item['description']})
+        return examples
+
+    def _load_model(self):
+        if self._model is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError:
+                raise ImportError(
+                    "The example index needs sentence-transformers: pip install sentence-transformers"
+                )
+            self._model = SentenceTransformer(self.model_name, device='cpu')
+        return self._model
+
+    def _embed(self, image_paths: List[str]):
+        """Embed images in batches as L2-normalised float32 rows."""
+        import numpy as np
+
+        model = self._load_model()
+        rows = []
+        batch_size = Config.EXAMPLE_EMBEDDING_BATCH_SIZE
+        for start in range(0, len(image_paths), batch_size):
+            images = []
+            for image_path in image_paths[start:start + batch_size]:
+                with Image.open(image_path) as img:
+                    images.append(ImageOps.exif_transpose(img).convert('RGB'))
+            rows.append(model.encode(images, convert_to_numpy=True, normalize_embeddings=True))
+        return np.vstack(rows).astype(np.float32)
+
+    @property
+    def embeddings(self):
+        """Memory-mapped embedding matrix, one row per entry."""
+        import numpy as np
+
+        if self._embeddings is None and self.entries:
+            path = os.path.join(self.index_dir, self.EMBEDDINGS_FILE)
+            self._embeddings = np.load(path, mmap_mode='r')
+        return self._embeddings
+
+    def update(self, examples: List[Dict]) -> Dict:
+        """
+        Bring the index in line with examples, embedding only new or changed images.
+
+        Args:
+            examples: List of {'image_path', 'description'} dictionaries
+
+        Returns:
+            Counts of 'added', 'reused' and 'removed' entries
+        """
+        import numpy as np
+
+        existing = {entry['image_path']: (row, entry) for row, entry in enumerate(self.entries)}
+        entries, reuse_rows, to_embed = [], [], []
+
+        for example in examples:
+            digest = file_digest(example['image_path'])
+            entry = {
+                'image_path': example['image_path'],
+                'description': example['description'],
+                'digest': digest
+            }
+            previous = existing.get(example['image_path'])
+            if previous and previous[1]['digest'] == digest:
+                reuse_rows.append((len(entries), previous[0]))
+            else:
+                to_embed.append(len(entries))
+            entries.append(entry)
+
+        matrix = None
+        if entries:
+            new_rows = self._embed([entries[i]['image_path'] for i in to_embed]) if to_embed else None
+            dim = new_rows.shape[1] if new_rows is not None else self.embeddings.shape[1]
+            matrix = np.empty((len(entries), dim), dtype=np.float32)
+            for target, source in reuse_rows:
+                matrix[target] = self.embeddings[source]
+            if new_rows is not None:
+                matrix[to_embed] = new_rows
+
+        stats = {
+            'added': len(to_embed),
+            'reused': len(reuse_rows),
+            'removed': len(self.entries) - len(reuse_rows)
+        }
+        self._save(entries, matrix)
+        return stats
+
+    def _save(self, entries: List[Dict], matrix):
+        import numpy as np
+
+        os.makedirs(self.index_dir, exist_ok=True)
+        embeddings_file = os.path.join(self.index_dir, self.EMBEDDINGS_FILE)
+        index_file = os.path.join(self.index_dir, self.INDEX_FILE)
+
+        # Release the old memory map before replacing the file underneath it
+        self._embeddings = None
+        if matrix is not None:
+            with open(embeddings_file + '.tmp', 'wb') as f:
+                np.save(f, matrix)
+            os.replace(embeddings_file + '.tmp', embeddings_file)
+
+        with open(index_file + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'model': self.model_name, 'entries': entries}, f, indent=2, ensure_ascii=False)
+        os.replace(index_file + '.tmp', index_file)
+        self.entries = entries
+
+    def search(self, image_path: str, k: int, exclude_digest: Optional[str] = None) -> List[Dict]:
+        """
+        Find the k examples whose images are most similar to image_path.
+
+        Args:
+            image_path: Target image
+            k: Number of examples to return
+            exclude_digest: Skip examples with this image digest, so an image is
+                never given its own reference description as an example
+
+        Returns:
+            Entries ordered by decreasing cosine similarity, each with a 'score'
+        """
+        import numpy as np
+
+        if not self.entries or k <= 0:
+            return []
+
+        with self._lock:
+            query = self._embed([image_path])[0]
+        scores = np.asarray(self.embeddings @ query)
+        if exclude_digest:
+            for row, entry in enumerate(self.entries):
+                if entry['digest'] == exclude_digest:
+                    scores[row] = -np.inf
+
+        k = min(k, int(np.isfinite(scores).sum()))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [dict(self.entries[row], score=float(scores[row])) for row in top]
@@ -0,0 +1,277 @@
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+from pathlib import Path
+from typing import Iterator, List, Optional, Set, Tuple
+
+from .config import Config
+from .image_scanner import is_excluded, is_selected, scan_images
+
+# inotify event flags, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+_EVENT = struct.Struct('iIII')
+
+
+class Inotify:
+    """Minimal inotify binding through libc, so watching needs no extra dependency on Linux."""
+
+    def __init__(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError(errno.ENOSYS, 'inotify is only available on Linux')
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+    def add_watch(self, path: str, mask: int = WATCH_MASK) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), path)
+        return wd
+
+    def read(self, timeout: float) -> List[Tuple[int, int, str]]:
+        """Wait up to timeout seconds for events; returns (watch descriptor, mask, name) tuples."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events, offset = [], 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            events.append((wd, mask, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FolderWatcher:
+    """
+    Report images in a directory as they are added or changed and finished being written.
+
+    Uses inotify where available and otherwise polls the directory with
+    scan_images. Either way a file is only reported once its size and
+    modification time have held still for the debounce interval (or it was
+    last modified longer ago than that), so a scan that is still being copied
+    in is never picked up half written. The first batch holds every image
+    already present.
+    """
+
+    # With inotify, rescan the whole tree this often in case an event was missed
+    RESCAN_INTERVAL = 300
+
+    def __init__(self,
+                 input_dir: str,
+                 recursive: bool = False,
+                 include: Optional[List[str]] = None,
+                 exclude: Optional[List[str]] = None,
+                 debounce: float = None,
+                 poll_interval: float = None,
+                 use_inotify: bool = None):
+        """
+        Args:
+            input_dir: Directory to watch
+            recursive, include, exclude: Which images to report, as for scan_images
+            debounce: Seconds a file must stay unchanged before it is reported
+                (defaults to Config.WATCH_DEBOUNCE)
+            poll_interval: Seconds between scans when polling (defaults to Config.WATCH_POLL_INTERVAL)
+            use_inotify: Try inotify before falling back to polling (defaults to Config.WATCH_USE_INOTIFY)
+        """
+        self.input_dir = input_dir
+        self.recursive = recursive
+        self.include = include
+        self.exclude = exclude
+        self.debounce = Config.WATCH_DEBOUNCE if debounce is None else debounce
+        self.poll_interval = poll_interval or Config.WATCH_POLL_INTERVAL
+        use_inotify = Config.WATCH_USE_INOTIFY if use_inotify is None else use_inotify
+
+        # Signature (size, mtime_ns) of every file already reported
+        self.reported = {}
+        # Files seen changing: signature and when it was first seen
+        self.pending = {}
+        self._watches = {}
+        self._watched_dirs = set()
+        self.inotify = None
+        if use_inotify:
+            try:
+                self.inotify = Inotify()
+            except (OSError, AttributeError) as e:
+                print(f"inotify unavailable ({e}), polling every {self.poll_interval}s instead")
+
+    @property
+    def mode(self) -> str:
+        return 'inotify' if self.inotify else 'polling'
+
+    def _relative(self, path: str) -> str:
+        return Path(os.path.relpath(path, self.input_dir)).as_posix()
+
+    def _watch_tree(self, directory: str, visited: Optional[Set] = None) -> Set[str]:
+        """
+        Add inotify watches for directory (and its subdirectories if recursive); returns the images found in them.
+
+        Directories already watched are walked but not watched again, so calling
+        it on the input directory picks up subdirectories that have no watch yet.
+        """
+        found = set()
+        visited = set() if visited is None else visited
+        try:
+            stat = os.stat(directory)
+        except OSError:
+            return found
+        key = (stat.st_dev, stat.st_ino)
+        # Guards against symlink loops
+        if key in visited:
+            return found
+        visited.add(key)
+        if key not in self._watched_dirs:
+            try:
+                wd = self.inotify.add_watch(directory)
+            except OSError as e:
+                print(f"Cannot watch {directory}: {e}")
+                return found
+            self._watched_dirs.add(key)
+            self._watches[wd] = (directory, key)
+
+        # Files created before the watch was in place produce no events, so list them now
+        try:
+            with os.scandir(directory) as entries:
+                entries = list(entries)
+        except OSError:
+            return found
+        for entry in entries:
+            relative_path = self._relative(entry.path)
+            try:
+                if entry.is_dir():
+                    if self.recursive and not is_excluded(relative_path, self.exclude):
+                        found |= self._watch_tree(entry.path, visited)
+                elif is_selected(relative_path, self.include, self.exclude):
+                    found.add(entry.path)
+            except OSError:
+                continue
+        return found
+
+    def _scan(self) -> Set[str]:
+        return {str(path) for path in scan_images(self.input_dir, self.recursive, self.include, self.exclude)}
+
+    def _inotify_changes(self, timeout: float) -> Optional[Set[str]]:
+        """Paths touched by inotify events within timeout, or None when a full rescan is needed."""
+        changed = set()
+        for wd, mask, name in self.inotify.read(timeout):
+            if mask & IN_Q_OVERFLOW:
+                return None
+            if mask & IN_IGNORED:
+                directory, key = self._watches.pop(wd, (None, None))
+                self._watched_dirs.discard(key)
+                continue
+            if wd not in self._watches or not name:
+                continue
+            path = os.path.join(self._watches[wd][0], name)
+            if mask & IN_ISDIR:
+                if self.recursive and mask & (IN_CREATE | IN_MOVED_TO) and not is_excluded(self._relative(path), self.exclude):
+                    changed |= self._watch_tree(path)
+                continue
+            if is_selected(self._relative(path), self.include, self.exclude):
+                changed.add(path)
+        return changed
+
+    def _settle(self, candidates: Set[str]) -> List[Path]:
+        """
+        Move candidates that stopped changing into the reported set; returns them in sorted order.
+
+        A file has settled once the same non-empty signature has been seen for
+        the debounce interval, or straight away if it was last modified longer
+        ago than that.
+        """
+        now = time.time()
+        for path in candidates:
+            self.pending.setdefault(path, None)
+
+        ready = []
+        for path in list(self.pending):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Deleted or renamed away
+                del self.pending[path]
+                self.reported.pop(path, None)
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if signature == self.reported.get(path):
+                del self.pending[path]
+                continue
+
+            seen = self.pending[path]
+            if seen is None or seen[0] != signature:
+                self.pending[path] = seen = (signature, now)
+            modified = stat.st_mtime_ns / 1e9
+            if stat.st_size and (now - modified >= self.debounce or now - seen[1] >= self.debounce):
+                del self.pending[path]
+                self.reported[path] = signature
+                ready.append(path)
+        return [Path(path) for path in sorted(ready)]
+
+    def changes(self) -> Iterator[List[Path]]:
+        """
+        Yield batches of new or changed images, forever.
+
+        The first batch holds the images already in the directory; after that
+        each batch holds the files that settled since the previous one.
+        """
+        if self.inotify:
+            candidates = self._watch_tree(self.input_dir)
+        else:
+            candidates = self._scan()
+        last_scan = time.monotonic()
+
+        try:
+            while True:
+                ready = self._settle(candidates)
+                if ready:
+                    yield ready
+
+                # Wake up in time to re-check files waiting to settle
+                timeout = min(self.debounce, self.poll_interval) if self.pending else self.poll_interval
+                if self.inotify:
+                    candidates = self._inotify_changes(timeout)
+                    if candidates is None or time.monotonic() - last_scan > self.RESCAN_INTERVAL:
+                        # Directories created while events were lost have no watch yet
+                        self._watch_tree(self.input_dir)
+                        candidates = self._scan()
+                        last_scan = time.monotonic()
+                else:
+                    time.sleep(timeout)
+                    candidates = self._scan()
+                    # Forget deleted files, so one copied back in is reported again
+                    for path in set(self.reported) - candidates:
+                        del self.reported[path]
+        finally:
+            if self.inotify:
+                self.inotify.close()
@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from PIL import Image
+
+from .config import Config
+from .response_cache import file_digest
+from .near_duplicates import perceptual_hash
+
+
+def inspect_image(path: str) -> Dict:
+    """
+    Read an image's content digest and header metadata.
+
+    Module-level so it can run in a worker process.
+
+    Returns:
+        Manifest entry with 'bytes', 'mtime_ns', 'digest', 'width', 'height',
+        'format' and 'mode', or an 'error' if the file is not a readable image.
+        With near-duplicate reuse on, the perceptual hash is stored under the
+        name of the hash algorithm (None for images too flat to hash).
+    """
+    stat = os.stat(path)
+    entry = {
+        'bytes': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'digest': file_digest(path)
+    }
+    try:
+        # Only the header is read, the pixel data is never decoded
+        with Image.open(path) as img:
+            entry.update(width=img.size[0], height=img.size[1], format=img.format, mode=img.mode)
+    except Exception as e:
+        entry['error'] = str(e)
+    if Config.USE_NEAR_DUPLICATES and 'error' not in entry:
+        # Decodes a downscaled copy, so it is done here once per file rather than on every run
+        entry[Config.PERCEPTUAL_HASH] = perceptual_hash(path)
+    return entry
+
+
+def manifest_path(input_dir: str) -> str:
+    """Location of the manifest for input_dir, one file per directory under Config.MANIFEST_DIR."""
+    absolute = os.path.abspath(input_dir)
+    name = os.path.basename(absolute.rstrip(os.sep)) or 'root'
+    suffix = hashlib.sha1(absolute.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(Config.MANIFEST_DIR, f"{name}-{suffix}.json")
+
+
+class ImageManifest:
+    """
+    Per-directory index of image digests and metadata.
+
+    Every image's content hash, byte size, dimensions, format and mode are
+    computed once and stored with its mtime and size. Later runs only
+    re-inspect files whose mtime or size changed, so cache keys, image info and
+    token estimates for an unchanged collection come from the manifest without
+    reading the images again.
+    """
+
+    # Images inspected per round; stale images in a round are spread over the process pool
+    CHUNK_SIZE = 256
+    # Seconds between saves while a large directory is being tracked
+    SAVE_INTERVAL = 10
+
+    def __init__(self, input_dir: str, workers: int = None):
+        """
+        Args:
+            input_dir: Image directory the manifest describes
+            workers: Processes used to inspect new or changed images (defaults to Config.MANIFEST_WORKERS)
+        """
+        self.input_dir = input_dir
+        self.path = manifest_path(input_dir)
+        self.workers = workers or Config.MANIFEST_WORKERS
+        self.entries = {}
+        self.inspected = 0
+        self.reused = 0
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f).get('entries', {})
+            except ValueError:
+                self.entries = {}
+
+    def _key(self, image_path) -> str:
+        return Path(os.path.relpath(image_path, self.input_dir)).as_posix()
+
+    def get(self, image_path) -> Optional[Dict]:
+        """Manifest entry for image_path if it is still current, otherwise None."""
+        entry = self.entries.get(self._key(image_path))
+        if entry is None:
+            return None
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        if stat.st_size != entry['bytes'] or stat.st_mtime_ns != entry['mtime_ns']:
+            return None
+        if Config.USE_NEAR_DUPLICATES and 'error' not in entry and Config.PERCEPTUAL_HASH not in entry:
+            # Recorded before near-duplicate reuse was turned on
+            return None
+        return entry
+
+    def refresh(self, image_paths: List[Path], executor: Optional[ProcessPoolExecutor] = None):
+        """Inspect the images in image_paths that are new or changed since they were last recorded."""
+        stale = [str(image_path) for image_path in image_paths if self.get(image_path) is None]
+        self.reused += len(image_paths) - len(stale)
+        if not stale:
+            return
+
+        if executor is not None and len(stale) > 1:
+            inspected = executor.map(inspect_image, stale, chunksize=max(1, len(stale) // (self.workers * 4)))
+        else:
+            inspected = map(inspect_image, stale)
+
+        for image_path, entry in zip(stale, inspected):
+            self.entries[self._key(image_path)] = entry
+        self.inspected += len(stale)
+        self._dirty = True
+
+    def track(self, image_files: Iterable[Path]) -> Iterator[Path]:
+        """
+        Pass image_files through, making sure each has a current manifest entry first.
+
+        The iterable is consumed in chunks, so a lazy directory scan stays lazy;
+        new or changed images in each chunk are inspected in a process pool.
+        The manifest is saved periodically and when the iteration finishes.
+        """
+        image_files = iter(image_files)
+        executor = None
+        try:
+            while True:
+                chunk = [image_path for _, image_path in zip(range(self.CHUNK_SIZE), image_files)]
+                if not chunk:
+                    break
+                if executor is None and self.workers > 1 and sum(self.get(path) is None for path in chunk) > 1:
+                    # Spawned rather than forked: the bulk engine may already be running threads
+                    executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+                self.refresh(chunk, executor)
+                if self._dirty and time.monotonic() - self._last_save > self.SAVE_INTERVAL:
+                    self.save()
+                yield from chunk
+            self.prune()
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            self.save()
+
+    def prune(self):
+        """Drop entries for files that no longer exist."""
+        missing = [key for key in self.entries if not os.path.exists(os.path.join(self.input_dir, key))]
+        for key in missing:
+            del self.entries[key]
+        if missing:
+            self._dirty = True
+        return len(missing)
+
+    def save(self):
+        """Write the manifest atomically if it changed."""
+        if not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_file = self.path + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({'input_dir': os.path.abspath(self.input_dir), 'entries': self.entries}, f, ensure_ascii=False)
+        os.replace(temp_file, self.path)
+        self._dirty = False
+        self._last_save = time.monotonic()
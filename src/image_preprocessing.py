@@ -0,0 +1,178 @@
+import io
+import time
+import base64
+from typing import Dict
+
+from PIL import Image, ImageOps
+
+from .config import Config
+
+
+# MIME types for the formats the vision API accepts as-is
+MIME_TYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+    'WEBP': 'image/webp',
+}
+
+
+def mime_type_for(image_format: str) -> str:
+    """MIME type for a PIL format name, falling back to JPEG for unknown formats."""
+    return MIME_TYPES.get((image_format or '').upper(), 'image/jpeg')
+
+
+def _to_output_mode(img: Image.Image, output_format: str) -> Image.Image:
+    """Convert to a colour mode the output format can store."""
+    has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+
+    if output_format == 'WEBP' and has_alpha:
+        return img.convert('RGBA')
+
+    if has_alpha:
+        # JPEG has no alpha channel, flatten transparent areas onto white
+        rgba = img.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+
+    if img.mode != 'RGB':
+        return img.convert('RGB')
+    return img
+
+
+def preprocess_image(image_path: str,
+                     max_edge: int = None,
+                     output_format: str = None,
+                     quality: int = None,
+                     data: bytes = None) -> Dict:
+    """
+    Prepare an image for upload: apply EXIF orientation, convert the colour mode,
+    cap the longest edge and re-encode.
+
+    The original bytes are kept when they are already in an accepted format, need
+    no rotation or resizing, and are smaller than the re-encoded version.
+
+    Args:
+        image_path: Path to the image file
+        max_edge: Longest edge in pixels (defaults to Config.IMAGE_MAX_EDGE)
+        output_format: 'JPEG' or 'WEBP' (defaults to Config.IMAGE_FORMAT)
+        quality: Encoder quality 1-100 (defaults to Config.IMAGE_QUALITY)
+        data: The file's bytes if already read
+
+    Returns:
+        Dictionary with the encoded 'data', its 'mime_type', the uploaded 'size'
+        in pixels, and 'original_bytes' / 'bytes' for reporting savings
+    """
+    max_edge = max_edge or Config.IMAGE_MAX_EDGE
+    output_format = (output_format or Config.IMAGE_FORMAT).upper()
+    quality = quality or Config.IMAGE_QUALITY
+
+    if data is None:
+        with open(image_path, 'rb') as f:
+            data = f.read()
+    original = data
+
+    with Image.open(io.BytesIO(original)) as img:
+        source_format = img.format
+        source_size = img.size
+        # 0x0112 is the EXIF Orientation tag, 1 means upright
+        rotated = img.getexif().get(0x0112, 1) != 1
+        oriented = ImageOps.exif_transpose(img)
+
+        needs_resize = max(oriented.size) > max_edge
+        if needs_resize:
+            oriented.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+        if source_format in MIME_TYPES and not needs_resize and not rotated:
+            passthrough = {
+                'data': original,
+                'mime_type': mime_type_for(source_format),
+                'size': source_size,
+                'original_bytes': len(original),
+                'bytes': len(original)
+            }
+        else:
+            passthrough = None
+
+        buffer = io.BytesIO()
+        _to_output_mode(oriented, output_format).save(buffer, format=output_format, quality=quality)
+        encoded = buffer.getvalue()
+        size = oriented.size
+
+    if passthrough and len(original) <= len(encoded):
+        return passthrough
+
+    return {
+        'data': encoded,
+        'mime_type': mime_type_for(output_format),
+        'size': size,
+        'original_bytes': len(original),
+        'bytes': len(encoded)
+    }
+
+
+def read_image(image_path: str, data: bytes = None) -> Dict:
+    """
+    Load an image's bytes unchanged, labelled with its real MIME type.
+
+    Formats the API does not accept (BMP, TIFF, ...) are still converted by preprocess_image.
+    """
+    if data is None:
+        with open(image_path, 'rb') as f:
+            data = f.read()
+    original = data
+
+    with Image.open(io.BytesIO(original)) as img:
+        image_format, size = img.format, img.size
+
+    if image_format not in MIME_TYPES:
+        return preprocess_image(image_path, max_edge=max(size), data=original)
+
+    return {
+        'data': original,
+        'mime_type': mime_type_for(image_format),
+        'size': size,
+        'original_bytes': len(original),
+        'bytes': len(original)
+    }
+
+
+def prepare_upload(image_path: str,
+                   preprocess: bool = True,
+                   max_edge: int = None,
+                   output_format: str = None,
+                   quality: int = None) -> Dict:
+    """
+    Load an image and encode it as a base64 data URL ready to send.
+
+    Module-level so the decode, resize and encode work can run in a worker process.
+
+    Args:
+        image_path: Path to the image file
+        preprocess: Downsize and re-encode with preprocess_image instead of sending the original
+        max_edge, output_format, quality: Passed to preprocess_image
+
+    Returns:
+        Dictionary with the 'data_url' to send, the uploaded 'size' in pixels, the
+        'original_bytes' / 'bytes' sizes of the file and of the upload, and the
+        'timings' in seconds of the 'file_read' and 'encode' stages
+    """
+    start = time.perf_counter()
+    with open(image_path, 'rb') as f:
+        data = f.read()
+    read_done = time.perf_counter()
+
+    if preprocess:
+        image = preprocess_image(image_path, max_edge, output_format, quality, data=data)
+    else:
+        image = read_image(image_path, data=data)
+    encoded = base64.b64encode(image['data']).decode('utf-8')
+
+    return {
+        'data_url': f"data:{image['mime_type']};base64,{encoded}",
+        'size': image['size'],
+        'original_bytes': image['original_bytes'],
+        'bytes': image['bytes'],
+        'timings': {'file_read': read_done - start, 'encode': time.perf_counter() - read_done}
+    }
@@ -0,0 +1,109 @@
+import os
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from .config import Config
+
+
+def is_supported(name: str, extensions: List[str] = None) -> bool:
+    """Whether a file name has a supported image extension, ignoring case."""
+    extensions = extensions or Config.SUPPORTED_FORMATS
+    return os.path.splitext(name)[1].lower() in extensions
+
+
+def _matches(relative_path: str, patterns: List[str]) -> bool:
+    name = relative_path.rsplit('/', 1)[-1]
+    return any(fnmatch(relative_path, pattern) or fnmatch(name, pattern) for pattern in patterns)
+
+
+def is_excluded(relative_path: str, exclude: Optional[List[str]]) -> bool:
+    """Whether a file or directory, or any directory above it, matches one of the exclude patterns."""
+    parts = relative_path.split('/')
+    return bool(exclude) and any(_matches('/'.join(parts[:depth]), exclude) for depth in range(1, len(parts) + 1))
+
+
+def is_selected(relative_path: str,
+                include: Optional[List[str]] = None,
+                exclude: Optional[List[str]] = None,
+                extensions: List[str] = None) -> bool:
+    """
+    Whether scan_images would yield the file at relative_path.
+
+    Args:
+        relative_path: POSIX path of the file relative to the scanned directory
+        include, exclude, extensions: As for scan_images; exclude also applies to
+            every directory on the path
+    """
+    if is_excluded(relative_path, exclude):
+        return False
+    if not is_supported(relative_path.rsplit('/', 1)[-1], extensions):
+        return False
+    return not include or _matches(relative_path, include)
+
+
+def scan_images(input_dir: str,
+                recursive: bool = False,
+                include: Optional[List[str]] = None,
+                exclude: Optional[List[str]] = None,
+                extensions: List[str] = None) -> Iterator[Path]:
+    """
+    Yield the supported images in input_dir, in a deterministic sorted order.
+
+    Each directory is read with a single os.scandir pass and its entries are
+    sorted by name before being yielded, so a large directory is listed once
+    and processing starts as soon as its names are read, without statting every
+    file up front. Extensions are matched case-insensitively, and every file is
+    yielded once however its extension is capitalised.
+
+    Args:
+        input_dir: Directory to scan
+        recursive: Also scan subdirectories (depth first, after the files of each directory)
+        include: Only yield images whose name or path relative to input_dir
+            matches one of these glob patterns
+        exclude: Skip images and directories whose name or relative path matches
+            one of these glob patterns
+        extensions: Lower-case extensions to accept (defaults to Config.SUPPORTED_FORMATS)
+
+    Yields:
+        Path of each image
+    """
+    extensions = extensions or Config.SUPPORTED_FORMATS
+    # Directories already walked, so symlink loops are not followed forever
+    seen_dirs = set()
+
+    def walk(directory: str, prefix: str) -> Iterator[Path]:
+        stat = os.stat(directory)
+        if (stat.st_dev, stat.st_ino) in seen_dirs:
+            return
+        seen_dirs.add((stat.st_dev, stat.st_ino))
+
+        with os.scandir(directory) as entries:
+            entries = sorted(entries, key=lambda entry: entry.name)
+
+        subdirectories = []
+        for entry in entries:
+            relative_path = prefix + entry.name
+            if exclude and _matches(relative_path, exclude):
+                continue
+            try:
+                if entry.is_dir():
+                    if recursive:
+                        subdirectories.append((entry.path, relative_path + '/'))
+                    continue
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            if not is_supported(entry.name, extensions):
+                continue
+            if include and not _matches(relative_path, include):
+                continue
+            yield Path(entry.path)
+
+        for path, subdirectory_prefix in subdirectories:
+            yield from walk(path, subdirectory_prefix)
+
+    if not os.path.isdir(input_dir):
+        return
+    yield from walk(input_dir, '')
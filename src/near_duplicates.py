@@ -0,0 +1,251 @@
+import os
+import json
+import math
+import time
+import sqlite3
+import hashlib
+import threading
+from itertools import combinations
+from typing import Dict, List, Optional
+
+from PIL import Image, ImageOps
+
+from .config import Config
+
+# Supported perceptual hashes, both 64 bits
+PERCEPTUAL_HASHES = ('phash', 'dhash')
+
+# Images whose downscaled pixels span fewer grey levels than this are too flat to
+# hash: every solid colour or blank scan would otherwise share the same hash
+MIN_CONTRAST = 16
+
+# The 64-bit hash is split into this many 16-bit chunks, each indexed separately
+CHUNKS = 4
+CHUNK_BITS = 64 // CHUNKS
+
+_PHASH_SIZE = 32
+_PHASH_LOW = 8
+# DCT-II basis for the lowest _PHASH_LOW frequencies of a _PHASH_SIZE-sample row
+_DCT = [
+    [math.cos(math.pi * (2 * n + 1) * k / (2 * _PHASH_SIZE)) for n in range(_PHASH_SIZE)]
+    for k in range(_PHASH_LOW)
+]
+
+
+def _grayscale(path: str, size) -> Optional[List[int]]:
+    """Pixels of the image at path, upright, in greyscale and resized to size, row by row."""
+    with Image.open(path) as img:
+        # JPEGs are decoded at a fraction of their size, which is all a hash needs
+        img.draft('L', (size[0] * 4, size[1] * 4))
+        img = ImageOps.exif_transpose(img).convert('L').resize(size, Image.LANCZOS)
+        pixels = list(img.getdata())
+    if max(pixels) - min(pixels) < MIN_CONTRAST:
+        return None
+    return pixels
+
+
+def dhash(path: str) -> Optional[int]:
+    """Difference hash: whether each pixel of a 9x8 thumbnail is brighter than its right neighbour."""
+    pixels = _grayscale(path, (9, 8))
+    if pixels is None:
+        return None
+    value = 0
+    for row in range(8):
+        for column in range(8):
+            value = (value << 1) | (pixels[row * 9 + column] < pixels[row * 9 + column + 1])
+    return value
+
+
+def phash(path: str) -> Optional[int]:
+    """DCT hash: whether each of the 8x8 lowest frequencies of a 32x32 thumbnail is above their median."""
+    pixels = _grayscale(path, (_PHASH_SIZE, _PHASH_SIZE))
+    if pixels is None:
+        return None
+    rows = [pixels[i:i + _PHASH_SIZE] for i in range(0, len(pixels), _PHASH_SIZE)]
+    # Separable 2D DCT, keeping only the low frequencies: rows first, then columns
+    row_coefficients = [[sum(b * p for b, p in zip(basis, row)) for basis in _DCT] for row in rows]
+    coefficients = [
+        sum(_DCT[u][n] * row_coefficients[n][v] for n in range(_PHASH_SIZE))
+        for u in range(_PHASH_LOW) for v in range(_PHASH_LOW)
+    ]
+    median = sorted(coefficients)[len(coefficients) // 2]
+    value = 0
+    for coefficient in coefficients:
+        value = (value << 1) | (coefficient > median)
+    return value
+
+
+def perceptual_hash(path: str, algorithm: str = None) -> Optional[str]:
+    """
+    Perceptual hash of an image as 16 hex digits.
+
+    Args:
+        path: Image file
+        algorithm: 'phash' or 'dhash' (defaults to Config.PERCEPTUAL_HASH)
+
+    Returns:
+        The hash, or None if the image cannot be read or is too flat to hash
+    """
+    algorithm = algorithm or Config.PERCEPTUAL_HASH
+    if algorithm not in PERCEPTUAL_HASHES:
+        raise ValueError(f"Unknown perceptual hash {algorithm!r}, expected one of {', '.join(PERCEPTUAL_HASHES)}")
+    try:
+        value = phash(path) if algorithm == 'phash' else dhash(path)
+    except Exception:
+        return None
+    return None if value is None else f'{value:016x}'
+
+
+def hamming_distance(a: str, b: str) -> int:
+    """Number of differing bits between two hex hashes."""
+    return bin(int(a, 16) ^ int(b, 16)).count('1')
+
+
+def context_key(algorithm: str,
+                prompt: str,
+                examples_digest: str,
+                model: str,
+                max_tokens: int,
+                temperature: float) -> str:
+    """
+    Key of the request settings a description was made with.
+
+    Descriptions are only reused between images described with the same
+    prompt, examples, model and sampling parameters, like the response cache.
+    """
+    payload = json.dumps([algorithm, prompt, examples_digest, model, max_tokens, temperature], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _chunks(value: str) -> List[int]:
+    number = int(value, 16)
+    mask = (1 << CHUNK_BITS) - 1
+    return [(number >> (CHUNK_BITS * (CHUNKS - 1 - i))) & mask for i in range(CHUNKS)]
+
+
+def _neighbours(chunk: int, radius: int) -> List[int]:
+    """Every CHUNK_BITS-bit value within radius bits of chunk, including chunk itself."""
+    values = [chunk]
+    for distance in range(1, radius + 1):
+        for bits in combinations(range(CHUNK_BITS), distance):
+            flipped = chunk
+            for bit in bits:
+                flipped ^= 1 << bit
+            values.append(flipped)
+    return values
+
+
+class NearDuplicateIndex:
+    """
+    Persistent SQLite index of described images by perceptual hash.
+
+    Lookups use multi-index hashing: each hash is split into CHUNKS 16-bit
+    chunks with a database index on each. If two hashes are within distance
+    d, at least one chunk pair is within d // CHUNKS bits (pigeonhole), so a
+    search only enumerates the few chunk values that close to the query's
+    chunks, reads the matching rows through the indexes and checks their full
+    distance. A lookup touches a handful of rows however many millions of
+    images are indexed, and nothing has to be loaded into memory first.
+    """
+
+    def __init__(self, path: str = None, max_distance: int = None, max_age_days: float = None, timeout: float = None):
+        """
+        Args:
+            path: Database file (defaults to Config.NEAR_DUPLICATE_PATH)
+            max_distance: Largest Hamming distance counted as a near duplicate
+                (defaults to Config.NEAR_DUPLICATE_DISTANCE)
+            max_age_days: Age after which entries expire (defaults to Config.CACHE_MAX_AGE_DAYS)
+            timeout: Seconds to wait for another process's write (defaults to Config.CACHE_TIMEOUT)
+        """
+        self.path = path or Config.NEAR_DUPLICATE_PATH
+        self.max_distance = Config.NEAR_DUPLICATE_DISTANCE if max_distance is None else max_distance
+        self.max_age_days = max_age_days if max_age_days is not None else Config.CACHE_MAX_AGE_DAYS
+        self.matches = 0
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Shared by the bulk engine's worker threads, serialised by the lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path,
+                                     timeout=Config.CACHE_TIMEOUT if timeout is None else timeout,
+                                     check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        chunk_columns = ''.join(f'c{i} INTEGER NOT NULL, ' for i in range(CHUNKS))
+        self._conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS images (
+                context TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                {chunk_columns}
+                path TEXT NOT NULL,
+                description TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (context, digest)
+            )
+            """
+        )
+        for i in range(CHUNKS):
+            self._conn.execute(f'CREATE INDEX IF NOT EXISTS images_c{i} ON images (context, c{i})')
+        self._conn.commit()
+        self.evict()
+
+    def add(self, image_hash: str, context: str, digest: str, path: str, description: str):
+        """Index a described image, replacing an earlier description of the same content."""
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO images VALUES (?, ?, ?, {', '.join('?' * CHUNKS)}, ?, ?, ?)",
+                (context, digest, image_hash, *_chunks(image_hash), path, description, time.time())
+            )
+            self._conn.commit()
+
+    def find(self, image_hash: str, context: str) -> Optional[Dict]:
+        """
+        Closest indexed image within max_distance of image_hash, described with the same context.
+
+        Returns:
+            Dictionary with the 'description', 'path', 'digest' and 'distance' of
+            the match (the earliest described on a tie), or None
+        """
+        radius = self.max_distance // CHUNKS
+        cutoff = time.time() - self.max_age_days * 86400
+        best = None
+        with self._lock:
+            for i, chunk in enumerate(_chunks(image_hash)):
+                values = _neighbours(chunk, radius)
+                rows = self._conn.execute(
+                    f"SELECT hash, digest, path, description, created_at FROM images "
+                    f"WHERE context = ? AND c{i} IN ({', '.join('?' * len(values))}) AND created_at >= ?",
+                    (context, *values, cutoff)
+                )
+                for other, digest, path, description, created_at in rows:
+                    distance = hamming_distance(image_hash, other)
+                    if distance <= self.max_distance and (best is None or (distance, created_at) < best[0]):
+                        best = ((distance, created_at), {
+                            'description': description,
+                            'path': path,
+                            'digest': digest,
+                            'distance': distance
+                        })
+            if best is not None:
+                self.matches += 1
+        return best[1] if best else None
+
+    def evict(self) -> int:
+        """Drop entries older than max_age_days; returns how many were removed."""
+        with self._lock:
+            cutoff = time.time() - self.max_age_days * 86400
+            removed = self._conn.execute('DELETE FROM images WHERE created_at < ?', (cutoff,)).rowcount
+            self._conn.commit()
+            return removed
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM images').fetchone()[0]
+
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,162 @@
+import os
+import json
+import threading
+from typing import Dict, List
+
+
+def is_error(result: Dict) -> bool:
+    """Whether a result records a failed description."""
+    return (result.get('description') or '').startswith('Error:')
+
+
+def checkpoint_path(output_file: str) -> str:
+    """Path of the JSONL checkpoint that accompanies a JSON output file."""
+    root, _ = os.path.splitext(output_file)
+    return root + '.jsonl'
+
+
+def run_file_path(output_file: str, name: str) -> str:
+    """
+    Path of a report or state file belonging to an output file, e.g. ai_descriptions/assets.run/metrics.json.
+
+    These are kept in a directory of their own, so the only JSON files next to
+    the outputs are description results.
+    """
+    root, _ = os.path.splitext(output_file)
+    return os.path.join(root + '.run', name + '.json')
+
+
+def watch_state_path(output_file: str) -> str:
+    """Path of the file recording which image versions watch mode has described for an output file."""
+    return run_file_path(output_file, 'watch')
+
+
+def load_watch_state(output_file: str) -> Dict[str, Dict]:
+    """Described images of a watched output, keyed by filename: their relative 'path' and content 'digest'."""
+    path = watch_state_path(output_file)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('images', {})
+    except ValueError:
+        return {}
+
+
+def save_watch_state(output_file: str, images: Dict[str, Dict]):
+    path = watch_state_path(output_file)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_file = path + '.tmp'
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump({'images': images}, f, ensure_ascii=False)
+    os.replace(temp_file, path)
+
+
+class JsonlWriter:
+    """
+    Append-only JSONL writer that makes every record durable as soon as it is written.
+
+    Each result is flushed and fsync'd, so a crash loses at most the record
+    being written, and load_results skips a partially written last line.
+    """
+
+    def __init__(self, path: str, append: bool = True):
+        """
+        Args:
+            path: JSONL file to write
+            append: Keep existing records (resume) instead of starting a new file
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Terminate a partial line left by an interrupted write so the next record starts cleanly
+        needs_newline = False
+        if append and os.path.exists(path) and os.path.getsize(path):
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b'\n'
+
+        self._lock = threading.Lock()
+        self._file = open(path, 'a' if append else 'w', encoding='utf-8')
+        if needs_newline:
+            self._file.write('\n')
+        self._sync()
+
+    def write(self, result: Dict):
+        """Append one result and sync it to disk."""
+        line = json.dumps(result, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_results(output_file: str) -> Dict[str, Dict]:
+    """
+    Load previously written results for a bulk run, keyed by filename.
+
+    Reads the legacy JSON array output if present, then the JSONL checkpoint,
+    so the most recent record for a filename wins. A truncated trailing line
+    from an interrupted write is ignored.
+    """
+    results = {}
+
+    if os.path.exists(output_file):
+        try:
+            with open(output_file, 'r', encoding='utf-8') as f:
+                for item in json.load(f):
+                    results[item['filename']] = item
+        except (ValueError, KeyError, TypeError):
+            pass
+
+    jsonl_file = checkpoint_path(output_file)
+    if os.path.exists(jsonl_file):
+        with open(jsonl_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    continue
+                results[item['filename']] = item
+
+    return results
+
+
+def compact(results: Dict[str, Dict], filenames: List[str], output_file: str) -> List[Dict]:
+    """
+    Write the legacy JSON array output, in the order of filenames.
+
+    Args:
+        results: Results keyed by filename, e.g. from load_results
+        filenames: Filenames to include, in output order
+        output_file: JSON file to write
+
+    Returns:
+        The list of results written
+    """
+    ordered = [results[name] for name in filenames if name in results]
+
+    # Write to a temporary file first so readers never see a half-written array
+    temp_file = output_file + '.tmp'
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(ordered, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_file, output_file)
+
+    return ordered
@@ -0,0 +1,58 @@
+import re
+import json
+from typing import Dict, List, Tuple
+
+# Appended to the prompt of packed requests. It does not mention how many images
+# follow, so the text, and with it the shared prompt prefix and cache keys, is the
+# same for every pack.
+PACK_INSTRUCTIONS = """
+
+    PACKED REQUEST FORMAT:
+    - Several images follow, each introduced by a line "Image ID: <id>"
+    - Describe every image separately, following all of the guidelines above; never compare or combine images
+    - Reply with a single JSON object and nothing else: each key is an image ID and each value is the complete description of that image as a string
+"""
+
+_CODE_FENCE = re.compile(r'^```(?:json)?\s*|\s*```$')
+
+
+def pack_ids(count: int) -> List[str]:
+    """Short IDs labelling the images of a pack, in order."""
+    return [f'img{number}' for number in range(1, count + 1)]
+
+
+def id_label(image_id: str) -> Dict:
+    """Text content part that introduces the image with image_id."""
+    return {"type": "text", "text": f"Image ID: {image_id}"}
+
+
+def parse_packed_response(content: str, ids: List[str]) -> Tuple[Dict[str, str], List[str]]:
+    """
+    Split a packed response into one description per image ID.
+
+    A section is accepted if its key is one of ids and its value is a non-empty
+    string; keys that were not asked for are ignored. A reply that is not a
+    JSON object fails every image.
+
+    Args:
+        content: Message content of the packed response
+        ids: Image IDs sent in the request
+
+    Returns:
+        Descriptions keyed by image ID, and the IDs whose section is missing or malformed
+    """
+    try:
+        reply = json.loads(_CODE_FENCE.sub('', (content or '').strip()))
+    except ValueError:
+        return {}, list(ids)
+    if not isinstance(reply, dict):
+        return {}, list(ids)
+
+    descriptions, failed = {}, []
+    for image_id in ids:
+        description = reply.get(image_id)
+        if isinstance(description, str) and description.strip():
+            descriptions[image_id] = description.strip()
+        else:
+            failed.append(image_id)
+    return descriptions, failed
@@ -0,0 +1,53 @@
+import sys
+from typing import Dict, List
+
+
+class PreparedPrompt:
+    """
+    Prompt text and encoded example images shared by every request of a run.
+
+    Built once by ArtDescriptor.prepare_prompt so that bulk runs with examples
+    read, downsize and encode each example image a single time, however many
+    target images are described.
+    
+    The prompt text and example images form prefix_parts, the leading content of
+    every request. Only the target image follows them, so every request of a run
+    starts with the same bytes and the API can serve that prefix from its prompt
+    cache. With an example_index the examples are chosen per image, so only
+    the prompt text is shared.
+    """
+
+    def __init__(self,
+                 text: str,
+                 example_parts: List[Dict] = None,
+                 image_tokens: int = 0,
+                 examples_digest: str = '',
+                 example_index=None):
+        """
+        Args:
+            text: Prompt text, followed by the example descriptions if any
+            example_parts: image_url content parts for the example images, in order
+            image_tokens: Estimated tokens of the example images
+            examples_digest: Digest of the example image bytes and descriptions ('' if none)
+            example_index: ExampleIndex to pick examples from for each image instead of
+                a fixed example set
+        """
+        self.text = text
+        self.example_parts = example_parts or []
+        self.image_tokens = image_tokens
+        self.examples_digest = examples_digest
+        self.example_index = example_index
+        # Static leading content of every request; never modified per image
+        self.prefix_parts = ({"type": "text", "text": text},) + tuple(self.example_parts)
+
+    @property
+    def example_count(self) -> int:
+        """Number of example images in the prompt."""
+        return len(self.example_parts)
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the prompt text and encoded example images."""
+        total = sys.getsizeof(self.text)
+        for part in self.example_parts:
+            total += sys.getsizeof(part['image_url']['url'])
+        return total
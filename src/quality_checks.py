@@ -0,0 +1,45 @@
+import re
+from typing import List, Optional
+
+from .config import Config
+
+# Phrases ACCESSIBILITY_PROMPT asks descriptions to avoid
+AVOIDED_PHRASES = re.compile(r'\b(?:image|picture) of\b', re.IGNORECASE)
+
+# Closing interpretation ACCESSIBILITY_PROMPT asks to omit, e.g. "The overall mood is..."
+INTERPRETATION = re.compile(r'^(?:the\s+)?overall\b', re.IGNORECASE)
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+def check_description(description: Optional[str]) -> List[str]:
+    """
+    Check a description against the style rules of ACCESSIBILITY_PROMPT, offline.
+
+    Checks that there is a description at all, the word count
+    (Config.QUALITY_MIN_WORDS to Config.QUALITY_MAX_WORDS), that it avoids
+    "image of" and "picture of", and that it does not close with an
+    "The overall ..." interpretation.
+
+    Args:
+        description: Generated description
+
+    Returns:
+        The rules it breaks, as short readable messages (empty if it passes)
+    """
+    if not description or not description.strip():
+        return ["empty description"]
+
+    issues = []
+    words = len(description.split())
+    if not Config.QUALITY_MIN_WORDS <= words <= Config.QUALITY_MAX_WORDS:
+        issues.append(f"{words} words, expected {Config.QUALITY_MIN_WORDS}-{Config.QUALITY_MAX_WORDS}")
+
+    phrases = sorted({match.group(0).lower() for match in AVOIDED_PHRASES.finditer(description)})
+    if phrases:
+        issues.append(f"uses {', '.join(repr(phrase) for phrase in phrases)}")
+
+    sentences = [sentence for sentence in _SENTENCE_END.split(description.strip()) if sentence]
+    if sentences and INTERPRETATION.match(sentences[-1]):
+        issues.append("ends with an interpretation ('The overall ...')")
+    return issues
@@ -0,0 +1,263 @@
+import re
+import math
+import time
+import random
+import asyncio
+import threading
+from typing import TYPE_CHECKING, Dict, Optional
+
+from .config import Config
+
+# openai is imported on first use: a scheduler is created with every
+# ArtDescriptor, including ones that never send a request
+if TYPE_CHECKING:
+    import openai
+
+
+def transient_errors() -> tuple:
+    """Errors worth retrying: throttling, dropped connections, timeouts and 5xx responses."""
+    import openai
+    return (
+        openai.RateLimitError,
+        openai.APIConnectionError,
+        openai.APITimeoutError,
+        openai.InternalServerError,
+    )
+
+
+def is_rate_limit(error: Exception) -> bool:
+    import openai
+    return isinstance(error, openai.RateLimitError)
+
+
+# Matches OpenAI reset durations such as "1s", "6m0s", "120ms" or "1h2m3.5s"
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+_DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """Convert a rate-limit reset header value into seconds."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def estimate_text_tokens(text: str) -> int:
+    """Rough token count for English text (about four characters per token)."""
+    return math.ceil(len(text) / 4)
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """
+    Token cost of a high-detail image input.
+
+    The image is scaled to fit within 2048x2048, then so that its shortest
+    side is at most 768px, and billed at 170 tokens per 512px tile plus 85.
+    """
+    if not width or not height:
+        # Unknown size, assume the worst case for a 2048x768 image
+        return 85 + 170 * 8
+
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+
+    tiles = math.ceil(width / 512) * math.ceil(height / 512)
+    return 85 + 170 * tiles
+
+
+class TokenBucket:
+    """A per-minute budget that refills continuously up to its capacity."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        """Add the budget accrued since the last refill."""
+        rate = self.capacity / 60.0
+        self.level = min(self.capacity, self.level + (now - self.updated) * rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` can be taken (0 if available now)."""
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / (self.capacity / 60.0)
+
+    def sync(self, limit: Optional[int], remaining: Optional[int]):
+        """Reconcile the local budget with the limits reported by the API."""
+        if limit:
+            self.capacity = float(limit)
+        if remaining is not None:
+            self.level = min(self.level, float(remaining), self.capacity)
+
+
+class RequestScheduler:
+    """
+    Rate-limit-aware scheduler for chat completion requests.
+
+    Every request reserves one unit of the requests-per-minute budget and its
+    estimated token cost from the tokens-per-minute budget before it is sent,
+    so bulk runs can work close to the account quota without being rejected.
+    Limits are learned from the x-ratelimit-* response headers, and transient
+    errors are retried with jittered exponential backoff.
+    """
+
+    def __init__(self,
+                 requests_per_minute: int = None,
+                 tokens_per_minute: int = None,
+                 max_retries: int = None,
+                 base_delay: float = 1.0,
+                 max_delay: float = 60.0):
+        self.requests = TokenBucket(requests_per_minute or Config.RATE_LIMIT_RPM)
+        self.tokens = TokenBucket(tokens_per_minute or Config.RATE_LIMIT_TPM)
+        self.max_retries = Config.MAX_RETRIES if max_retries is None else max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: int) -> float:
+        """Take budget for one request, or return how long to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                return self._blocked_until - now
+
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+            if wait > 0:
+                return wait
+
+            self.requests.level -= 1
+            self.tokens.level -= min(tokens, self.tokens.capacity)
+            return 0.0
+
+    def acquire(self, tokens: int):
+        """Block until there is budget to send a request of `tokens` estimated tokens."""
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int):
+        """Async counterpart of acquire."""
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def update_from_headers(self, headers):
+        """Apply the x-ratelimit-* headers of a response to the local budgets."""
+        def as_int(name):
+            value = headers.get(name)
+            try:
+                return int(value) if value is not None else None
+            except ValueError:
+                return None
+
+        with self._lock:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            self.requests.sync(
+                as_int('x-ratelimit-limit-requests'),
+                as_int('x-ratelimit-remaining-requests')
+            )
+            self.tokens.sync(
+                as_int('x-ratelimit-limit-tokens'),
+                as_int('x-ratelimit-remaining-tokens')
+            )
+
+    def backoff_delay(self, attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, never shorter than the server's Retry-After."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+        response = getattr(error, 'response', None)
+        if response is not None:
+            retry_after = parse_reset_duration(response.headers.get('retry-after'))
+            if retry_after is None and is_rate_limit(error):
+                retry_after = max(
+                    parse_reset_duration(response.headers.get('x-ratelimit-reset-requests')) or 0,
+                    parse_reset_duration(response.headers.get('x-ratelimit-reset-tokens')) or 0
+                )
+            if retry_after:
+                delay = max(delay, retry_after)
+
+        return delay
+
+    def _should_retry(self, attempt: int, error: Exception) -> bool:
+        if attempt >= self.max_retries or not isinstance(error, transient_errors()):
+            return False
+        # An exhausted quota will not recover by waiting
+        body = getattr(error, 'body', None)
+        if isinstance(body, dict) and body.get('code') == 'insufficient_quota':
+            return False
+        return True
+
+    def _on_retry(self, attempt: int, error: Exception) -> float:
+        delay = self.backoff_delay(attempt, error)
+        with self._lock:
+            self.retries += 1
+            if is_rate_limit(error):
+                # Hold back every worker, not just the one that was rejected
+                self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+        return delay
+
+    def create(self, client: 'openai.OpenAI', request: Dict):
+        """
+        Send a chat completion request once budget allows, retrying transient errors.
+
+        Args:
+            client: OpenAI client to send the request with
+            request: Request built by ArtDescriptor._build_request
+
+        Returns:
+            The parsed ChatCompletion response
+        """
+        attempt = 0
+        while True:
+            self.acquire(request['estimated_tokens'])
+            try:
+                raw = client.chat.completions.with_raw_response.create(**request['params'])
+            except Exception as e:
+                if not self._should_retry(attempt, e):
+                    raise
+                time.sleep(self._on_retry(attempt, e))
+                attempt += 1
+                continue
+
+            self.update_from_headers(raw.headers)
+            return raw.parse()
+
+    async def acreate(self, client: 'openai.AsyncOpenAI', request: Dict):
+        """Async counterpart of create."""
+        attempt = 0
+        while True:
+            await self.aacquire(request['estimated_tokens'])
+            try:
+                raw = await client.chat.completions.with_raw_response.create(**request['params'])
+            except Exception as e:
+                if not self._should_retry(attempt, e):
+                    raise
+                await asyncio.sleep(self._on_retry(attempt, e))
+                attempt += 1
+                continue
+
+            self.update_from_headers(raw.headers)
+            return raw.parse()
@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, List, Optional
+
+from .config import Config
+
+
+def cache_key(image_digest: str,
+              prompt: str,
+              examples_digest: str,
+              model: str,
+              max_tokens: int,
+              temperature: float) -> str:
+    """
+    Content-addressed key for a description request.
+
+    Args:
+        image_digest: SHA-256 hex digest of the target image bytes
+        prompt: Prompt text sent with the image
+        examples_digest: Digest of the example images and descriptions ('' if none)
+        model: Model name
+        max_tokens: Maximum completion tokens
+        temperature: Sampling temperature
+
+    Returns:
+        SHA-256 hex digest identifying the request
+    """
+    payload = json.dumps(
+        [image_digest, prompt, examples_digest, model, max_tokens, temperature],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def examples_digest(example_digests: List[str], example_descriptions: List[str]) -> str:
+    """Digest of an example set from its image digests and descriptions, in order."""
+    if not example_digests:
+        return ''
+    payload = json.dumps(list(zip(example_digests, example_descriptions)), ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 hex digest of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent SQLite cache of generated descriptions.
+
+    Entries expire after max_age_days, and the least recently used entries are
+    evicted once the stored descriptions exceed max_bytes.
+    """
+
+    def __init__(self,
+                 path: str = None,
+                 max_bytes: int = None,
+                 max_age_days: float = None,
+                 timeout: float = None):
+        self.path = path or Config.CACHE_PATH
+        self.max_bytes = max_bytes if max_bytes is not None else Config.CACHE_MAX_MB * 1024 * 1024
+        self.max_age_days = max_age_days if max_age_days is not None else Config.CACHE_MAX_AGE_DAYS
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Shared by the bulk engine's worker threads, serialised by the lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path,
+                                     timeout=Config.CACHE_TIMEOUT if timeout is None else timeout,
+                                     check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                description TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)')
+        self._conn.commit()
+        self.evict()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached description for key, or None on a miss."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT description, created_at FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            now = time.time()
+            if row is None or now - row[1] > self.max_age_days * 86400:
+                self.misses += 1
+                return None
+
+            self._conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, description: str):
+        """Store a description under key, replacing any existing entry."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)',
+                (key, description, len(description.encode('utf-8')), now, now)
+            )
+            self._conn.commit()
+
+    def evict(self) -> int:
+        """
+        Drop expired entries, then least recently used ones until under max_bytes.
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            cutoff = time.time() - self.max_age_days * 86400
+            removed = self._conn.execute('DELETE FROM responses WHERE created_at < ?', (cutoff,)).rowcount
+
+            total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            if total > self.max_bytes:
+                stale = []
+                for key, size in self._conn.execute('SELECT key, size FROM responses ORDER BY accessed_at'):
+                    if total <= self.max_bytes:
+                        break
+                    stale.append((key,))
+                    total -= size
+                self._conn.executemany('DELETE FROM responses WHERE key = ?', stale)
+                removed += len(stale)
+
+            self._conn.commit()
+            return removed
+
+    def stats(self) -> Dict:
+        """Hit/miss counts for this session plus the size of the cache on disk."""
+        with self._lock:
+            entries, total = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses'
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': f"{(self.hits / lookups * 100):.1f}%" if lookups else "0%",
+            'entries': entries,
+            'bytes': total
+        }
+
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,159 @@
+import os
+import re
+import glob
+import hashlib
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .image_scanner import scan_images
+from .output_writer import compact, is_error, load_results
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """
+    Parse a shard specification such as '2/4'.
+
+    Args:
+        spec: 'i/N', where shards are numbered 1 to N
+
+    Returns:
+        (i, N)
+    """
+    match = re.fullmatch(r'\s*(\d+)\s*/\s*(\d+)\s*', spec or '')
+    if not match:
+        raise ValueError(f"Invalid shard {spec!r}, expected i/N such as 1/4")
+    index, count = int(match.group(1)), int(match.group(2))
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Invalid shard {spec!r}, i must be between 1 and N")
+    return index, count
+
+
+def shard_of(filename: str, count: int) -> int:
+    """
+    Shard (1 to count) an image belongs to.
+
+    Depends only on the file name, not on what else is in the directory, so
+    adding or removing images never moves existing ones to another shard.
+    Results are keyed by file name, so images sharing a name in different
+    subdirectories always land in the same shard.
+    """
+    digest = hashlib.sha1(os.path.basename(filename).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % count + 1
+
+
+def in_shard(image_files: Iterable[Path], shard: Tuple[int, int]) -> Iterator[Path]:
+    """Pass through the images of image_files that belong to shard (i, N)."""
+    index, count = shard
+    for image_path in image_files:
+        if shard_of(image_path.name, count) == index:
+            yield image_path
+
+
+def shard_output_path(output_file: str, shard: Tuple[int, int]) -> str:
+    """Output file of one shard, e.g. ai_descriptions/assets.shard-2-of-4.json."""
+    root, ext = os.path.splitext(output_file)
+    return f"{root}.shard-{shard[0]}-of-{shard[1]}{ext or '.json'}"
+
+
+def find_shard_outputs(output_file: str) -> Dict[int, Dict[int, str]]:
+    """
+    Shard outputs written for output_file, including ones only checkpointed so far.
+
+    Returns:
+        Output paths keyed by shard count, then by shard index
+    """
+    root, ext = os.path.splitext(output_file)
+    ext = ext or '.json'
+    pattern = re.compile(re.escape(os.path.basename(root)) + r'\.shard-(\d+)-of-(\d+)' + re.escape(ext) + r'l?$')
+    found = {}
+    for path in glob.glob(glob.escape(root) + '.shard-*-of-*' + glob.escape(ext) + '*'):
+        match = pattern.match(os.path.basename(path))
+        if match:
+            index, count = int(match.group(1)), int(match.group(2))
+            found.setdefault(count, {})[index] = shard_output_path(output_file, (index, count))
+    return found
+
+
+def merge_shards(output_file: str,
+                 input_dir: Optional[str] = None,
+                 recursive: bool = False,
+                 include: List[str] = None,
+                 exclude: List[str] = None,
+                 count: Optional[int] = None) -> Dict:
+    """
+    Combine the shard outputs of a bulk run into output_file.
+
+    Refuses to merge while any shard's output is missing. An image described
+    by more than one shard keeps a successful description over an error, then
+    the one from the shard it hashes to, then the one from the lowest shard.
+    Results are written in the order input_dir is scanned in when it is given,
+    so the merged file matches what a single-machine run would produce, and
+    any image of input_dir without a result is reported.
+
+    Args:
+        output_file: Canonical output file, e.g. ai_descriptions/assets.json
+        input_dir: Image directory the shards processed, to order the results and find
+            images no shard described
+        recursive, include, exclude: Which images of input_dir were processed, as for scan_images
+        count: Number of shards (needed only if outputs for several shard counts exist)
+
+    Returns:
+        Report with the shard 'count', the number of 'images' merged, and lists of
+        'duplicates', 'misplaced' (described by a shard they do not hash to),
+        'missing' (in input_dir but described by no shard), 'extra' (described but
+        no longer in input_dir) and 'failed' file names
+    """
+    found = find_shard_outputs(output_file)
+    if count is None:
+        if not found:
+            raise ValueError(f"No shard outputs found for {output_file}")
+        if len(found) > 1:
+            counts = ', '.join(str(n) for n in sorted(found))
+            raise ValueError(f"Shard outputs for several shard counts ({counts}) exist for {output_file}; "
+                             f"pass the shard count to merge")
+        count = next(iter(found))
+    outputs = found.get(count, {})
+    missing_shards = [index for index in range(1, count + 1) if index not in outputs]
+    if missing_shards:
+        raise ValueError(f"No output for shard(s) {', '.join(f'{index}/{count}' for index in missing_shards)} "
+                         f"of {output_file}")
+
+    def preference(result: Dict, index: int):
+        return (is_error(result), shard_of(result['filename'], count) != index, index)
+
+    results, sources, misplaced = {}, {}, []
+    for index in range(1, count + 1):
+        for filename, result in load_results(outputs[index]).items():
+            if shard_of(filename, count) != index:
+                misplaced.append(filename)
+            sources.setdefault(filename, []).append(index)
+            if filename not in results or preference(result, index) < preference(*results[filename]):
+                results[filename] = (result, index)
+    results = {filename: result for filename, (result, _) in results.items()}
+    duplicates = {filename: shards for filename, shards in sources.items() if len(shards) > 1}
+
+    missing, extra = [], []
+    if input_dir and os.path.isdir(input_dir):
+        # First image of each name wins, as in a single-machine bulk run
+        filenames = list(dict.fromkeys(path.name for path in scan_images(input_dir, recursive, include, exclude)))
+        scanned = set(filenames)
+        missing = [filename for filename in filenames if filename not in results]
+        extra = sorted(filename for filename in results if filename not in scanned)
+        filenames += extra
+    else:
+        filenames = sorted(results)
+
+    directory = os.path.dirname(output_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    merged = compact(results, filenames, output_file)
+
+    return {
+        'count': count,
+        'images': len(merged),
+        'duplicates': sorted(duplicates),
+        'misplaced': sorted(set(misplaced)),
+        'missing': missing,
+        'extra': extra,
+        'failed': [result['filename'] for result in merged if is_error(result)]
+    }
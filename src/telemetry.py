@@ -0,0 +1,158 @@
+import os
+import json
+import math
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List
+
+
+# Stages of describing one image, in pipeline order; request_fast and request_strong
+# time the requests of each model cascade tier
+STAGES = ('file_read', 'image_info', 'cache_lookup', 'duplicate_lookup', 'encode',
+          'request', 'request_fast', 'request_strong', 'parse')
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def percentile(sorted_values: List[float], quantile: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(quantile * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Metrics:
+    """
+    Latency and throughput telemetry for a bulk run.
+
+    Stage durations are kept as raw samples (one float per image and stage),
+    which is cheap at the scale of a run and gives exact percentiles. Counters
+    hold bytes, images and other totals.
+    """
+
+    def __init__(self, max_samples: int = None):
+        """
+        Args:
+            max_samples: Keep only the most recent samples per stage, for long-running
+                processes; percentiles then cover that window while counts and totals
+                still cover everything observed (default: keep every sample)
+        """
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.max_samples = max_samples
+        self.timings = {}
+        # Per-stage [count, total seconds] over every sample, windowed or not
+        self.totals = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        """Record one duration for a stage."""
+        with self._lock:
+            if stage not in self.timings:
+                self.timings[stage] = deque(maxlen=self.max_samples) if self.max_samples else []
+                self.totals[stage] = [0, 0.0]
+            self.timings[stage].append(seconds)
+            self.totals[stage][0] += 1
+            self.totals[stage][1] += seconds
+
+    @contextmanager
+    def time(self, stage: str):
+        """Time the enclosed block as one sample of stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def add(self, counter: str, value: float = 1):
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def summary(self, extra_counters: Dict = None) -> Dict:
+        """
+        Aggregate the run: per-stage count, total, mean and p50/p95/p99, plus counters.
+
+        Args:
+            extra_counters: Totals kept elsewhere (tokens, retries) to include with the counters
+        """
+        with self._lock:
+            timings = {stage: sorted(values) for stage, values in self.timings.items()}
+            totals = {stage: tuple(total) for stage, total in self.totals.items()}
+            counters = dict(self.counters)
+        counters.update(extra_counters or {})
+
+        stages = {}
+        for stage in sorted(timings, key=lambda name: STAGES.index(name) if name in STAGES else len(STAGES)):
+            values = timings[stage]
+            count, total = totals[stage]
+            stages[stage] = {
+                'count': count,
+                'total_seconds': round(total, 6),
+                'mean_seconds': round(total / count, 6),
+                **{f"p{int(q * 100)}_seconds": round(percentile(values, q), 6) for q in QUANTILES},
+                'max_seconds': round(values[-1], 6)
+            }
+
+        elapsed = self.elapsed
+        images = counters.get('images', 0)
+        return {
+            'started_at': self.started,
+            'elapsed_seconds': round(elapsed, 3),
+            'images_per_second': round(images / elapsed, 3) if elapsed else 0.0,
+            'stages': stages,
+            'counters': counters
+        }
+
+    def write_json(self, path: str, summary: Dict):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+
+    def prometheus_text(self, summary: Dict, run: str) -> str:
+        """Render the summary in the Prometheus text exposition format, labelled with run."""
+        label = run.replace('\\', '\\\\').replace('"', '\\"')
+        lines = [
+            '# HELP art_descriptions_stage_seconds Time spent per image in each processing stage.',
+            '# TYPE art_descriptions_stage_seconds summary'
+        ]
+        for stage, stats in summary['stages'].items():
+            for q in QUANTILES:
+                lines.append(f'art_descriptions_stage_seconds{{run="{label}",stage="{stage}",quantile="{q}"}} '
+                             f'{stats[f"p{int(q * 100)}_seconds"]}')
+            lines.append(f'art_descriptions_stage_seconds_sum{{run="{label}",stage="{stage}"}} {stats["total_seconds"]}')
+            lines.append(f'art_descriptions_stage_seconds_count{{run="{label}",stage="{stage}"}} {stats["count"]}')
+
+        for name, value in sorted(summary['counters'].items()):
+            lines.append(f'# TYPE art_descriptions_{name}_total counter')
+            lines.append(f'art_descriptions_{name}_total{{run="{label}"}} {value}')
+
+        lines += [
+            '# TYPE art_descriptions_images_per_second gauge',
+            f'art_descriptions_images_per_second{{run="{label}"}} {summary["images_per_second"]}',
+            '# TYPE art_descriptions_run_duration_seconds gauge',
+            f'art_descriptions_run_duration_seconds{{run="{label}"}} {summary["elapsed_seconds"]}',
+            '# TYPE art_descriptions_last_run_timestamp_seconds gauge',
+            f'art_descriptions_last_run_timestamp_seconds{{run="{label}"}} {round(summary["started_at"], 3)}'
+        ]
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str, summary: Dict, run: str):
+        """
+        Write the summary in the Prometheus text format.
+
+        The file is replaced atomically, as the node exporter textfile collector expects.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_file = path + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text(summary, run))
+        os.replace(temp_file, path)
@@ -0,0 +1,93 @@
+import threading
+from typing import Dict, List, Optional
+
+
+def usage_from_response(usage) -> Dict:
+    """
+    Token counts from a chat completion's usage.
+
+    Accepts the client's usage object or the plain dict found in Batch API
+    outputs. cached_tokens comes from prompt_tokens_details and is 0 when the
+    API does not report it.
+    """
+    if usage is None:
+        return {'prompt_tokens': 0, 'cached_tokens': 0, 'completion_tokens': 0}
+    if not isinstance(usage, dict):
+        usage = usage.model_dump() if hasattr(usage, 'model_dump') else dict(usage)
+
+    details = usage.get('prompt_tokens_details') or {}
+    return {
+        'prompt_tokens': usage.get('prompt_tokens') or 0,
+        'cached_tokens': details.get('cached_tokens') or 0,
+        'completion_tokens': usage.get('completion_tokens') or 0
+    }
+
+
+def split_usage(tokens: Dict, count: int) -> List[Dict]:
+    """
+    Share one response's token counts between the count images it described.
+
+    Each count is divided as evenly as whole tokens allow, the first images
+    taking the remainder, so the shares add up to the response's usage.
+    """
+    shares = [{} for _ in range(count)]
+    for name, value in tokens.items():
+        quotient, remainder = divmod(value, count)
+        for i, share in enumerate(shares):
+            share[name] = quotient + (1 if i < remainder else 0)
+    return shares
+
+
+def model_prices(model: str, prices: Dict[str, List[float]]) -> Optional[List[float]]:
+    """
+    Prices for model, per million input, cached input and output tokens.
+
+    A dated snapshot such as gpt-4o-2024-08-06 uses the prices of the longest
+    model name it starts with. Returns None for unknown models.
+    """
+    if model in prices:
+        return prices[model]
+    matches = [name for name in prices if model.startswith(name + '-')]
+    return prices[max(matches, key=len)] if matches else None
+
+
+class UsageStats:
+    """Token usage totals for a run, including how much of the prompt was served from the API's prompt cache."""
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, usage) -> Dict:
+        """Add one response's usage (object or dict) to the totals and return its token counts."""
+        tokens = usage_from_response(usage)
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += tokens['prompt_tokens']
+            self.cached_tokens += tokens['cached_tokens']
+            self.completion_tokens += tokens['completion_tokens']
+        return tokens
+
+    @property
+    def cache_hit_ratio(self) -> float:
+        """Share of prompt tokens that were read from the prompt cache."""
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+    def cost(self, prices: List[float]) -> float:
+        """Estimated cost in USD, from prices per million input, cached input and output tokens."""
+        input_price, cached_price, output_price = prices
+        return ((self.prompt_tokens - self.cached_tokens) * input_price
+                + self.cached_tokens * cached_price
+                + self.completion_tokens * output_price) / 1_000_000
+
+    def to_dict(self) -> Dict:
+        return {
+            'requests': self.requests,
+            'prompt_tokens': self.prompt_tokens,
+            'cached_tokens': self.cached_tokens,
+            'completion_tokens': self.completion_tokens,
+            'cache_hit_ratio': round(self.cache_hit_ratio, 4)
+        }
@@ -0,0 +1,504 @@
+import os
+import json
+import time
+import signal
+import socket
+import sqlite3
+import threading
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from .config import Config
+from .output_writer import is_error
+from .telemetry import Metrics
+
+if TYPE_CHECKING:
+    from .art_descriptor import ArtDescriptor
+
+# pending: waiting to be leased (or for its retry backoff to pass); leased: reserved by a
+# worker until available_at; done: described; dead: failed QUEUE_MAX_ATTEMPTS times
+STATUSES = ('pending', 'leased', 'done', 'dead')
+
+# Seconds before a failed image is retried, doubling with each attempt up to the maximum
+RETRY_DELAY = 10
+MAX_RETRY_DELAY = 300
+
+# Latency samples a worker keeps per stage; it may run for days, so its telemetry is a window
+METRICS_WINDOW = 10000
+
+
+def _signature(path: str) -> str:
+    """Size and modification time of a file, to notice when a queued image changes."""
+    stat = os.stat(path)
+    return f'{stat.st_size}:{stat.st_mtime_ns}'
+
+
+class WorkQueue:
+    """
+    Durable queue of images to describe, in a SQLite file shared by worker processes.
+
+    Workers lease images for a limited time and renew the lease while they work
+    on them. An image whose worker crashes or is killed goes back to the queue
+    once its lease expires, and a failed image is retried with backoff until it
+    has been attempted Config.QUEUE_MAX_ATTEMPTS times, after which it is moved
+    to the dead letters for inspection. Everything is committed to disk as it
+    happens, so the queue survives restarts of the workers and of the host.
+
+    Each row's available_at is when it can next be leased: the end of the
+    retry backoff for pending images and the lease expiry for leased ones, so
+    one index serves both.
+    """
+
+    def __init__(self, path: str = None, lease_seconds: float = None, max_attempts: int = None):
+        """
+        Args:
+            path: Database file (defaults to Config.QUEUE_PATH)
+            lease_seconds: How long a lease lasts unless renewed (defaults to Config.QUEUE_LEASE_SECONDS)
+            max_attempts: Attempts before an image is dead-lettered (defaults to Config.QUEUE_MAX_ATTEMPTS)
+        """
+        self.path = path or Config.QUEUE_PATH
+        self.lease_seconds = lease_seconds or Config.QUEUE_LEASE_SECONDS
+        self.max_attempts = max_attempts or Config.QUEUE_MAX_ATTEMPTS
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # Autocommit mode: leases are taken in explicit BEGIN IMMEDIATE transactions, so
+        # two processes never lease the same image
+        self._conn = sqlite3.connect(self.path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS items (
+                id INTEGER PRIMARY KEY,
+                path TEXT NOT NULL,
+                prompt TEXT NOT NULL,
+                signature TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                available_at REAL NOT NULL,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                UNIQUE (path, prompt)
+            )
+            """
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS items_due ON items (status, available_at)')
+
+    def enqueue(self, image_paths: Iterable, prompt: Optional[str] = None) -> Tuple[int, int]:
+        """
+        Add images to the queue.
+
+        Images already queued with the same prompt are left alone, unless the
+        file changed since, in which case they are queued again from scratch.
+
+        Args:
+            image_paths: Images to describe
+            prompt: Custom prompt, or None for the default accessibility prompt
+
+        Returns:
+            (images added, changed images queued again)
+        """
+        added = requeued = 0
+        prompt = prompt or ''
+        image_paths = iter(image_paths)
+        while True:
+            chunk = [os.path.abspath(path) for _, path in zip(range(500), image_paths)]
+            if not chunk:
+                return added, requeued
+            rows = []
+            for path in chunk:
+                try:
+                    rows.append((path, _signature(path)))
+                except OSError:
+                    continue
+            now = time.time()
+            with self._lock:
+                self._conn.execute('BEGIN IMMEDIATE')
+                try:
+                    for path, signature in rows:
+                        cursor = self._conn.execute(
+                            "INSERT OR IGNORE INTO items (path, prompt, signature, status, available_at, created_at, updated_at) "
+                            "VALUES (?, ?, ?, 'pending', ?, ?, ?)",
+                            (path, prompt, signature, now, now, now)
+                        )
+                        if cursor.rowcount:
+                            added += 1
+                            continue
+                        # A leased image is left to its worker; it is queued again by the next fill
+                        cursor = self._conn.execute(
+                            "UPDATE items SET signature = ?, status = 'pending', attempts = 0, worker = NULL, "
+                            "available_at = ?, result = NULL, error = NULL, updated_at = ? "
+                            "WHERE path = ? AND prompt = ? AND signature != ? AND status != 'leased'",
+                            (signature, now, now, path, prompt, signature)
+                        )
+                        requeued += cursor.rowcount
+                    self._conn.execute('COMMIT')
+                except BaseException:
+                    self._conn.execute('ROLLBACK')
+                    raise
+
+    def lease(self, worker: str, count: int = 1) -> List[Dict]:
+        """
+        Lease up to count images for worker: expired leases first, then pending images in queue order.
+
+        An image whose lease expired after its last allowed attempt (its worker
+        kept crashing on it) is moved to the dead letters instead.
+
+        Returns:
+            The leased items, as dictionaries with 'id', 'path', 'prompt' and 'attempts'
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.execute(
+                    "UPDATE items SET status = 'dead', worker = NULL, updated_at = ?, "
+                    "error = 'Lease expired on the last attempt (worker crashed or was stopped?)' "
+                    "WHERE status = 'leased' AND available_at <= ? AND attempts >= ?",
+                    (now, now, self.max_attempts)
+                )
+                rows = []
+                for status in ('leased', 'pending'):
+                    rows += self._conn.execute(
+                        "SELECT id, path, prompt, attempts FROM items "
+                        "WHERE status = ? AND available_at <= ? ORDER BY available_at, id LIMIT ?",
+                        (status, now, count - len(rows))
+                    ).fetchall()
+                    if len(rows) >= count:
+                        break
+                self._conn.executemany(
+                    "UPDATE items SET status = 'leased', worker = ?, attempts = attempts + 1, "
+                    "available_at = ?, updated_at = ? WHERE id = ?",
+                    [(worker, now + self.lease_seconds, now, row[0]) for row in rows]
+                )
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        return [
+            {'id': item_id, 'path': path, 'prompt': prompt or None, 'attempts': attempts + 1}
+            for item_id, path, prompt, attempts in rows
+        ]
+
+    def _update_leased(self, sql: str, params: tuple, item_ids: Optional[List[int]], worker: str) -> int:
+        """
+        Apply sql to those of item_ids (or, if None, all images) still leased by worker.
+
+        Returns:
+            How many images were updated
+        """
+        sql += " WHERE status = 'leased' AND worker = ?"
+        params += (worker,)
+        if item_ids is not None:
+            if not item_ids:
+                return 0
+            sql += f" AND id IN ({', '.join('?' * len(item_ids))})"
+            params += tuple(item_ids)
+        with self._lock:
+            return self._conn.execute(sql, params).rowcount
+
+    def renew(self, item_ids: List[int], worker: str) -> int:
+        """Extend worker's leases on item_ids by another lease period."""
+        now = time.time()
+        return self._update_leased('UPDATE items SET available_at = ?, updated_at = ?',
+                                   (now + self.lease_seconds, now), item_ids, worker)
+
+    def complete(self, item_id: int, worker: str, result: Dict) -> bool:
+        """
+        Store the result of a leased image.
+
+        Returns:
+            False if worker no longer holds the lease (it expired and the image
+            went back to the queue), in which case the result is dropped
+        """
+        return bool(self._update_leased(
+            "UPDATE items SET status = 'done', worker = NULL, result = ?, error = NULL, updated_at = ?",
+            (json.dumps(result, ensure_ascii=False), time.time()), [item_id], worker
+        ))
+
+    def fail(self, item_id: int, worker: str, error: str) -> bool:
+        """
+        Record a failed attempt at a leased image.
+
+        The image is retried after a backoff, or dead-lettered once it has been
+        attempted max_attempts times.
+
+        Returns:
+            False if worker no longer holds the lease
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT attempts FROM items WHERE id = ? AND status = 'leased' AND worker = ?",
+                (item_id, worker)
+            ).fetchone()
+        if row is None:
+            return False
+        attempts = row[0]
+        if attempts >= self.max_attempts:
+            return bool(self._update_leased(
+                "UPDATE items SET status = 'dead', worker = NULL, error = ?, updated_at = ?",
+                (error, now), [item_id], worker
+            ))
+        delay = min(MAX_RETRY_DELAY, RETRY_DELAY * 2 ** (attempts - 1))
+        return bool(self._update_leased(
+            "UPDATE items SET status = 'pending', worker = NULL, error = ?, available_at = ?, updated_at = ?",
+            (error, now + delay, now), [item_id], worker
+        ))
+
+    def release(self, item_ids: Optional[List[int]], worker: str) -> int:
+        """Hand worker's leases on item_ids (or all of them, if None) back to the queue without counting the attempt."""
+        now = time.time()
+        return self._update_leased(
+            "UPDATE items SET status = 'pending', worker = NULL, attempts = attempts - 1, "
+            "available_at = ?, updated_at = ?",
+            (now, now), item_ids, worker
+        )
+
+    def status(self) -> Dict:
+        """
+        Counts of images by status.
+
+        Returns:
+            Dictionary with a count for each of STATUSES, plus 'retrying' (pending
+            images waiting out a retry backoff), 'expired' (leases past their
+            expiry, waiting to be taken over) and 'workers' (workers holding live leases)
+        """
+        now = time.time()
+        with self._lock:
+            counts = dict(self._conn.execute('SELECT status, COUNT(*) FROM items GROUP BY status').fetchall())
+            retrying, = self._conn.execute(
+                "SELECT COUNT(*) FROM items WHERE status = 'pending' AND available_at > ?", (now,)
+            ).fetchone()
+            expired, = self._conn.execute(
+                "SELECT COUNT(*) FROM items WHERE status = 'leased' AND available_at <= ?", (now,)
+            ).fetchone()
+            workers, = self._conn.execute(
+                "SELECT COUNT(DISTINCT worker) FROM items WHERE status = 'leased' AND available_at > ?", (now,)
+            ).fetchone()
+        summary = {status: counts.get(status, 0) for status in STATUSES}
+        summary.update(retrying=retrying, expired=expired, workers=workers)
+        return summary
+
+    def dead_letters(self, limit: Optional[int] = None) -> List[Dict]:
+        """Dead-lettered images, oldest first, with their 'id', 'path', 'prompt', 'attempts', 'error' and 'failed_at'."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, path, prompt, attempts, error, updated_at FROM items "
+                "WHERE status = 'dead' ORDER BY updated_at, id LIMIT ?",
+                (-1 if limit is None else limit,)
+            ).fetchall()
+        return [
+            {'id': item_id, 'path': path, 'prompt': prompt or None, 'attempts': attempts,
+             'error': error, 'failed_at': updated_at}
+            for item_id, path, prompt, attempts, error, updated_at in rows
+        ]
+
+    def retry_dead(self, item_ids: Optional[List[int]] = None) -> int:
+        """Put dead-lettered images (all of them, or those in item_ids) back in the queue with fresh attempts."""
+        now = time.time()
+        sql = ("UPDATE items SET status = 'pending', attempts = 0, available_at = ?, updated_at = ? "
+               "WHERE status = 'dead'")
+        params = (now, now)
+        if item_ids is not None:
+            if not item_ids:
+                return 0
+            sql += f" AND id IN ({', '.join('?' * len(item_ids))})"
+            params += tuple(item_ids)
+        with self._lock:
+            return self._conn.execute(sql, params).rowcount
+
+    def results(self, input_dir: Optional[str] = None) -> List[Dict]:
+        """
+        Results of the described images, in queue order.
+
+        Args:
+            input_dir: Only include images inside this directory
+        """
+        sql = "SELECT result FROM items WHERE status = 'done'"
+        params = ()
+        if input_dir:
+            prefix = os.path.join(os.path.abspath(input_dir), '')
+            sql += " AND substr(path, 1, ?) = ?"
+            params = (len(prefix), prefix)
+        with self._lock:
+            rows = self._conn.execute(sql + ' ORDER BY id', params).fetchall()
+        return [json.loads(result) for result, in rows]
+
+    def idle(self) -> bool:
+        """Whether nothing is left to do: no pending images and no leases."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM items WHERE status IN ('pending', 'leased') LIMIT 1"
+            ).fetchone()
+        return row is None
+
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+def work(queue: WorkQueue,
+         descriptor: 'ArtDescriptor',
+         worker: str,
+         concurrency: int = None,
+         poll_interval: float = 1.0) -> Dict[str, int]:
+    """
+    Describe images from the queue with generate_description until none are left.
+
+    Up to concurrency images are leased and described at once on a thread
+    pool; leases are renewed while their requests run. The worker stops once
+    no images are pending or leased by any worker, including retries still
+    waiting out their backoff. On Ctrl+C or SIGTERM its leases are handed back.
+
+    Args:
+        queue: Queue to work on
+        descriptor: Descriptor to describe the images with
+        worker: Name the leases are taken under, unique among the running workers
+        concurrency: Images described at once (defaults to Config.CONCURRENCY)
+        poll_interval: Seconds to wait before looking again when nothing can be leased
+
+    Returns:
+        Counts of images 'described' and 'failed', and results 'dropped' because the lease was lost
+    """
+    concurrency = concurrency or Config.CONCURRENCY
+    counts = {'described': 0, 'failed': 0, 'dropped': 0}
+    running = {}
+    renew_interval = queue.lease_seconds / 3
+    last_renewal = time.monotonic()
+    # A bulk run resets these; a worker describes images until the queue is empty, so bound them
+    descriptor.metrics = Metrics(max_samples=METRICS_WINDOW)
+    descriptor.upload_stats = []
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        while True:
+            if len(running) < concurrency:
+                for item in queue.lease(worker, concurrency - len(running)):
+                    running[executor.submit(descriptor.generate_description, item['path'], item['prompt'])] = item
+
+            if not running:
+                if queue.idle():
+                    return counts
+                time.sleep(poll_interval)
+                continue
+
+            done, _ = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'filename': os.path.basename(item['path']), 'description': f"Error: {str(e)}"}
+                if is_error(result):
+                    stored = queue.fail(item['id'], worker, result['description'])
+                    counts['failed'] += 1
+                else:
+                    stored = queue.complete(item['id'], worker, result)
+                    counts['described'] += 1
+                if not stored:
+                    counts['dropped'] += 1
+            if done:
+                # Only bulk runs report upload sizes
+                descriptor.upload_stats.clear()
+
+            if running and time.monotonic() - last_renewal >= renew_interval:
+                queue.renew([item['id'] for item in running.values()], worker)
+                last_renewal = time.monotonic()
+    except KeyboardInterrupt:
+        # Requests already sent finish in the background, but their results are dropped
+        queue.release(None, worker)
+        raise
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _stop(signum, frame):
+    raise KeyboardInterrupt
+
+
+def _worker_process(number: int,
+                    workers: int,
+                    concurrency: int,
+                    use_cache: bool,
+                    refresh_cache: bool,
+                    cascade: Optional[bool]):
+    """Entry point of a worker process started by run_workers."""
+    signal.signal(signal.SIGTERM, _stop)
+    from .art_descriptor import ArtDescriptor
+    from .request_scheduler import RequestScheduler
+
+    descriptor = ArtDescriptor(use_cache=use_cache, refresh_cache=refresh_cache, cascade=cascade)
+    # The workers share the account's rate limits: each starts with its part of the budget,
+    # and the response headers then keep all of them in line with what is left
+    descriptor.scheduler = RequestScheduler(max(1, Config.RATE_LIMIT_RPM // workers),
+                                            max(1, Config.RATE_LIMIT_TPM // workers))
+    worker = f'{socket.gethostname()}:{os.getpid()}'
+    queue = WorkQueue()
+    try:
+        counts = work(queue, descriptor, worker, concurrency)
+    except KeyboardInterrupt:
+        print(f"Worker {number} ({worker}) stopped, its images were handed back to the queue")
+        return
+    finally:
+        queue.close()
+    print(f"Worker {number} ({worker}): {counts['described']} described, {counts['failed']} failed"
+          + (f", {counts['dropped']} results dropped after losing the lease" if counts['dropped'] else ''))
+
+
+def run_workers(workers: int = None,
+                concurrency: int = None,
+                use_cache: bool = True,
+                refresh_cache: bool = False,
+                cascade: Optional[bool] = None) -> int:
+    """
+    Work through the queue with several worker processes, returning once it is drained.
+
+    Each process has its own descriptor and API client, so preparing images
+    and parsing responses uses every core while each process keeps
+    concurrency requests in flight.
+
+    Args:
+        workers: Worker processes (defaults to Config.QUEUE_WORKERS, or one per CPU core)
+        concurrency: Requests in flight per worker (defaults to Config.CONCURRENCY)
+        use_cache, refresh_cache, cascade: As for ArtDescriptor
+
+    Returns:
+        Number of worker processes that exited with an error
+    """
+    workers = workers or Config.QUEUE_WORKERS or os.cpu_count() or 1
+    concurrency = concurrency or Config.CONCURRENCY
+    # Spawned rather than forked, so no worker inherits another's SQLite connections or client
+    context = multiprocessing.get_context('spawn')
+    processes = [
+        context.Process(
+            target=_worker_process,
+            args=(number, workers, concurrency, use_cache, refresh_cache, cascade),
+            name=f'queue-worker-{number}'
+        )
+        for number in range(1, workers + 1)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # Ctrl+C reaches the workers too; give them a moment to hand back their leases
+        deadline = time.monotonic() + 5
+        for process in processes:
+            process.join(max(0, deadline - time.monotonic()))
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+        raise
+    return sum(process.exitcode != 0 for process in processes)
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Tests for splitting packed replies into one description per image.
+"""
+
+import os
+import sys
+
+# Add src to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.packed_requests import pack_ids, parse_packed_response
+
+
+def test_pack_ids():
+    assert pack_ids(3) == ['img1', 'img2', 'img3']
+
+
+def test_complete_reply():
+    descriptions, failed = parse_packed_response('{"img1": "A vase.", "img2": "A bowl."}', pack_ids(2))
+    assert descriptions == {'img1': 'A vase.', 'img2': 'A bowl.'}
+    assert failed == []
+
+
+def test_missing_and_malformed_sections_fail_only_their_images():
+    reply = '{"img1": "A vase.", "img3": "", "img4": ["not", "a", "string"], "img9": "Not asked for."}'
+    descriptions, failed = parse_packed_response(reply, pack_ids(4))
+    assert descriptions == {'img1': 'A vase.'}
+    assert failed == ['img2', 'img3', 'img4']
+
+
+def test_code_fenced_reply():
+    reply = '```json\n{"img1": "  A vase.  ", "img2": "A bowl."}\n```'
+    descriptions, failed = parse_packed_response(reply, pack_ids(2))
+    assert descriptions == {'img1': 'A vase.', 'img2': 'A bowl.'}
+    assert failed == []
+
+
+def test_unparseable_reply_fails_every_image():
+    for reply in ('The first image shows a vase.', '["A vase."]', '', None):
+        descriptions, failed = parse_packed_response(reply, pack_ids(2))
+        assert descriptions == {}
+        assert failed == ['img1', 'img2']
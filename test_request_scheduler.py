@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Tests for the rate-limit budgets of the request scheduler.
+"""
+
+import os
+import sys
+
+import pytest
+
+# Add src to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.request_scheduler import TokenBucket, parse_reset_duration
+
+
+def test_full_bucket_has_no_wait():
+    bucket = TokenBucket(600)
+    assert bucket.wait_time(600) == 0.0
+
+
+def test_wait_time_for_missing_budget():
+    bucket = TokenBucket(600)
+    bucket.level = 0.0
+    # 600 per minute refills 10 per second
+    assert bucket.wait_time(50) == pytest.approx(5.0)
+    # More than the capacity only ever waits for a full bucket
+    assert bucket.wait_time(6000) == pytest.approx(60.0)
+
+
+def test_refill_is_continuous_and_capped():
+    bucket = TokenBucket(60)
+    bucket.level = 0.0
+    start = bucket.updated
+    bucket.refill(start + 30)
+    assert bucket.level == pytest.approx(30.0)
+    bucket.refill(start + 300)
+    assert bucket.level == 60.0
+
+
+def test_sync_with_reported_limits():
+    bucket = TokenBucket(1000)
+    bucket.sync(500, 200)
+    assert bucket.capacity == 500.0
+    assert bucket.level == 200.0
+    # Headers never raise the local level above what the API reports
+    bucket.sync(None, 400)
+    assert bucket.level == 200.0
+
+
+def test_parse_reset_duration():
+    assert parse_reset_duration('1s') == 1.0
+    assert parse_reset_duration('6m0s') == 360.0
+    assert parse_reset_duration('120ms') == pytest.approx(0.12)
+    assert parse_reset_duration('1h2m3.5s') == pytest.approx(3723.5)
+    assert parse_reset_duration('2.5') == 2.5
+    assert parse_reset_duration('') is None
+    assert parse_reset_duration('soon') is None
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for splitting bulk runs into shards and merging their outputs.
+"""
+
+import os
+import sys
+import json
+from pathlib import Path
+
+import pytest
+
+# Add src to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.sharding import in_shard, merge_shards, parse_shard, shard_of, shard_output_path
+
+
+def test_parse_shard():
+    assert parse_shard('2/4') == (2, 4)
+    assert parse_shard(' 1 / 1 ') == (1, 1)
+    for spec in ('0/4', '5/4', '1/0', '1', 'a/b', ''):
+        with pytest.raises(ValueError):
+            parse_shard(spec)
+
+
+def test_shard_assignment_is_stable():
+    names = [f'image{number:04d}.jpg' for number in range(1000)]
+    first = [shard_of(name, 4) for name in names]
+    assert first == [shard_of(name, 4) for name in names]
+    assert set(first) == {1, 2, 3, 4}
+    # Only the file name counts, not the directory it is in
+    assert shard_of('a/b/image0001.jpg', 4) == shard_of('image0001.jpg', 4)
+    # Known values, so a change of hash would not go unnoticed
+    assert [shard_of(f'example{number}.jpg', 4) for number in range(1, 5)] == [4, 3, 4, 1]
+
+
+def test_adding_images_does_not_move_others():
+    paths = [Path(f'image{number:04d}.jpg') for number in range(200)]
+    before = set(in_shard(paths, (2, 3)))
+    after = set(in_shard(paths + [Path(f'new{number:04d}.jpg') for number in range(200)], (2, 3)))
+    assert before <= after
+    assert all(path.name.startswith('new') for path in after - before)
+
+
+def test_every_image_lands_in_exactly_one_shard():
+    paths = [Path(f'image{number:04d}.jpg') for number in range(300)]
+    shards = [list(in_shard(paths, (index, 3))) for index in (1, 2, 3)]
+    assert sorted(path for shard in shards for path in shard) == sorted(paths)
+
+
+def test_shard_output_path():
+    assert shard_output_path('out/assets.json', (2, 4)) == 'out/assets.shard-2-of-4.json'
+
+
+def write_shard(output_file, shard, results):
+    with open(shard_output_path(output_file, shard), 'w', encoding='utf-8') as f:
+        json.dump(results, f)
+
+
+def test_merge_shards(tmp_path):
+    names = [f'image{number:02d}.jpg' for number in range(20)]
+    for name in names:
+        (tmp_path / name).write_bytes(b'image')
+    output_file = str(tmp_path / 'out' / 'assets.json')
+    os.makedirs(os.path.dirname(output_file))
+
+    for index in (1, 2):
+        results = [{'filename': name, 'description': f'Described by {index}'}
+                   for name in names if shard_of(name, 2) == index]
+        write_shard(output_file, (index, 2), results)
+    # An image also described, with an error, by the wrong shard
+    stray = next(name for name in names if shard_of(name, 2) == 1)
+    with open(shard_output_path(output_file, (2, 2)), 'r+', encoding='utf-8') as f:
+        results = json.load(f) + [{'filename': stray, 'description': 'Error: timeout'}]
+        f.seek(0)
+        json.dump(results, f)
+
+    report = merge_shards(output_file, str(tmp_path))
+    assert report['count'] == 2
+    assert report['images'] == 20
+    assert report['duplicates'] == [stray]
+    assert report['misplaced'] == [stray]
+    assert report['missing'] == [] and report['failed'] == []
+
+    with open(output_file, 'r', encoding='utf-8') as f:
+        merged = json.load(f)
+    assert [result['filename'] for result in merged] == names
+    assert next(result for result in merged if result['filename'] == stray)['description'] == 'Described by 1'
+
+
+def test_merge_refuses_missing_shard(tmp_path):
+    output_file = str(tmp_path / 'assets.json')
+    write_shard(output_file, (1, 3), [])
+    write_shard(output_file, (3, 3), [])
+    with pytest.raises(ValueError, match='2/3'):
+        merge_shards(output_file)
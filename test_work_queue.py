@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Tests for the SQLite work queue: leases, their expiry, retries and dead letters.
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+# Add src to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src import work_queue
+from src.work_queue import WorkQueue, RETRY_DELAY
+
+
+class Clock:
+    """Stand-in for the time module, so lease expiry and backoff need no sleeping."""
+
+    def __init__(self):
+        self.now = time.time()
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(work_queue, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def images(tmp_path):
+    paths = []
+    for name in ('a.jpg', 'b.jpg', 'c.jpg'):
+        path = tmp_path / name
+        path.write_bytes(b'image ' + name.encode())
+        paths.append(str(path))
+    return paths
+
+
+def make_queue(tmp_path, **kwargs):
+    return WorkQueue(str(tmp_path / 'queue.sqlite3'), **kwargs)
+
+
+def test_enqueue_is_idempotent(tmp_path, clock, images):
+    queue = make_queue(tmp_path)
+    assert queue.enqueue(images) == (3, 0)
+    assert queue.enqueue(images) == (0, 0)
+    assert queue.status()['pending'] == 3
+
+
+def test_leased_image_is_not_leased_twice(tmp_path, clock, images):
+    queue = make_queue(tmp_path, lease_seconds=60)
+    queue.enqueue(images[:1])
+
+    leased = queue.lease('worker-1', 5)
+    assert [item['path'] for item in leased] == [os.path.abspath(images[0])]
+    assert leased[0]['attempts'] == 1
+    assert queue.lease('worker-2', 5) == []
+
+
+def test_expired_lease_is_taken_over(tmp_path, clock, images):
+    queue = make_queue(tmp_path, lease_seconds=60, max_attempts=3)
+    queue.enqueue(images[:1])
+    item, = queue.lease('worker-1')
+
+    clock.advance(30)
+    assert queue.lease('worker-2') == []
+    assert queue.status()['expired'] == 0
+
+    clock.advance(31)
+    assert queue.status()['expired'] == 1
+    taken, = queue.lease('worker-2')
+    assert taken['id'] == item['id']
+    assert taken['attempts'] == 2
+
+    # The first worker lost its lease, so its late result is dropped
+    assert not queue.complete(item['id'], 'worker-1', {'filename': 'a.jpg', 'description': 'late'})
+    assert queue.complete(item['id'], 'worker-2', {'filename': 'a.jpg', 'description': 'done'})
+    assert queue.status()['done'] == 1
+    assert queue.results() == [{'filename': 'a.jpg', 'description': 'done'}]
+
+
+def test_renewed_lease_does_not_expire(tmp_path, clock, images):
+    queue = make_queue(tmp_path, lease_seconds=60)
+    queue.enqueue(images[:1])
+    item, = queue.lease('worker-1')
+
+    clock.advance(50)
+    assert queue.renew([item['id']], 'worker-1') == 1
+    clock.advance(50)
+    assert queue.lease('worker-2') == []
+
+
+def test_failed_image_is_retried_after_backoff(tmp_path, clock, images):
+    queue = make_queue(tmp_path, max_attempts=3)
+    queue.enqueue(images[:1])
+    item, = queue.lease('worker-1')
+
+    assert queue.fail(item['id'], 'worker-1', 'Error: timeout')
+    assert queue.status()['retrying'] == 1
+    assert queue.lease('worker-1') == []
+
+    clock.advance(RETRY_DELAY + 1)
+    retried, = queue.lease('worker-1')
+    assert retried['id'] == item['id']
+    assert retried['attempts'] == 2
+
+
+def test_image_is_dead_lettered_after_max_attempts(tmp_path, clock, images):
+    queue = make_queue(tmp_path, max_attempts=2)
+    queue.enqueue(images[:1])
+
+    item, = queue.lease('worker-1')
+    queue.fail(item['id'], 'worker-1', 'Error: first')
+    clock.advance(RETRY_DELAY + 1)
+    item, = queue.lease('worker-1')
+    assert queue.fail(item['id'], 'worker-1', 'Error: second')
+
+    status = queue.status()
+    assert status['dead'] == 1
+    assert status['pending'] == 0
+    clock.advance(3600)
+    assert queue.lease('worker-1') == []
+
+    dead, = queue.dead_letters()
+    assert dead['attempts'] == 2
+    assert dead['error'] == 'Error: second'
+
+    assert queue.retry_dead() == 1
+    again, = queue.lease('worker-1')
+    assert again['attempts'] == 1
+
+
+def test_expired_last_attempt_is_dead_lettered(tmp_path, clock, images):
+    queue = make_queue(tmp_path, lease_seconds=60, max_attempts=1)
+    queue.enqueue(images[:1])
+    queue.lease('worker-1')
+
+    # The worker crashed on its only attempt
+    clock.advance(61)
+    assert queue.lease('worker-2') == []
+    assert queue.status()['dead'] == 1
+
+
+def test_release_hands_leases_back_without_counting(tmp_path, clock, images):
+    queue = make_queue(tmp_path)
+    queue.enqueue(images)
+    leased = queue.lease('worker-1', 3)
+    assert len(leased) == 3
+
+    assert queue.release(None, 'worker-1') == 3
+    assert queue.status()['pending'] == 3
+    assert all(item['attempts'] == 1 for item in queue.lease('worker-2', 3))
+
+
+def test_changed_image_is_queued_again(tmp_path, clock, images):
+    queue = make_queue(tmp_path)
+    queue.enqueue(images[:1])
+    item, = queue.lease('worker-1')
+    queue.complete(item['id'], 'worker-1', {'filename': 'a.jpg', 'description': 'old'})
+
+    with open(images[0], 'ab') as f:
+        f.write(b' edited')
+    assert queue.enqueue(images[:1]) == (0, 1)
+    assert queue.status()['pending'] == 1
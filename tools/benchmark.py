@@ -0,0 +1,284 @@
+"""
+Offline throughput benchmarks against the mock OpenAI server.
+
+Each scenario runs in its own child process pointed at an in-process mock
+server through OPENAI_BASE_URL, so no API key or network access is needed and
+peak RSS and CPU time can be read from the child's resource usage:
+
+  python tools/benchmark.py                                # all scenarios, 10k synthetic images
+  python tools/benchmark.py --latency lognormal:800,0.4 --rate-limit-rate 0.02
+  python tools/benchmark.py --scenarios bulk,synthetic --synthetic-count 2000
+  python tools/benchmark.py --compare HEAD~1               # print deltas against a stored run
+
+Results are stored in .cache/benchmarks/<commit>.json (with a -dirty suffix for
+an uncommitted tree), so runs from different commits can be compared.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from tools.mock_openai_server import serve
+
+SCENARIOS = ('single', 'bulk', 'with_examples', 'synthetic')
+RESULTS_DIR = REPO_ROOT / '.cache' / 'benchmarks'
+SYNTHETIC_DIR = REPO_ROOT / '.cache' / 'benchmark'
+
+
+def asset_dirs():
+    return sorted(path for path in (REPO_ROOT / 'assets').iterdir() if path.is_dir())
+
+
+def synthetic_images(count: int) -> Path:
+    """Directory of count small distinct JPEGs, generated once and reused by later runs."""
+    from PIL import Image
+
+    directory = SYNTHETIC_DIR / f'synthetic-{count}'
+    marker = directory / '.complete'
+    if marker.exists():
+        return directory
+
+    print(f"Generating {count} synthetic images in {directory}...")
+    directory.mkdir(parents=True, exist_ok=True)
+    for i in range(count):
+        color = (i * 37 % 256, i * 91 % 256, i * 53 % 256)
+        Image.new('RGB', (96, 64), color).save(directory / f'synthetic{i:05d}.jpg', quality=80)
+    marker.touch()
+    return directory
+
+
+def load_examples(count: int = 2):
+    """First example pairs from real_descriptions/human_written.json, as image paths and descriptions."""
+    with open(REPO_ROOT / 'real_descriptions' / 'human_written.json', 'r', encoding='utf-8') as f:
+        references = json.load(f)
+    pairs = [
+        (str(REPO_ROOT / 'assets' / 'human_written' / item['filename']), item['description'])
+        for item in references
+        if (REPO_ROOT / 'assets' / 'human_written' / item['filename']).exists()
+    ][:count]
+    return [image for image, _ in pairs], [description for _, description in pairs]
+
+
+def run_child(scenario: str, options: dict, result_file: str):
+    """Run one scenario in this process and write its image and error counts to result_file."""
+    from src.art_descriptor import ArtDescriptor
+
+    descriptor = ArtDescriptor(use_cache=False)
+    output_dir = options['output_dir']
+    results = []
+
+    if scenario == 'single':
+        images = [path for directory in asset_dirs() for path in sorted(directory.glob('*.jpg'))]
+        for i in range(options['single_count']):
+            results.append(descriptor.generate_description(str(images[i % len(images)])))
+    elif scenario == 'bulk':
+        for directory in asset_dirs():
+            results += descriptor.process_bulk_images(
+                str(directory),
+                os.path.join(output_dir, f'{directory.name}.json'),
+                concurrency=options['concurrency']
+            )
+    elif scenario == 'with_examples':
+        example_images, example_descriptions = load_examples()
+        for directory in asset_dirs():
+            results += descriptor.process_bulk_images_with_examples(
+                str(directory),
+                os.path.join(output_dir, f'{directory.name}.json'),
+                example_images=example_images,
+                example_descriptions=example_descriptions,
+                concurrency=options['concurrency']
+            )
+    elif scenario == 'synthetic':
+        results = descriptor.process_bulk_images(
+            options['synthetic_dir'],
+            os.path.join(output_dir, 'synthetic.json'),
+            concurrency=options['concurrency']
+        )
+
+    errors = sum(1 for result in results if result['description'].startswith('Error:'))
+    with open(result_file, 'w', encoding='utf-8') as f:
+        json.dump({'images': len(results), 'errors': errors}, f)
+
+
+def run_scenario(scenario: str, options: dict, base_url: str, verbose: bool = False) -> dict:
+    """
+    Run a scenario in a child process and measure it.
+
+    Returns:
+        Dictionary with images, errors, wall time, images/sec, CPU time and peak RSS
+    """
+    with tempfile.TemporaryDirectory(prefix='art-bench-') as work_dir:
+        options = dict(options, output_dir=work_dir)
+        result_file = os.path.join(work_dir, 'result.json')
+        env = dict(
+            os.environ,
+            OPENAI_API_KEY='benchmark',
+            OPENAI_BASE_URL=base_url,
+            # Throttling is the mock's job here, not the client's budget
+            RATE_LIMIT_RPM='1000000',
+            RATE_LIMIT_TPM='1000000000',
+            MANIFEST_DIR=os.path.join(work_dir, 'manifests'),
+            PROMETHEUS_TEXTFILE=''
+        )
+        command = [sys.executable, __file__, '--child', scenario, json.dumps(options), result_file]
+
+        start = time.perf_counter()
+        output = None if verbose else subprocess.DEVNULL
+        process = subprocess.Popen(command, env=env, cwd=work_dir, stdout=output, stderr=output)
+        # wait4 rather than wait() so the child's own resource usage can be read
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        wall = time.perf_counter() - start
+
+        if process.returncode != 0 or not os.path.exists(result_file):
+            raise RuntimeError(f"Scenario {scenario} failed with exit code {process.returncode}")
+        with open(result_file, 'r', encoding='utf-8') as f:
+            counts = json.load(f)
+
+    return {
+        **counts,
+        'wall_seconds': round(wall, 3),
+        'images_per_second': round(counts['images'] / wall, 3) if wall else 0.0,
+        'cpu_seconds': round(usage.ru_utime + usage.ru_stime, 3),
+        # ru_maxrss is in kilobytes on Linux
+        'peak_rss_mb': round(usage.ru_maxrss / 1024, 1)
+    }
+
+
+def git(*args) -> str:
+    return subprocess.run(['git', *args], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip()
+
+
+def commit_label() -> str:
+    """Short commit hash of the tree being measured, with -dirty if it has uncommitted changes."""
+    label = git('rev-parse', '--short', 'HEAD') or 'unknown'
+    if git('status', '--porcelain', '--untracked-files=no'):
+        label += '-dirty'
+    return label
+
+
+def find_results(ref: str) -> Path:
+    """Stored results for a commit-ish, or a path to a results file."""
+    if os.path.exists(ref):
+        return Path(ref)
+    label = git('rev-parse', '--short', ref) or ref
+    for name in (f'{label}.json', f'{label}-dirty.json'):
+        if (RESULTS_DIR / name).exists():
+            return RESULTS_DIR / name
+    raise FileNotFoundError(f"No stored benchmark results for {ref} in {RESULTS_DIR}")
+
+
+def print_results(results: dict, baseline: dict = None):
+    """Print a table of the scenarios, with relative changes against baseline when given."""
+    metrics = (('images_per_second', 'images/s'), ('cpu_seconds', 'CPU s'), ('peak_rss_mb', 'peak RSS MB'))
+    header = f"{'scenario':<15}{'images':>8}{'errors':>8}" + ''.join(f"{label:>22}" for _, label in metrics)
+    print(header)
+    print('-' * len(header))
+    for scenario, stats in results['scenarios'].items():
+        row = f"{scenario:<15}{stats['images']:>8}{stats['errors']:>8}"
+        before = (baseline or {}).get('scenarios', {}).get(scenario)
+        for key, _ in metrics:
+            cell = f"{stats[key]:.2f}"
+            if before and before.get(key):
+                cell += f" ({(stats[key] - before[key]) / before[key]:+.1%})"
+            row += f"{cell:>22}"
+        print(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the description paths against a local mock server')
+    parser.add_argument('--child', nargs=3, metavar=('SCENARIO', 'OPTIONS', 'RESULT_FILE'), help=argparse.SUPPRESS)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"Comma-separated scenarios to run (default: {','.join(SCENARIOS)})")
+    parser.add_argument('--synthetic-count', type=int, default=10000,
+                        help='Number of images in the synthetic directory (default: 10000)')
+    parser.add_argument('--single-count', type=int, default=20,
+                        help='Images described one at a time in the single scenario (default: 20)')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='Requests in flight for the bulk scenarios (default: 8)')
+    parser.add_argument('--latency', default='fixed:50',
+                        help='Mock latency distribution in ms, see tools/mock_openai_server.py (default: fixed:50)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of 500 responses (default: 0)')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Share of 429 responses (default: 0)')
+    parser.add_argument('--retry-after', type=float, default=0.1,
+                        help='Retry-After seconds sent with injected 429s (default: 0.1)')
+    parser.add_argument('--response-words', type=int, default=200,
+                        help='Words per mock description (default: 200)')
+    parser.add_argument('--compare', metavar='REF',
+                        help='Commit or results file to compare against')
+    parser.add_argument('--no-save', action='store_true', help='Do not store the results')
+    parser.add_argument('--verbose', action='store_true', help='Show the output of each scenario')
+    args = parser.parse_args()
+
+    if args.child:
+        scenario, options, result_file = args.child
+        run_child(scenario, json.loads(options), result_file)
+        return
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+
+    baseline = None
+    if args.compare:
+        with open(find_results(args.compare), 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    options = {
+        'concurrency': args.concurrency,
+        'single_count': args.single_count,
+        'synthetic_count': args.synthetic_count
+    }
+    if 'synthetic' in scenarios:
+        options['synthetic_dir'] = str(synthetic_images(args.synthetic_count))
+
+    mock = {
+        'latency': args.latency,
+        'error_rate': args.error_rate,
+        'rate_limit_rate': args.rate_limit_rate,
+        'retry_after': args.retry_after,
+        'response_words': args.response_words
+    }
+    server = serve(0, **mock)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    results = {
+        'commit': commit_label(),
+        'timestamp': time.time(),
+        'options': options,
+        'mock': mock,
+        'scenarios': {}
+    }
+    try:
+        for scenario in scenarios:
+            print(f"Running {scenario}...")
+            results['scenarios'][scenario] = run_scenario(scenario, options, base_url, args.verbose)
+    finally:
+        server.shutdown()
+    results['injected'] = dict(server.state.injected)
+
+    print()
+    print_results(results, baseline)
+    if baseline:
+        print(f"\nCompared with {baseline['commit']}")
+
+    if not args.no_save:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        results_file = RESULTS_DIR / f"{results['commit']}.json"
+        with open(results_file, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {results_file}")
+
+
+if __name__ == '__main__':
+    main()
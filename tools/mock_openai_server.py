@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI API endpoints used by Art Descriptions AI.
+
+Implements chat completions, file upload/download and the Batch API well enough
+to run the CLI against it without an API key or network access:
+
+  python tools/mock_openai_server.py --port 8000
+  OPENAI_BASE_URL=http://127.0.0.1:8000/v1 OPENAI_API_KEY=test python main.py --bulk --batch-api --wait
+
+Chat completions can be made slow or unreliable for benchmarks and retry testing:
+
+  python tools/mock_openai_server.py --latency lognormal:400,0.5 --rate-limit-rate 0.05 --error-rate 0.01
+
+and a cheaper model can be made to fail the quality checks of the model cascade:
+
+  python tools/mock_openai_server.py --response-words 150 --poor-quality-models gpt-4o-mini --poor-quality-rate 0.3
+"""
+
+import re
+import sys
+import json
+import hashlib
+import time
+import uuid
+import random
+import argparse
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+def parse_latency(spec: str):
+    """
+    Build a latency sampler from a spec, in milliseconds.
+
+    'fixed:MS', 'uniform:LOW,HIGH', 'normal:MEAN,STDDEV' or 'lognormal:MEDIAN,SIGMA';
+    a bare number is fixed. The sampler returns seconds, never negative.
+    """
+    kind, _, args = spec.partition(':') if ':' in spec else ('fixed', '', spec)
+    values = [float(value) for value in args.split(',') if value.strip()]
+    samplers = {
+        'fixed': lambda: values[0],
+        'uniform': lambda: random.uniform(values[0], values[1]),
+        'normal': lambda: random.gauss(values[0], values[1]),
+        'lognormal': lambda: values[0] * random.lognormvariate(0, values[1])
+    }
+    if kind not in samplers:
+        raise ValueError(f"Unknown latency distribution: {kind}")
+    sampler = samplers[kind]
+    return lambda: max(0.0, sampler()) / 1000
+
+
+class MockOpenAI:
+    """In-memory state of the stand-in server: uploaded files, batches and injected faults."""
+
+    def __init__(self,
+                 batch_delay: float = 1.0,
+                 latency: str = '0',
+                 error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0,
+                 retry_after: float = 0.5,
+                 response_words: int = 0,
+                 pack_drop_rate: float = 0.0,
+                 poor_quality_models: tuple = (),
+                 poor_quality_rate: float = 0.0,
+                 rpm: int = 1_000_000,
+                 tpm: int = 1_000_000_000):
+        """
+        Args:
+            batch_delay: Seconds a batch stays in progress before completing
+            latency: Chat completion latency distribution, see parse_latency
+            error_rate: Share of chat completions answered with a 500 error
+            rate_limit_rate: Share of chat completions answered with a 429 and Retry-After
+            retry_after: Retry-After seconds sent with injected 429s
+            response_words: Pad descriptions to this many words (0 keeps the short text)
+            pack_drop_rate: Share of images in JSON-mode (packed) requests whose entry is
+                left out or empty, to exercise the client's per-image retry
+            poor_quality_models: Models whose descriptions may end with an interpretation
+            poor_quality_rate: Share of their descriptions that do, so they fail the
+                client's quality checks and are escalated to the next model
+            rpm, tpm: Limits reported in the x-ratelimit-* headers
+        """
+        self.batch_delay = batch_delay
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.response_words = response_words
+        self.pack_drop_rate = pack_drop_rate
+        self.poor_quality_models = set(poor_quality_models)
+        self.poor_quality_rate = poor_quality_rate
+        self.rpm = rpm
+        self.tpm = tpm
+        self.injected = {'429': 0, '500': 0, 'poor_quality': 0}
+        self.files = {}
+        self.batches = {}
+        self.requests = 0
+        # Prompt prefixes seen so far, to report cached_tokens like the API's prompt cache
+        self.prefixes = set()
+        self._lock = threading.Lock()
+
+    def chat_completion(self, body: dict) -> dict:
+        """Build a chat completion response describing the images in the last message."""
+        with self._lock:
+            self.requests += 1
+            number = self.requests
+
+        content = body.get('messages', [{}])[-1].get('content', '')
+        parts = content if isinstance(content, list) else [{'type': 'text', 'text': content}]
+        images = sum(1 for part in parts if isinstance(part, dict) and part.get('type') == 'image_url')
+        text = self._description(f"Mock description #{number} for a request with {images} image(s).")
+        if (body.get('response_format') or {}).get('type') == 'json_object':
+            text = self._packed_reply(number, parts)
+        elif body.get('model') in self.poor_quality_models and random.random() < self.poor_quality_rate:
+            text += ' The overall impression is one of quiet contemplation.'
+            with self._lock:
+                self.injected['poor_quality'] += 1
+        prompt_tokens, cached_tokens = self._prompt_usage(body.get('messages', [])[:-1], parts)
+
+        return {
+            'id': f'chatcmpl-{uuid.uuid4().hex[:12]}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'mock'),
+            'choices': [{
+                'index': 0,
+                'finish_reason': 'stop',
+                'message': {'role': 'assistant', 'content': text}
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': len(text.split()),
+                'total_tokens': prompt_tokens + len(text.split()),
+                'prompt_tokens_details': {'cached_tokens': cached_tokens}
+            }
+        }
+
+    def _description(self, text: str) -> str:
+        if self.response_words > len(text.split()):
+            text += ' ' + ' '.join(['lorem'] * (self.response_words - len(text.split()))) + '.'
+        return text
+
+    def _packed_reply(self, number: int, parts: list) -> str:
+        """JSON object with a description per 'Image ID: ...' label, some dropped or emptied if configured."""
+        reply = {}
+        for part in parts:
+            match = re.match(r'Image ID: (\S+)$', part.get('text', '')) if isinstance(part, dict) else None
+            if not match:
+                continue
+            roll = random.random()
+            if roll < self.pack_drop_rate / 2:
+                continue
+            elif roll < self.pack_drop_rate:
+                reply[match.group(1)] = ''
+            else:
+                reply[match.group(1)] = self._description(f"Mock description #{number} of image {match.group(1)}.")
+        return json.dumps(reply)
+
+    def _prompt_usage(self, earlier_messages: list, parts: list):
+        """
+        Approximate prompt tokens, and the cached share the API would report.
+
+        Everything before the last content part is treated as the prefix; it is
+        "cached" from its second use on if it is at least 1024 tokens, rounded
+        down to a multiple of 128 like the real prompt cache.
+        """
+        def tokens(part):
+            if part.get('type') == 'image_url':
+                return 765
+            return len(part.get('text', '')) // 4
+
+        prefix_tokens = sum(len(json.dumps(message)) // 4 for message in earlier_messages)
+        prefix_tokens += sum(tokens(part) for part in parts[:-1])
+        prompt_tokens = prefix_tokens + (tokens(parts[-1]) if parts else 0)
+
+        prefix = hashlib.sha256(json.dumps([earlier_messages, parts[:-1]], sort_keys=True).encode('utf-8')).hexdigest()
+        with self._lock:
+            seen = prefix in self.prefixes
+            self.prefixes.add(prefix)
+
+        cached_tokens = (prefix_tokens // 128) * 128 if seen and prefix_tokens >= 1024 else 0
+        return prompt_tokens, cached_tokens
+
+    def fault(self):
+        """Wait out the sampled latency, then pick the injected failure for a chat completion, if any."""
+        time.sleep(self.latency())
+        roll = random.random()
+        if roll < self.rate_limit_rate:
+            fault = '429'
+        elif roll < self.rate_limit_rate + self.error_rate:
+            fault = '500'
+        else:
+            return None
+        with self._lock:
+            self.injected[fault] += 1
+        return fault
+
+    def rate_limit_headers(self) -> dict:
+        return {
+            'x-ratelimit-limit-requests': str(self.rpm),
+            'x-ratelimit-remaining-requests': str(self.rpm - 1),
+            'x-ratelimit-limit-tokens': str(self.tpm),
+            'x-ratelimit-remaining-tokens': str(self.tpm - 1)
+        }
+
+    def add_file(self, content: bytes, purpose: str, filename: str) -> dict:
+        file_id = f'file-{uuid.uuid4().hex[:12]}'
+        with self._lock:
+            self.files[file_id] = {
+                'id': file_id,
+                'object': 'file',
+                'bytes': len(content),
+                'created_at': int(time.time()),
+                'filename': filename,
+                'purpose': purpose,
+                'content': content
+            }
+        return self.file_info(file_id)
+
+    def file_info(self, file_id: str) -> dict:
+        return {key: value for key, value in self.files[file_id].items() if key != 'content'}
+
+    def create_batch(self, body: dict) -> dict:
+        batch_id = f'batch_{uuid.uuid4().hex[:12]}'
+        batch = {
+            'id': batch_id,
+            'object': 'batch',
+            'endpoint': body.get('endpoint'),
+            'input_file_id': body.get('input_file_id'),
+            'completion_window': body.get('completion_window'),
+            'status': 'validating',
+            'output_file_id': None,
+            'error_file_id': None,
+            'created_at': int(time.time()),
+            'request_counts': {'total': 0, 'completed': 0, 'failed': 0}
+        }
+        with self._lock:
+            self.batches[batch_id] = batch
+        threading.Thread(target=self._run_batch, args=(batch_id,), daemon=True).start()
+        return batch
+
+    def _run_batch(self, batch_id: str):
+        """Process a batch's requests in the background after batch_delay seconds."""
+        batch = self.batches[batch_id]
+        lines = self.files[batch['input_file_id']]['content'].decode('utf-8').splitlines()
+        batch['request_counts']['total'] = len(lines)
+        batch['status'] = 'in_progress'
+        time.sleep(self.batch_delay)
+
+        outputs = []
+        for line in lines:
+            request = json.loads(line)
+            outputs.append(json.dumps({
+                'id': f'batch_req_{uuid.uuid4().hex[:12]}',
+                'custom_id': request['custom_id'],
+                'response': {
+                    'status_code': 200,
+                    'request_id': uuid.uuid4().hex,
+                    'body': self.chat_completion(request['body'])
+                },
+                'error': None
+            }))
+            batch['request_counts']['completed'] += 1
+
+        output = self.add_file(('\n'.join(outputs) + '\n').encode('utf-8'), 'batch_output', f'{batch_id}_output.jsonl')
+        batch['output_file_id'] = output['id']
+        batch['status'] = 'completed'
+        batch['completed_at'] = int(time.time())
+
+
+def make_handler(state: MockOpenAI):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, payload, status: int = 200, headers: dict = None):
+            data = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_error(self, status: int, message: str, error_type: str = 'invalid_request_error',
+                        headers: dict = None):
+            self._send_json({'error': {'message': message, 'type': error_type, 'code': None}}, status, headers)
+
+        def _chat_completion(self):
+            body = json.loads(self._read_body())
+            fault = state.fault()
+            if fault == '429':
+                self._send_error(429, 'Rate limit reached (injected by mock server)', 'requests',
+                                 {'retry-after': str(state.retry_after), **state.rate_limit_headers()})
+            elif fault == '500':
+                self._send_error(500, 'The server had an error (injected by mock server)', 'server_error')
+            else:
+                self._send_json(state.chat_completion(body), headers=state.rate_limit_headers())
+
+        def _read_body(self) -> bytes:
+            return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        def do_POST(self):
+            path = self.path.split('?')[0]
+            if path.endswith('/chat/completions'):
+                self._chat_completion()
+            elif path.endswith('/files'):
+                self._upload_file()
+            elif path.endswith('/batches'):
+                self._send_json(state.create_batch(json.loads(self._read_body())))
+            else:
+                self._send_error(404, f'Unknown endpoint: {path}')
+
+        def do_GET(self):
+            path = self.path.split('?')[0]
+            match = re.search(r'/files/([^/]+)/content$', path)
+            if match and match.group(1) in state.files:
+                content = state.files[match.group(1)]['content']
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/octet-stream')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+                return
+
+            match = re.search(r'/files/([^/]+)$', path)
+            if match and match.group(1) in state.files:
+                self._send_json(state.file_info(match.group(1)))
+                return
+
+            match = re.search(r'/batches/([^/]+)$', path)
+            if match and match.group(1) in state.batches:
+                self._send_json(state.batches[match.group(1)])
+                return
+
+            self._send_error(404, f'Not found: {path}')
+
+        def _upload_file(self):
+            header = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode('utf-8')
+            message = BytesParser(policy=HTTP).parsebytes(header + self._read_body())
+            fields = {}
+            for part in message.iter_parts():
+                name = part.get_param('name', header='content-disposition')
+                fields[name] = (part.get_filename(), part.get_payload(decode=True))
+
+            if 'file' not in fields:
+                self._send_error(400, 'Missing file')
+                return
+
+            filename, content = fields['file']
+            purpose = fields.get('purpose', (None, b''))[1].decode('utf-8')
+            self._send_json(state.add_file(content, purpose, filename or 'upload.jsonl'))
+
+    return Handler
+
+
+def serve(port: int = 8000, batch_delay: float = 1.0, host: str = '127.0.0.1', **options) -> ThreadingHTTPServer:
+    """
+    Create the stand-in server; call serve_forever() on the result to run it.
+
+    Extra keyword options are passed to MockOpenAI. Port 0 picks a free port,
+    available as server.server_address[1]; the state is server.state.
+    """
+    state = MockOpenAI(batch_delay, **options)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    server.state = state
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI chat, files and batches endpoints")
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on (default: 8000)')
+    parser.add_argument('--batch-delay', type=float, default=1.0,
+                        help='Seconds a batch stays in progress before completing (default: 1.0)')
+    parser.add_argument('--latency', default='0',
+                        help='Chat completion latency in ms: MS, fixed:MS, uniform:LOW,HIGH, normal:MEAN,STDDEV '
+                             'or lognormal:MEDIAN,SIGMA (default: 0)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Share of chat completions that fail with a 500 (default: 0)')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0,
+                        help='Share of chat completions rejected with a 429 (default: 0)')
+    parser.add_argument('--retry-after', type=float, default=0.5,
+                        help='Retry-After seconds sent with injected 429s (default: 0.5)')
+    parser.add_argument('--response-words', type=int, default=0,
+                        help='Pad each description to this many words (default: short text)')
+    parser.add_argument('--pack-drop-rate', type=float, default=0.0,
+                        help='Share of images in packed (JSON mode) requests left out or empty (default: 0)')
+    parser.add_argument('--poor-quality-models', default='',
+                        help='Comma-separated models whose descriptions may fail the quality checks (default: none)')
+    parser.add_argument('--poor-quality-rate', type=float, default=0.0,
+                        help='Share of those descriptions ending with an interpretation (default: 0)')
+    args = parser.parse_args()
+
+    server = serve(
+        args.port,
+        args.batch_delay,
+        args.host,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        response_words=args.response_words,
+        pack_drop_rate=args.pack_drop_rate,
+        poor_quality_models=tuple(model.strip() for model in args.poor_quality_models.split(',') if model.strip()),
+        poor_quality_rate=args.poor_quality_rate
+    )
+    print(f"Mock OpenAI server listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
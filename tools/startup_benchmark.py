@@ -0,0 +1,133 @@
+"""
+Startup time guard for the CLI.
+
+Runs the commands that are called from shell loops and cron (--help and
+--list-images) several times each in a fresh interpreter, and fails if a heavy
+dependency was imported on the way or if their median wall time exceeds that
+of a bare interpreter (python -c pass) by more than the budget. Interpreter
+and site-packages startup is outside the repo's control and varies with the
+machine, so only the time on top of it is budgeted. Also reports the import
+time of src.art_descriptor for library use.
+
+  python tools/startup_benchmark.py                 # exits 1 on a regression
+  python tools/startup_benchmark.py --budget-ms 80 --runs 11
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Modules that must not be loaded by commands that make no API requests
+HEAVY_MODULES = ('openai', 'httpx', 'PIL', 'tqdm', 'pandas', 'numpy', 'torch', 'sentence_transformers')
+
+# Bare interpreter startup, subtracted from the other commands' times
+BASELINE = 'interpreter'
+
+COMMANDS = {
+    BASELINE: ['-c', 'pass'],
+    'help': ['main.py', '--help'],
+    'list-images': ['main.py', '--list-images', '--input-dir', 'assets', '--recursive'],
+    'import art_descriptor': ['-c', 'import src.art_descriptor']
+}
+# Commands held to the budget; the others are reported only
+GUARDED = ('help', 'list-images')
+
+
+def run_once(args, env, importtime: bool = False):
+    """
+    Run a command once in a fresh interpreter.
+
+    Returns:
+        Wall seconds, and with importtime the (module, cumulative microseconds) imported
+    """
+    flags = ['-X', 'importtime'] if importtime else []
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, *flags, *args], cwd=REPO_ROOT, env=env,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    wall = time.perf_counter() - start
+    if process.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} exited with {process.returncode}:\n{process.stderr[-2000:]}")
+
+    imports = []
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        imports.append((name.strip(), int(cumulative)))
+    return wall, imports
+
+
+def measure(commands: dict, runs: int, env) -> dict:
+    """
+    Median wall time over runs, the heavy modules imported and the slowest imports of one run, per command.
+
+    The commands take turns within each round of runs, so a machine that
+    speeds up or slows down during the benchmark affects all of them alike.
+    """
+    # Timed without -X importtime, whose own overhead would count against the budget
+    walls = {name: [] for name in commands}
+    for _ in range(runs):
+        for name, args in commands.items():
+            walls[name].append(run_once(args, env)[0])
+
+    stats = {}
+    for name, args in commands.items():
+        _, imports = run_once(args, env, importtime=True)
+        modules = {module for module, _ in imports}
+        stats[name] = {
+            'median_ms': statistics.median(walls[name]) * 1000,
+            'min_ms': min(walls[name]) * 1000,
+            'heavy': sorted(module for module in HEAVY_MODULES if module in modules),
+            'slowest': sorted(imports, key=lambda item: item[1], reverse=True)[:5]
+        }
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check CLI startup time and lazy imports')
+    parser.add_argument('--runs', type=int, default=9, help='Runs per command (default: 9)')
+    parser.add_argument('--budget-ms', type=float, default=60.0,
+                        help='Maximum median wall time for --help and --list-images on top of a bare '
+                             'interpreter\'s (default: 60)')
+    args = parser.parse_args()
+
+    # No API key: listing images must not need one
+    env = {key: value for key, value in os.environ.items() if key != 'OPENAI_API_KEY'}
+    # Warm the bytecode cache so the first run is not an outlier
+    subprocess.run([sys.executable, '-m', 'compileall', '-q', 'main.py', 'src'], cwd=REPO_ROOT, env=env)
+
+    failures = []
+    measured = measure(COMMANDS, args.runs, env)
+    baseline_ms = 0.0
+    for name, stats in measured.items():
+        if name == BASELINE:
+            baseline_ms = stats['median_ms']
+            print(f"{name:<24} median {baseline_ms:7.1f} ms  min {stats['min_ms']:7.1f} ms")
+            continue
+        guarded = name in GUARDED
+        added_ms = stats['median_ms'] - baseline_ms
+        print(f"{name:<24} median {stats['median_ms']:7.1f} ms  min {stats['min_ms']:7.1f} ms  "
+              f"(+{added_ms:.1f} ms" + (f", budget +{args.budget_ms:.0f} ms)" if guarded else ')'))
+        if not guarded:
+            continue
+        if added_ms > args.budget_ms:
+            failures.append(f"{name} took {added_ms:.1f} ms more than a bare interpreter")
+        if stats['heavy']:
+            failures.append(f"{name} imported {', '.join(stats['heavy'])}")
+        if failures:
+            for module, cumulative in stats['slowest']:
+                print(f"    {module:<40} {cumulative / 1000:7.1f} ms")
+
+    if failures:
+        print("\nStartup regression: " + '; '.join(failures))
+        sys.exit(1)
+    print("\nStartup within budget")
+
+
+if __name__ == '__main__':
+    main()